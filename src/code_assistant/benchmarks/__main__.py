@@ -0,0 +1,63 @@
+"""
+Offline benchmark suite.
+
+    python -m code_assistant.benchmarks --out bench.json [--compare previous.json] [--quick]
+
+Times the entry points' imports, chunking, graph building, embed_project (with a
+stub embedding model), search latency percentiles per vector store backend, size
+and mode, recall@k against latency for the ANN index settings, and prompt
+building in each LLM backend, all on synthetic data. Results are written as JSON; with --compare,
+metrics that got more than --threshold slower than the previous run are listed
+and the exit status is 1.
+"""
+
+import argparse
+import sys
+
+from code_assistant.benchmarks.suite import compare, load, run_suite, save
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m code_assistant.benchmarks")
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    parser.add_argument("--files", type=int, default=200, help="files in the synthetic repo")
+    parser.add_argument(
+        "--sizes", default="10000,100000,1000000", help="comma-separated store sizes to search"
+    )
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--backends", default="chroma,ann", help="comma-separated vector stores")
+    parser.add_argument("--workdir", help="keep the generated repo and stores here")
+    parser.add_argument(
+        "--quick", action="store_true", help="50 files, a 10k store and 50 queries"
+    )
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.files, args.sizes, args.queries = 50, "10000", 50
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    backends = [backend for backend in args.backends.split(",") if backend]
+
+    results = run_suite(
+        files=args.files,
+        sizes=sizes,
+        queries=args.queries,
+        workdir=args.workdir,
+        backends=backends,
+    )
+    save(results, args.out)
+    print(f"Results written to {args.out}")
+
+    if not args.compare:
+        return 0
+    rows, regressions = compare(load(args.compare), results, args.threshold)
+    for name, before, after, change in rows:
+        marker = "  <-- slower" if change > args.threshold else ""
+        print(f"{name:<45} {before:>12.3f} -> {after:>12.3f} ({change:+.1%}){marker}")
+    print(f"{len(regressions)} of {len(rows)} metrics regressed by more than {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
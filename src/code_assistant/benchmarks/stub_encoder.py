@@ -0,0 +1,41 @@
+import zlib
+
+import numpy as np
+
+from code_assistant.vector_db.lexical_index import tokenize
+
+
+class StubTokenizer:
+    """Callable like a Hugging Face tokenizer; one token per identifier part, plus CLS/SEP."""
+
+    def __call__(self, texts, add_special_tokens=True, truncation=False):
+        extra = 2 if add_special_tokens else 0
+        return {"input_ids": [[0] * (len(tokenize(t)) + extra) for t in texts]}
+
+
+class StubEncoder:
+    """
+    Deterministic stand-in for Encoder: hashed bag of identifier parts, L2-normalized.
+
+    Runs offline in microseconds per text, so benchmarks measure the pipeline and
+    the stores rather than the embedding model.
+    """
+
+    def __init__(self, dim: int = 64):
+        self.dim = dim
+        self.model_name = f"stub-hash-{dim}"
+        self.tokenizer = StubTokenizer()
+        self.max_seq_length = 512
+        self.load_seconds = 0.0
+        self.loaded = True
+
+    def encode(self, texts):
+        if isinstance(texts, str):
+            # like SentenceTransformer.encode: a single text gives a single vector
+            return self.encode([texts])[0]
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                vectors[row, zlib.crc32(token.encode("utf8")) % self.dim] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
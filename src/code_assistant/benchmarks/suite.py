@@ -0,0 +1,368 @@
+import contextlib
+import importlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from code_assistant.benchmarks.stub_encoder import StubEncoder
+from code_assistant.benchmarks.synthetic import generate_repo, synthetic_chunks, synthetic_queries
+from code_assistant.embeddings.embedding import embed_project
+from code_assistant.llm.context_packing import ContextPacker, llama_token_counter
+from code_assistant.utils.code_chunk_extractor import CodeChunkExtractor
+from code_assistant.utils.code_graph import build_code_graph
+from code_assistant.vector_db.stores import open_store
+from code_assistant.vector_db.vector_store import SEARCH_MODES
+
+LLM_BACKENDS = (
+    "code_assistant.llm.qrok_qwen_llm:GroqQwenLLM",
+    "code_assistant.llm.qwen_llm:QwenLLM",
+    "code_assistant.llm.deepseek_llm:DeepSeekLLM",
+)
+ADD_BATCH = 5000
+# entry points whose import time is measured, and dependencies they should not load
+STARTUP_MODULES = (
+    "code_assistant.cli",
+    "code_assistant.service.http_api",
+    "code_assistant.vector_db.ann_store",
+)
+HEAVY_MODULES = ("torch", "sentence_transformers", "llama_cpp", "chromadb")
+_IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+print(json.dumps({{"seconds": seconds, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def percentiles(samples_ms) -> dict:
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "p99_ms": float(np.percentile(samples, 99)),
+        "mean_ms": float(samples.mean()),
+    }
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Keep the stages' progress logs out of the benchmark output."""
+    logger = logging.getLogger("code_assistant")
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    try:
+        yield
+    finally:
+        logger.setLevel(level)
+
+
+def bench_chunking(paths) -> dict:
+    started = time.perf_counter()
+    chunks = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            chunks += len(CodeChunkExtractor(f.read()).get_chunks())
+    seconds = time.perf_counter() - started
+    return {
+        "files": len(paths),
+        "chunks": chunks,
+        "seconds": seconds,
+        "files_per_sec": len(paths) / seconds,
+        "chunks_per_sec": chunks / seconds,
+    }
+
+
+def bench_graph(root, workdir) -> dict:
+    started = time.perf_counter()
+    with _quiet():
+        store = build_code_graph(root, db_path=os.path.join(workdir, "graph.sqlite"))
+    seconds = time.perf_counter() - started
+    files = len(store.files())
+    store.close()
+    return {"files": files, "seconds": seconds, "files_per_sec": files / seconds}
+
+
+def bench_embed(root, workdir, parse_workers: int = 2, backend: str = "chroma") -> dict:
+    db = open_store(
+        backend,
+        persist_dir=os.path.join(workdir, "embed_store"),
+        encoder=StubEncoder(),
+        cache_size=0,
+    )
+    started = time.perf_counter()
+    with _quiet():
+        embed_project(root, parse_workers=parse_workers, db=db)
+    seconds = time.perf_counter() - started
+    chunks = db.count()
+    return {"chunks": chunks, "seconds": seconds, "chunks_per_sec": chunks / seconds}
+
+
+def bench_startup(modules=STARTUP_MODULES, runs: int = 3) -> dict:
+    """
+    Import time of each entry point in a fresh interpreter (best of runs), and the
+    heavy dependencies (torch, llama.cpp, ...) the import pulled in, if any.
+    """
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    out = {}
+    for module in modules:
+        script = _IMPORT_SCRIPT.format(module=module, heavy=HEAVY_MODULES)
+        samples = []
+        for _ in range(runs):
+            done = subprocess.run(
+                [sys.executable, "-c", script], capture_output=True, text=True, env=env, check=True
+            )
+            samples.append(json.loads(done.stdout))
+        out[module] = {
+            "import_seconds": min(sample["seconds"] for sample in samples),
+            "heavy_imports": samples[0]["heavy"],
+        }
+    return out
+
+
+def fill_store(db, size: int) -> float:
+    """Add size synthetic chunks to db; returns the seconds taken."""
+    started = time.perf_counter()
+    batch = []
+    for item in synthetic_chunks(size):
+        batch.append(item)
+        if len(batch) == ADD_BATCH:
+            ids, texts, metadata = zip(*batch, strict=True)
+            db.add(list(ids), list(texts), list(metadata))
+            batch = []
+    if batch:
+        ids, texts, metadata = zip(*batch, strict=True)
+        db.add(list(ids), list(texts), list(metadata))
+    return time.perf_counter() - started
+
+
+def bench_search(db, size: int, queries: int = 200, k: int = 5) -> dict:
+    result = {}
+    for mode in SEARCH_MODES:
+        samples = []
+        for query in synthetic_queries(queries, size):
+            started = time.perf_counter()
+            db.search(query, k=k, mode=mode)
+            samples.append((time.perf_counter() - started) * 1000)
+        result[mode] = percentiles(samples)
+
+    # the first synthetic package, 500 chunks: a filtered k-NN instead of a full one
+    samples = []
+    for query in synthetic_queries(queries, size):
+        started = time.perf_counter()
+        db.search(query, k=k, scope={"path": "pkg0"})
+        samples.append((time.perf_counter() - started) * 1000)
+    result["vector_scoped"] = percentiles(samples)
+
+    batch = synthetic_queries(queries, size)
+    started = time.perf_counter()
+    db.search_many(batch, k=k)
+    result["vector_batch"] = {"per_query_ms": (time.perf_counter() - started) * 1000 / queries}
+    return result
+
+
+def bench_recall(
+    db,
+    size: int,
+    queries: int = 200,
+    k: int = 10,
+    quantizations=(None, "int8", "pq"),
+    nprobes=(4, 16, 64),
+) -> dict:
+    """
+    recall@k and vector search latency of an AnnStore per quantization and nprobe.
+
+    A result counts as found when it is no farther than the exact k-th neighbour,
+    so ties between equally distant chunks are not counted as misses.
+    """
+    embeddings = [db.embed_query(query) for query in synthetic_queries(queries, size)]
+    kth = [db.nearest(embedding, k, exact=True)[1][-1] for embedding in embeddings]
+
+    out = {}
+    for quantization in quantizations:
+        db.quantization = quantization
+        started = time.perf_counter()
+        with _quiet():
+            db.build_index()
+        index = {"build_seconds": time.perf_counter() - started}
+        index["scan_bytes_per_vector"] = db.index_stats()["scan_bytes_per_vector"]
+        for nprobe in nprobes:
+            db.nprobe = nprobe
+            samples, found = [], 0
+            for embedding, limit in zip(embeddings, kth, strict=True):
+                started = time.perf_counter()
+                _, distances = db.nearest(embedding, k)
+                samples.append((time.perf_counter() - started) * 1000)
+                found += int((distances <= limit + 1e-5).sum())
+            index[f"nprobe_{nprobe}"] = {"recall": found / (k * len(embeddings))}
+            index[f"nprobe_{nprobe}"].update(percentiles(samples))
+        out[quantization or "float32"] = index
+    return out
+
+
+class StubLlama:
+    """Context size and token counting of a llama.cpp model, without weights."""
+
+    def n_ctx(self):
+        return 4096
+
+    def tokenize(self, data: bytes, add_bos: bool = False):
+        return [0] * (len(data) // 4 + 1)
+
+
+def offline_backend(target: str):
+    """An LLM backend instance that can build prompts but has no model or API client."""
+    module_name, _, class_name = target.partition(":")
+    module = importlib.import_module(module_name)
+    llm = object.__new__(getattr(module, class_name))
+    llm.model = StubLlama()
+    llm.packer = ContextPacker(llama_token_counter(llm.model))
+    llm.system_tokens = llm.packer.count_tokens(getattr(module, "SYSTEM_PROMPT", ""))
+    llm.context_tokens = 6000
+    return llm
+
+
+def bench_context(calls: int = 200, chunks: int = 12) -> dict:
+    items = list(synthetic_chunks(chunks))
+    # a few long chunks so packing has to trim and choose
+    docs = [text * (1 + 40 * (i % 4 == 0)) for i, (_, text, _) in enumerate(items)]
+    results = {
+        "ids": [[chunk_id for chunk_id, _, _ in items]],
+        "documents": [docs],
+        "metadatas": [[meta for _, _, meta in items]],
+        "distances": [[0.1 + 0.05 * i for i in range(chunks)]],
+    }
+    prompt = f"where is {items[0][2]['name']} called"
+
+    out = {}
+    for target in LLM_BACKENDS:
+        llm = offline_backend(target)
+        samples = []
+        with _quiet():
+            for _ in range(calls):
+                started = time.perf_counter()
+                llm._build_messages(prompt, results)
+                samples.append((time.perf_counter() - started) * 1000)
+        stats = percentiles(samples[1:] or samples)
+        stats["first_call_ms"] = samples[0]
+        out[target.rpartition(":")[2]] = stats
+    return out
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(
+    files: int = 200,
+    sizes=(10_000, 100_000, 1_000_000),
+    queries: int = 200,
+    workdir: str = None,
+    parse_workers: int = 2,
+    backends=("chroma", "ann"),
+) -> dict:
+    """
+    Run every benchmark offline on synthetic data and return the results as a dict.
+
+    - files: size of the synthetic repo used for chunking, graph and embedding
+    - sizes: chunk counts of the stores searched
+    - queries: queries timed per store and search mode
+    - workdir: where stores are written (a temporary folder by default)
+    - backends: vector stores searched (see STORE_BACKENDS); "ann" also reports recall@k
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = workdir or tmp
+        root = os.path.join(workdir, "repo")
+        paths = generate_repo(root, files=files)
+        results = {
+            "startup": bench_startup(),
+            "chunking": bench_chunking(paths),
+            "graph": bench_graph(root, workdir),
+            "embed": bench_embed(root, workdir, parse_workers, backends[0]),
+            "search": {},
+            "ann_recall": {},
+            "context": bench_context(),
+        }
+        for backend in backends:
+            results["search"][backend] = {}
+            for size in sizes:
+                db = open_store(
+                    backend,
+                    persist_dir=os.path.join(workdir, f"search_{backend}_{size}"),
+                    encoder=StubEncoder(),
+                    cache_size=0,
+                )
+                with _quiet():
+                    build_seconds = fill_store(db, size)
+                result = {"chunks": size, "build_seconds": build_seconds}
+                result.update(bench_search(db, size, queries))
+                results["search"][backend][str(size)] = result
+                if backend == "ann":
+                    results["ann_recall"][str(size)] = bench_recall(db, size, queries)
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "files": files,
+            "sizes": list(sizes),
+            "queries": queries,
+            "backends": list(backends),
+        },
+        "results": results,
+    }
+
+
+def _flatten(data, prefix=""):
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{name}.")
+        elif isinstance(value, (int, float)):
+            yield name, value
+
+
+def compare(old: dict, new: dict, threshold: float = 0.10):
+    """
+    [(metric, old, new, change)] for timing, throughput and recall metrics present in both
+    runs, and the subset that got worse by more than threshold.
+    """
+    old_metrics = dict(_flatten(old["results"]))
+    rows, regressions = [], []
+    for name, value in _flatten(new["results"]):
+        before = old_metrics.get(name)
+        if not before:
+            continue
+        if name.endswith(("_ms", "seconds")):
+            change = value / before - 1
+        elif name.endswith(("per_sec", "recall")):
+            change = before / value - 1 if value else float("inf")
+        else:
+            continue
+        rows.append((name, before, value, change))
+        if change > threshold:
+            regressions.append(rows[-1])
+    return rows, regressions
+
+
+def save(results: dict, path):
+    with open(path, "w", encoding="utf8") as f:
+        json.dump(results, f, indent=2)
+
+
+def load(path) -> dict:
+    with open(path, "r", encoding="utf8") as f:
+        return json.load(f)
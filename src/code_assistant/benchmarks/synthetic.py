@@ -0,0 +1,95 @@
+import os
+import random
+
+VERBS = ("load", "save", "refresh", "validate", "render", "parse", "sync", "issue", "resolve")
+NOUNS = ("Token", "User", "Session", "Order", "Invoice", "Cart", "Report", "Config", "Queue")
+
+
+def _names(rng, count):
+    return [f"{rng.choice(VERBS)}{rng.choice(NOUNS)}{i}" for i in range(count)]
+
+
+def module_source(index: int, files: int, rng: random.Random) -> str:
+    """One TypeScript module: imports, a service class, helper functions and arrow functions."""
+    lines = []
+    for other in rng.sample(range(files), k=min(2, files)):
+        if other != index:
+            lines.append(f"import {{ helper{other}_0 }} from './module{other}';")
+    lines.append("")
+    lines.append(f"export class {rng.choice(NOUNS)}Service{index} {{")
+    for name in _names(rng, rng.randint(3, 6)):
+        lines.append(f"  {name}(input: string, count: number): string {{")
+        lines.append("    const parts = input.split(',').map((p) => p.trim() + count);")
+        callee = rng.randrange(files)
+        lines.append(f"    if (parts.length > {rng.randint(1, 9)}) {{")
+        lines.append(f"      return helper{callee}_0(parts.join(';'));")
+        lines.append("    }")
+        lines.append("    return this.format(parts);")
+        lines.append("  }")
+        lines.append("")
+    lines.append("  format(parts: string[]): string {")
+    lines.append("    return parts.filter((p) => p.length > 0).join('|');")
+    lines.append("  }")
+    lines.append("}")
+    lines.append("")
+    for j in range(rng.randint(1, 3)):
+        lines.append(f"export function helper{index}_{j}(value: string): string {{")
+        lines.append(f"  return value.toUpperCase() + '{rng.choice(NOUNS)}';")
+        lines.append("}")
+        lines.append("")
+    lines.append(f"export const normalize{index} = (value: string) => value.toLowerCase();")
+    return "\n".join(lines) + "\n"
+
+
+def generate_repo(root, files: int = 200, seed: int = 0, per_dir: int = 50):
+    """Write a deterministic synthetic TypeScript repo under root; returns the file paths."""
+    rng = random.Random(seed)
+    paths = []
+    for index in range(files):
+        folder = os.path.join(root, f"pkg{index // per_dir}")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"module{index}.ts")
+        with open(path, "w", encoding="utf8") as f:
+            f.write(module_source(index, files, rng))
+        paths.append(path)
+    return paths
+
+
+def synthetic_chunks(count: int, seed: int = 0):
+    """Yield (id, text, metadata) for count method-sized chunks, without touching disk."""
+    rng = random.Random(seed)
+    for i in range(count):
+        name = f"{rng.choice(VERBS)}{rng.choice(NOUNS)}{i}"
+        callee = f"{rng.choice(VERBS)}{rng.choice(NOUNS)}{rng.randrange(count)}"
+        text = (
+            f"{name}(input: string): string {{\n"
+            f"  const value = input.trim();\n"
+            f"  return {callee}(value) + '{rng.choice(NOUNS)}';\n"
+            f"}}"
+        )
+        package = f"pkg{i // 500}"
+        path = f"/synthetic/{package}/module{i // 10}.ts"
+        meta = {
+            "file_path": path,
+            "name": name,
+            "type": "method_definition",
+            "start_line": (i % 10) * 4 + 1,
+            "end_line": (i % 10) * 4 + 4,
+            "language": "typescript",
+            "directory": package,
+            "package": package,
+            "dir_1": package,
+        }
+        yield f"{path}:{meta['start_line']}-{meta['end_line']}", text, meta
+
+
+def synthetic_queries(count: int, chunks: int, seed: int = 1):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        noun = rng.choice(NOUNS)
+        if rng.random() < 0.5:
+            queries.append(f"where is {rng.choice(VERBS)}{noun}{rng.randrange(chunks)} called")
+        else:
+            queries.append(f"how do we {rng.choice(VERBS)} the {noun.lower()}")
+    return queries
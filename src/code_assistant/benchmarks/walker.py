@@ -0,0 +1,94 @@
+"""
+Micro-benchmark of tree traversal on large files.
+
+    python -m code_assistant.benchmarks.walker [file ...]
+
+Without files, a synthetic TypeScript file of about 450k nodes is used. Reports
+nodes/sec for chunk extraction (tree-sitter query), graph extraction (TreeCursor
+walk) and, for reference, the recursive `node.children` walk they replaced.
+"""
+
+import sys
+import time
+
+from code_assistant.utils.code_chunk_extractor import CodeChunkExtractor
+from code_assistant.utils.code_graph import build_graph_for_file
+from code_assistant.utils.languages import LANGUAGES, language_for_path
+
+UNIT = """export class Service{i} {{
+  run(x: number) {{ return [1, 2, 3].map((y) => y + x + {i}); }}
+  other(a, b) {{ if (a) {{ return b.filter((z) => z > 1); }} return null; }}
+}}
+function helper{i}(a: string): string {{ const q = {{ a: 1, b: [1, 2] }}; return a + q.a; }}
+"""
+
+
+def synthetic_source(units: int = 3000) -> bytes:
+    return "".join(UNIT.format(i=i) for i in range(units)).encode("utf8")
+
+
+def count_nodes(tree) -> int:
+    cursor = tree.walk()
+    count = 0
+    while True:
+        count += 1
+        if cursor.goto_first_child():
+            continue
+        while not cursor.goto_next_sibling():
+            if not cursor.goto_parent():
+                return count
+
+
+def recursive_chunk_nodes(node, types):
+    """The previous walker: recursive, one `node.children` list per node."""
+    if node.type in types:
+        yield node
+    for child in node.children:
+        yield from recursive_chunk_nodes(child, types)
+
+
+def _best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(path: str = "synthetic.ts", code: bytes = None, repeat: int = 3) -> dict:
+    """Nodes/sec of each traversal over one file (best of repeat)."""
+    code = synthetic_source() if code is None else code
+    language = language_for_path(path)
+    extractor = CodeChunkExtractor(code, language=language.name)
+    nodes = count_nodes(extractor.tree)
+    types = LANGUAGES[language.name].chunk_types
+
+    timings = {
+        "query_chunks": _best_of(extractor.get_chunks, repeat),
+        "cursor_graph": _best_of(
+            lambda: build_graph_for_file(path, code, tree=extractor.tree), repeat
+        ),
+        "recursive_walk": _best_of(
+            lambda: list(recursive_chunk_nodes(extractor.tree.root_node, types)), repeat
+        ),
+    }
+    return {
+        "file": path,
+        "nodes": nodes,
+        "nodes_per_sec": {name: nodes / seconds for name, seconds in timings.items()},
+    }
+
+
+if __name__ == "__main__":
+    targets = sys.argv[1:] or [None]
+    for target in targets:
+        if target is None:
+            result = run()
+        else:
+            with open(target, "rb") as f:
+                result = run(target, f.read())
+        print(f"{result['file']}: {result['nodes']} nodes")
+        for name, rate in result["nodes_per_sec"].items():
+            print(f"  {name:>15}: {rate / 1e6:.2f} M nodes/sec")
@@ -0,0 +1,265 @@
+"""
+Command line entry point.
+
+    python -m code_assistant index PROJECT            # add, update and remove changed files
+    python -m code_assistant reindex PROJECT          # re-embed every file
+    python -m code_assistant query "how are invoices issued?" [--path services/billing]
+    python -m code_assistant query --batch queries.jsonl --out answers.jsonl
+    python -m code_assistant graph PROJECT [--out graph.json]
+    python -m code_assistant serve [--port 8765]      # HTTP API, see service.http_api
+
+Every command works without a browser session, so indexing and querying can run
+from CI or scripts; --metrics writes the run's metrics (.prom or JSON lines).
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import sys
+from pathlib import Path
+
+from code_assistant.embeddings.embedding import GRAPH_FILE, embed_project
+from code_assistant.llm.model_pool import BACKENDS
+from code_assistant.llm.streaming import strip_think, strip_think_stream
+from code_assistant.service.answer_cache import AnswerCache
+from code_assistant.service.batch import run_batch
+from code_assistant.service.http_api import make_server
+from code_assistant.service.query_service import QueryService
+from code_assistant.utils.code_graph import build_code_graph
+from code_assistant.utils.graph_store import CodeGraphStore
+from code_assistant.utils.logs import configure_logging
+from code_assistant.utils.metrics import METRICS
+from code_assistant.vector_db.stores import STORE_BACKENDS, open_store
+from code_assistant.vector_db.vector_store import SEARCH_MODES, result_hits
+
+LLM_BACKENDS = {"groq": "code_assistant.llm.qrok_qwen_llm:GroqQwenLLM", **BACKENDS}
+
+logger = logging.getLogger(__name__)
+
+
+def open_llm(name: str):
+    """Load an LLM_BACKENDS backend by name; None for "none" (search only)."""
+    if name == "none":
+        return None
+    module_name, _, class_name = LLM_BACKENDS[name].partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def open_service(args, llm_name: str) -> QueryService:
+    """A QueryService over the store in --storage, like the Streamlit app's."""
+    db = open_store(args.store, persist_dir=args.storage)
+    graph_path = Path(args.storage) / GRAPH_FILE
+    return QueryService(
+        db,
+        open_llm(llm_name),
+        answer_cache=AnswerCache(db.persist_dir / "answers.sqlite"),
+        search_mode=args.mode,
+        graph=CodeGraphStore(graph_path) if graph_path.exists() else None,
+    )
+
+
+def scope_from_args(args) -> dict:
+    scope = {
+        "path": args.path,
+        "language": args.language,
+        "type": args.type,
+        "package": args.package,
+    }
+    return {key: value for key, value in scope.items() if value} or None
+
+
+def cmd_index(args, incremental: bool = True) -> int:
+    db = open_store(args.store, persist_dir=args.storage)
+    embed_project(
+        args.project,
+        batch_size=args.batch_size,
+        parse_workers=args.workers,
+        incremental=incremental,
+        build_graph=not args.no_graph,
+        db=db,
+    )
+    return 0
+
+
+def cmd_reindex(args) -> int:
+    return cmd_index(args, incremental=False)
+
+
+def _print_sources(hits):
+    for hit in hits:
+        meta = hit["metadata"] or {}
+        print(
+            f"  {hit['distance']:.3f}  {meta.get('file_path')}:"
+            f"{meta.get('start_line')}-{meta.get('end_line')}  {meta.get('name')}"
+        )
+
+
+def cmd_query(args) -> int:
+    if not args.batch and not args.query:
+        print("query: give a question or --batch FILE", file=sys.stderr)
+        return 2
+    args.search_only = args.search_only or args.llm == "none"
+    service = open_service(args, "none" if args.search_only else args.llm)
+    try:
+        if args.batch:
+            return _query_batch(args, service)
+
+        scope = scope_from_args(args)
+        if args.search_only:
+            hits = result_hits(service.run(service.retrieve(args.query, k=args.k, scope=scope)))
+            if args.json:
+                print(json.dumps({"hits": hits}))
+            else:
+                _print_sources(hits)
+            return 0
+        if args.json:
+            response = service.submit(args.query, k=args.k, scope=scope).result()
+            print(
+                json.dumps(
+                    {
+                        "answer": strip_think(response["answer"]),
+                        "hits": result_hits(response["chunks"]),
+                        "timings": response["timings"],
+                    }
+                )
+            )
+            return 0
+        response = service.stream(args.query, k=args.k, scope=scope)
+        for piece in strip_think_stream(response):
+            print(piece, end="", flush=True)
+        print("\n\nSources:")
+        _print_sources(result_hits(response.chunks))
+        return 0
+    finally:
+        service.close()
+
+
+def _query_batch(args, service) -> int:
+    """
+    Answer every JSON line of --batch (a path or "-" for stdin), writing one JSON line
+    per request to --out. Lines are {"query": ...} objects (see service.batch.run_batch)
+    or plain question strings; command line options fill in k, scope and generation.
+    """
+    if args.batch == "-":
+        lines = [line for line in sys.stdin if line.strip()]
+    else:
+        with open(args.batch, encoding="utf8") as f:
+            lines = [line for line in f if line.strip()]
+    defaults = {"k": args.k, "mode": args.mode, "generate": not args.search_only}
+    scope = scope_from_args(args)
+    if scope:
+        defaults["scope"] = scope
+
+    requests = []
+    for line in lines:
+        try:
+            body = json.loads(line)
+        except json.JSONDecodeError:
+            body = line.strip()
+        if isinstance(body, str):
+            # a plain question
+            body = {"query": body}
+        requests.append({**defaults, **body} if isinstance(body, dict) else body)
+
+    results = run_batch(service, requests)
+    text = "".join(json.dumps(result) + "\n" for result in results)
+    if args.out == "-":
+        sys.stdout.write(text)
+    else:
+        with open(args.out, "w", encoding="utf8") as f:
+            f.write(text)
+    failed = sum("error" in result for result in results)
+    logger.info("Answered %d of %d requests", len(results) - failed, len(results))
+    return 1 if failed else 0
+
+
+def cmd_graph(args) -> int:
+    db_path = args.db or str(Path(args.storage) / GRAPH_FILE)
+    store = build_code_graph(args.project, db_path=db_path)
+    try:
+        if args.out:
+            with open(args.out, "w", encoding="utf8") as f:
+                json.dump(store.to_dict(), f, indent=2)
+            logger.info("Graph saved → %s", args.out)
+    finally:
+        store.close()
+    return 0
+
+
+def cmd_serve(args) -> int:
+    service = open_service(args, args.llm)
+    server = make_server(service, args.host, args.port)
+    logger.info("Serving on http://%s:%d", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m code_assistant")
+    parser.add_argument("--storage", default="./storage", help="vector store folder")
+    parser.add_argument(
+        "--store", choices=list(STORE_BACKENDS), help="vector store (default: VECTOR_STORE)"
+    )
+    parser.add_argument("--log-level", help="DEBUG, INFO, WARNING, ... (default: LOG_LEVEL)")
+    parser.add_argument("--metrics", help="write metrics here on exit (.prom or JSON lines)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, fn, help_text in (
+        ("index", cmd_index, "embed added and changed files, drop deleted ones"),
+        ("reindex", cmd_reindex, "re-embed every file of the project"),
+    ):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("project")
+        command.add_argument("--batch-size", type=int, default=256)
+        command.add_argument("--workers", type=int, help="parser processes (default: CPUs)")
+        command.add_argument("--no-graph", action="store_true", help="skip the code graph")
+        command.set_defaults(fn=fn)
+
+    def add_service_options(command):
+        command.add_argument("--mode", choices=SEARCH_MODES, default="hybrid")
+        command.add_argument(
+            "--llm", choices=[*LLM_BACKENDS, "none"], default="groq", help="none: search only"
+        )
+
+    query = commands.add_parser("query", help="answer a question or a JSONL batch")
+    query.add_argument("query", nargs="?")
+    add_service_options(query)
+    query.add_argument("-k", type=int, default=5, help="chunks to retrieve")
+    query.add_argument("--batch", help="JSON lines of requests, '-' for stdin")
+    query.add_argument("--out", default="-", help="batch results file (default: stdout)")
+    query.add_argument("--search-only", action="store_true", help="retrieve without an LLM")
+    query.add_argument("--json", action="store_true", help="print one JSON object")
+    query.add_argument("--path", help="limit to a folder, relative to the project root")
+    for key in ("language", "type", "package"):
+        query.add_argument(f"--{key}", action="append", help=f"limit to this {key} (repeatable)")
+    query.set_defaults(fn=cmd_query)
+
+    graph = commands.add_parser("graph", help="build or refresh the code graph only")
+    graph.add_argument("project")
+    graph.add_argument("--db", help=f"graph database (default: STORAGE/{GRAPH_FILE})")
+    graph.add_argument("--out", help="also export the graph as JSON")
+    graph.set_defaults(fn=cmd_graph)
+
+    serve = commands.add_parser("serve", help="serve search and generation over HTTP")
+    add_service_options(serve)
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.set_defaults(fn=cmd_serve)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    configure_logging(args.log_level)
+    try:
+        return args.fn(args)
+    finally:
+        if args.metrics:
+            METRICS.write(args.metrics)
@@ -0,0 +1,82 @@
+import os
+import time
+
+# rough live activation memory per padded token for a 768-dim encoder at inference
+# (hidden states, 4x FFN intermediate and attention buffers in float32)
+BYTES_PER_TOKEN = 768 * 4 * 32
+
+
+def auto_token_budget(device: str, memory_fraction: float = 0.25, cap: int = 65_536) -> int:
+    """
+    Pick how many padded tokens one encode batch may hold on this device.
+
+    Uses available RAM on CPU and the recommended working set on MPS.
+    """
+    import torch
+
+    available = None
+    if device == "mps" and hasattr(torch.mps, "recommended_max_memory"):
+        available = torch.mps.recommended_max_memory() - torch.mps.current_allocated_memory()
+    elif hasattr(os, "sysconf") and "SC_AVPHYS_PAGES" in os.sysconf_names:
+        available = os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    if not available or available <= 0:
+        return 8192
+    return max(512, min(cap, int(available * memory_fraction) // BYTES_PER_TOKEN))
+
+
+def iter_token_batches(
+    chunks, count_tokens, token_budget: int, max_batch_size: int = 256, window: int = 2048
+):
+    """
+    Pack chunks into batches of similar token length.
+
+    Chunks are read `window` at a time, sorted by token count and packed so that
+    len(batch) * longest chunk in batch (the padded size) stays within token_budget.
+    count_tokens maps a list of texts to a list of token counts; each chunk gets a
+    "tokens" key with its count.
+    """
+    buffer = []
+    for ch in chunks:
+        buffer.append(ch)
+        if len(buffer) >= window:
+            yield from _pack(buffer, count_tokens, token_budget, max_batch_size)
+            buffer = []
+    if buffer:
+        yield from _pack(buffer, count_tokens, token_budget, max_batch_size)
+
+
+def _pack(chunks, count_tokens, token_budget: int, max_batch_size: int):
+    for ch, tokens in zip(chunks, count_tokens([ch["text"] for ch in chunks]), strict=True):
+        ch["tokens"] = tokens
+    chunks.sort(key=lambda ch: ch["tokens"])
+
+    batch = []
+    for ch in chunks:
+        # sorted ascending, so the new chunk is the longest in the batch
+        padded = (len(batch) + 1) * ch["tokens"]
+        if batch and (padded > token_budget or len(batch) >= max_batch_size):
+            yield batch
+            batch = []
+        batch.append(ch)
+    if batch:
+        yield batch
+
+
+class Throughput:
+    """Chunks/sec and tokens/sec over an embedding run."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.chunks = 0
+        self.tokens = 0
+
+    def add(self, batch):
+        self.chunks += len(batch)
+        self.tokens += sum(ch.get("tokens", 0) for ch in batch)
+
+    def report(self) -> str:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return (
+            f"{self.chunks} chunks in {elapsed:.1f}s: "
+            f"{self.chunks / elapsed:.1f} chunks/sec, {self.tokens / elapsed:.0f} tokens/sec"
+        )
@@ -1,9 +1,22 @@
+import logging
 import os
 
-import torch
+from code_assistant.embeddings.batcher import Throughput, auto_token_budget, iter_token_batches
+from code_assistant.embeddings.manifest import Manifest
+from code_assistant.embeddings.pipeline import iter_chunked_files, iter_source_files, peak_rss_mb
+from code_assistant.utils.graph_store import CodeGraphStore
+from code_assistant.utils.logs import configure_logging
+from code_assistant.utils.metrics import METRICS
+from code_assistant.vector_db.scope import directory_metadata
+from code_assistant.vector_db.stores import open_store
+from code_assistant.vector_db.vector_store import VectorStore
 
-from code_assistant.utils.code_chunk_extractor import CodeChunkExtractor
-from code_assistant.vector_db.chroma_store import ChromaStore
+MANIFEST_FILE = "manifest.json"
+GRAPH_FILE = "code_graph.sqlite"
+# bumped when chunk metadata gains fields; files stored with an older version are re-embedded
+METADATA_VERSION = 1
+
+logger = logging.getLogger(__name__)
 
 
 def sanitize_metadata(meta: dict) -> dict:
@@ -17,73 +30,121 @@ def sanitize_metadata(meta: dict) -> dict:
     return sanitized
 
 
-def get_processed_ids(db) -> set:
-    """Retrieve IDs already stored in the DB to allow resumable embedding."""
+def get_processed_ids(db, ids=None) -> set:
+    """
+    Retrieve IDs already stored in the DB to allow resumable embedding.
+
+    With ids, only that batch is checked; otherwise every ID is streamed.
+    """
     try:
-        all_docs = db.get_all() or []
-        return set([doc["id"] for doc in all_docs])
+        if ids is not None:
+            return db.existing_ids(ids)
+        return set(db.iter_ids())
     except Exception:
         return set()
 
 
-def embed_project(folder_path: str, batch_size: int = 4, use_mps: bool = True):
+def chunk_id(ch: dict) -> str:
+    return f"{ch['file_path']}:{ch['start_line']}-{ch['end_line']}"
+
+
+def embed_project(
+    folder_path: str,
+    batch_size: int = 256,
+    use_mps: bool = True,
+    token_budget: int = None,
+    parse_workers: int = None,
+    queue_size: int = 64,
+    incremental: bool = True,
+    build_graph: bool = True,
+    parse_cache_dir: str = None,
+    db: VectorStore = None,
+):
     """
-    Embed all TypeScript files in a folder and store in ChromaDB safely.
+    Embed all source files in a folder and store them in the vector store safely.
+
+    Files are parsed and chunked in a process pool while the embedding stage
+    drains the results, so parsing and embedding overlap. A manifest of indexed
+    files is kept next to the vector store; with incremental=True only added,
+    changed and deleted files are touched, and vectors of changed or deleted
+    files are removed. Chunks are batched by token length so that short and
+    long chunks are not padded to the same size. Each file is parsed once: the
+    code graph next to the vector store is updated from the same parse tree.
+    Chunks are stored with their language, package and directory prefixes relative
+    to folder_path, so searches can be scoped to them (see vector_db.scope).
 
-    - batch_size: number of chunks processed at once
+    - batch_size: max number of chunks processed at once
+    - token_budget: max padded tokens per batch (defaults to a budget sized to free memory)
+    - parse_workers: parser processes (defaults to the CPU count)
+    - queue_size: parsed files buffered ahead of the embedding stage
+    - incremental: reuse the manifest instead of rescanning every file
+    - build_graph: keep the code graph (GRAPH_FILE) in step with the vectors
+    - parse_cache_dir: cache extraction results by content hash in this folder
+    - db: vector store to fill (defaults to open_store(), i.e. VECTOR_STORE, in ./storage)
     """
     if not folder_path or not os.path.exists(folder_path):
         raise ValueError("Invalid folder path")
 
-    print(f"Scanning project folder: {folder_path}")
-
-    all_chunks = []
-    for root, _, files in os.walk(folder_path):
-        for file in files:
-            if file.endswith(".ts"):
-                full_path = os.path.join(root, file)
-                with open(full_path, "r", encoding="utf8") as f:
-                    code = f.read()
-                extractor = CodeChunkExtractor(code)
-                chunks = extractor.get_chunks()
-                for ch in chunks:
-                    ch["file_path"] = full_path
-                    all_chunks.append(ch)
-
-    if not all_chunks:
-        print("No TypeScript files found.")
-        return
+    logger.info("Scanning project folder: %s", folder_path)
 
-    print(f"Found {len(all_chunks)} code chunks.")
+    # imported here so the CLI and the app start without loading torch
+    import torch
 
     device = "mps" if torch.backends.mps.is_available() else "cpu"
-    print(f"Using device: {device}")
+    logger.info("Using device: %s", device)
+    token_budget = token_budget or auto_token_budget(device)
+    logger.info("Token budget per batch: %d", token_budget)
 
-    db = ChromaStore()
-    processed_ids = get_processed_ids(db)
-    print(f"{len(processed_ids)} chunks already embedded. Resuming...")
+    db = db or open_store()
+    # files left unchanged are skipped below, so their chunks reach BM25 only here
+    db.backfill_lexical_index()
+    manifest = Manifest(db.persist_dir / MANIFEST_FILE)
+    graph = CodeGraphStore(db.persist_dir / GRAPH_FILE) if build_graph else None
+    logger.info("%d chunks already embedded. Resuming...", db.count())
 
-    for i in range(0, len(all_chunks), batch_size):
-        batch = all_chunks[i : i + batch_size]
+    seen = set()
+    package_cache = {}
+    stats = {}
 
-        batch = [
-            ch
-            for ch in batch
-            if f"{ch['file_path']}:{ch['start_line']}-{ch['end_line']}" not in processed_ids
-        ]
+    def in_graph(path):
+        """The graph holds the manifest's version of path (always true without a graph)."""
+        return graph is None or graph.file_hash(path) == manifest.get(path)["hash"]
+
+    def metadata_current(path):
+        return manifest.metadata_version(path) == METADATA_VERSION
+
+    def changed_files():
+        for path in iter_source_files(folder_path):
+            seen.add(path)
+            stat = os.stat(path)
+            if (
+                incremental
+                and manifest.is_unchanged(path, stat)
+                and in_graph(path)
+                and metadata_current(path)
+            ):
+                continue
+            stats[path] = stat
+            yield path
+
+    def embed_batch(batch):
+        processed_ids = get_processed_ids(db, [chunk_id(ch) for ch in batch])
+        batch = [ch for ch in batch if chunk_id(ch) not in processed_ids]
         if not batch:
-            continue
+            return
 
         texts = [ch["text"] for ch in batch]
-        ids = [f"{ch['file_path']}:{ch['start_line']}-{ch['end_line']}" for ch in batch]
+        ids = [chunk_id(ch) for ch in batch]
         metadata = [
             sanitize_metadata(
                 {
                     "file_path": ch["file_path"],
                     "name": ch["name"],
                     "type": ch["node_type"],
+                    "language": ch.get("language"),
                     "start_line": ch["start_line"],
                     "end_line": ch["end_line"],
+                    **directory_metadata(ch["file_path"], folder_path, package_cache),
                 }
             )
             for ch in batch
@@ -94,11 +155,139 @@ def embed_project(folder_path: str, batch_size: int = 4, use_mps: bool = True):
         if device == "mps":
             torch.mps.empty_cache()
 
-        print(f"Processed batch {i} → {i + len(batch)}")
+    known_hashes = {}
+    if incremental:
+        known_hashes = {
+            path: entry["hash"]
+            for path, entry in manifest.entries.items()
+            if in_graph(path) and metadata_current(path)
+        }
+
+    total = 0
+    changed = 0
+    graph_updates = 0
+    # files with chunks not yet stored: path -> [content hash, chunk ids, chunks remaining]
+    unstored = {}
+
+    def mark_stored(batch):
+        for ch in batch:
+            entry = unstored[ch["file_path"]]
+            entry[2] -= 1
+            if not entry[2]:
+                del unstored[ch["file_path"]]
+                manifest.record(
+                    ch["file_path"],
+                    stats.pop(ch["file_path"]),
+                    entry[0],
+                    entry[1],
+                    METADATA_VERSION,
+                )
+
+    def changed_chunks():
+        nonlocal changed, graph_updates
+        for path, content_hash, chunks, file_graph in iter_chunked_files(
+            changed_files(),
+            workers=parse_workers,
+            queue_size=queue_size,
+            known_hashes=known_hashes,
+            with_graph=True,
+            parse_cache_dir=str(parse_cache_dir) if parse_cache_dir else None,
+        ):
+            if chunks is None:
+                manifest.touch(path, stats.pop(path))
+                continue
+
+            old = manifest.get(path)
+            if graph is not None:
+                graph.replace_file(path, content_hash, *file_graph)
+                graph_updates += 1
+                if (
+                    incremental
+                    and old
+                    and old["hash"] == content_hash
+                    and metadata_current(path)
+                ):
+                    # only the graph was behind; the stored vectors are current
+                    manifest.touch(path, stats.pop(path))
+                    continue
+
+            changed += 1
+            if old:
+                db.delete(old["chunk_ids"])
+
+            ids = [chunk_id(ch) for ch in chunks]
+            if not chunks:
+                manifest.record(path, stats.pop(path), content_hash, ids, METADATA_VERSION)
+                continue
+            unstored[path] = [content_hash, ids, len(chunks)]
+            yield from chunks
+
+    throughput = Throughput()
+    try:
+        for batch in iter_token_batches(
+            changed_chunks(), db.count_tokens, token_budget, max_batch_size=batch_size
+        ):
+            with METRICS.timer("ingest_batch_seconds"):
+                embed_batch(batch)
+            METRICS.inc("ingest_chunks_total", len(batch))
+            throughput.add(batch)
+            logger.debug(
+                "Processed batch %d → %d (up to %d tokens per chunk)",
+                total,
+                total + len(batch),
+                batch[-1]["tokens"],
+            )
+            total += len(batch)
+            mark_stored(batch)
+
+        deleted = [path for path in manifest.files_under(folder_path) if path not in seen]
+        for path in deleted:
+            db.delete(manifest.remove(path)["chunk_ids"])
+        if graph is not None:
+            prefix = os.path.join(folder_path, "")
+            for path in graph.files():
+                if path.startswith(prefix) and path not in seen:
+                    graph.remove_file(path)
+                    graph_updates += 1
+            if graph_updates:
+                graph.rebuild_neighbours()
+    finally:
+        manifest.save()
+        db.flush()
+        if graph is not None:
+            graph.close()
+
+    if not seen:
+        logger.warning("No source files found.")
+        return
 
-    print("✅ All code chunks embedded and stored successfully!")
+    METRICS.inc("ingest_files_total", changed, status="changed")
+    METRICS.inc("ingest_files_total", len(deleted), status="deleted")
+    METRICS.inc("ingest_files_total", len(seen) - changed, status="unchanged")
+    logger.info(
+        "%d changed, %d deleted, %d unchanged files.",
+        changed,
+        len(deleted),
+        len(seen) - changed,
+    )
+    if graph is not None:
+        logger.info("Code graph: %d files updated.", graph_updates)
+    logger.info("Found %d code chunks.", total)
+    if db.embedding_cache is not None:
+        cache = db.embedding_cache.stats()
+        logger.info("Embedding cache: %d hits, %d misses.", cache["hits"], cache["misses"])
+    logger.info("Throughput: %s", throughput.report())
+    if db.encoder.loaded:
+        logger.info("Embedding model load: %.1fs", db.encoder.load_seconds)
+    own_rss, worker_rss = peak_rss_mb()
+    logger.info("Peak RSS: %.0f MB (largest parser worker: %.0f MB)", own_rss, worker_rss)
+    logger.info("✅ All code chunks embedded and stored successfully!")
 
 
 if __name__ == "__main__":
+    configure_logging()
     path = input("Enter your project folder(e.g. '/Users/your_name/Desktop/project_folder'): ")
     embed_project(path)
+    # METRICS_PATH=ingest.prom (Prometheus text) or ingest.jsonl (JSON lines)
+    if os.environ.get("METRICS_PATH"):
+        METRICS.write(os.environ["METRICS_PATH"])
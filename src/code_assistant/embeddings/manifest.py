@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+class Manifest:
+    """
+    Persistent record of indexed files: path -> mtime, size, content hash and chunk IDs.
+
+    Lets a re-index skip files whose stat is unchanged, skip re-embedding files whose
+    content hash is unchanged, and find the vectors of changed or deleted files.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.entries = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf8") as f:
+                self.entries = json.load(f).get("files", {})
+
+    def get(self, file_path: str):
+        return self.entries.get(file_path)
+
+    def is_unchanged(self, file_path: str, stat: os.stat_result) -> bool:
+        """Cheap check on mtime and size, without reading the file."""
+        entry = self.entries.get(file_path)
+        return (
+            entry is not None
+            and entry["mtime"] == stat.st_mtime_ns
+            and entry["size"] == stat.st_size
+        )
+
+    def record(
+        self,
+        file_path: str,
+        stat: os.stat_result,
+        content_hash: str,
+        chunk_ids,
+        metadata_version: int = 0,
+    ):
+        self.entries[file_path] = {
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "hash": content_hash,
+            "chunk_ids": list(chunk_ids),
+            "metadata_version": metadata_version,
+        }
+
+    def metadata_version(self, file_path: str) -> int:
+        """Version of the chunk metadata stored for file_path (0 for older entries)."""
+        entry = self.entries.get(file_path)
+        return entry.get("metadata_version", 0) if entry is not None else 0
+
+    def touch(self, file_path: str, stat: os.stat_result):
+        """Refresh the stat of a file whose content hash did not change."""
+        entry = self.entries[file_path]
+        entry["mtime"] = stat.st_mtime_ns
+        entry["size"] = stat.st_size
+
+    def remove(self, file_path: str):
+        return self.entries.pop(file_path, None)
+
+    def files_under(self, folder_path: str):
+        prefix = os.path.join(folder_path, "")
+        return [p for p in self.entries if p.startswith(prefix)]
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf8") as f:
+            json.dump({"version": 1, "files": self.entries}, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,163 @@
+import logging
+import multiprocessing
+import os
+import queue
+import resource
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from code_assistant.embeddings.manifest import hash_bytes
+from code_assistant.utils.extraction import ParseCache, extract_cached
+from code_assistant.utils.languages import LANGUAGES, get_parser, source_extensions
+from code_assistant.utils.logs import configure_logging
+
+_DONE = object()
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker():
+    """Load every grammar once per worker process."""
+    configure_logging()
+    for language in LANGUAGES:
+        get_parser(language)
+
+
+def chunk_file(
+    path: str, known_hash: str = None, with_graph: bool = False, parse_cache_dir: str = None
+):
+    """
+    Read, hash and chunk a single file. Runs inside a pool worker.
+
+    Returns (path, content_hash, chunks); chunks is None when the content
+    hash equals known_hash, i.e. the file does not need re-embedding.
+    With with_graph, a fourth item holds the file's (nodes, edges), built
+    from the same parse tree (None when the file was skipped).
+    A file that cannot be read or parsed is logged and gives no chunks.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        logger.warning("Skipping unreadable %s: %s", path, e)
+        data = b""
+    content_hash = hash_bytes(data)
+    if content_hash == known_hash:
+        return (path, content_hash, None) + ((None,) if with_graph else ())
+
+    cache = ParseCache(parse_cache_dir) if parse_cache_dir else None
+    try:
+        chunks, nodes, edges = extract_cached(path, data, content_hash, cache, with_graph)
+    except Exception as e:
+        # e.g. a file that is not UTF-8: index the rest of the project without it
+        logger.warning("Skipping %s, it could not be parsed: %s", path, e)
+        chunks, nodes, edges = [], {}, []
+    if with_graph:
+        return path, content_hash, chunks, (nodes, edges)
+    return path, content_hash, chunks
+
+
+def iter_source_files(folder_path: str, extensions=None):
+    """Files under folder_path in a supported language (or with one of extensions)."""
+    extensions = tuple(extensions or source_extensions())
+    for root, _, files in os.walk(folder_path):
+        for file in files:
+            if file.endswith(extensions):
+                yield os.path.join(root, file)
+
+
+def peak_rss_mb():
+    """Peak RSS in MB of this process and of its largest finished worker process."""
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    unit = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return own * unit / 2**20, workers * unit / 2**20
+
+
+def _produce(
+    paths, known_hashes, out_queue: queue.Queue, workers: int, stop: threading.Event, options
+):
+    """
+    Submit files to the process pool and push finished chunk lists onto out_queue.
+
+    At most 2 * workers files are in flight at once, and a full out_queue blocks
+    this thread, so parsing never runs far ahead of the embedding stage.
+    """
+    try:
+        # spawn: this thread's process is multi-threaded, forking it is unsafe
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=ctx, initializer=_init_worker
+        ) as pool:
+            pending = set()
+            paths = iter(paths)
+            exhausted = False
+            while not stop.is_set() and (pending or not exhausted):
+                while not exhausted and len(pending) < workers * 2:
+                    path = next(paths, None)
+                    if path is None:
+                        exhausted = True
+                        break
+                    pending.add(
+                        pool.submit(chunk_file, path, known_hashes.get(path), **options)
+                    )
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    out_queue.put(fut.result())
+            for fut in pending:
+                fut.cancel()
+    except BaseException as e:  # surface worker errors in the consumer
+        out_queue.put(e)
+    finally:
+        out_queue.put(_DONE)
+
+
+def iter_chunked_files(
+    paths,
+    workers: int = None,
+    queue_size: int = 64,
+    known_hashes=None,
+    with_graph: bool = False,
+    parse_cache_dir: str = None,
+):
+    """
+    Parse and chunk files in parallel, yielding (path, content_hash, chunks) as they complete.
+
+    - workers: parser processes (defaults to the CPU count)
+    - queue_size: max parsed files buffered ahead of the consumer
+    - known_hashes: path -> previous content hash; matching files are not parsed
+    - with_graph: also yield each file's (nodes, edges), from the same parse
+    - parse_cache_dir: reuse extraction results cached there by content hash
+    """
+    options = {"with_graph": with_graph, "parse_cache_dir": parse_cache_dir}
+    workers = workers or os.cpu_count() or 1
+    out_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=_produce,
+        args=(paths, known_hashes or {}, out_queue, workers, stop, options),
+        daemon=True,
+    )
+    producer.start()
+
+    try:
+        while True:
+            item = out_queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # drain so a producer blocked on a full queue can exit
+        while producer.is_alive():
+            try:
+                out_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        producer.join()
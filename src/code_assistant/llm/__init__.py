@@ -1,5 +1,17 @@
-from .deepseek_llm import DeepSeekLLM
-from .qrok_qwen_llm import GroqQwenLLM
-from .qwen_llm import QwenLLM
+import importlib
+
+# backends are imported on first access, so the model pool and the CLI can
+# import this package without loading llama.cpp or torch
+_EXPORTS = {
+    "DeepSeekLLM": ".deepseek_llm",
+    "GroqQwenLLM": ".qrok_qwen_llm",
+    "QwenLLM": ".qwen_llm",
+}
 
 __all__ = ["QwenLLM", "DeepSeekLLM", "GroqQwenLLM"]
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
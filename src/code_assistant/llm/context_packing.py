@@ -0,0 +1,157 @@
+import logging
+from collections import OrderedDict
+
+import tiktoken
+
+from code_assistant.vector_db.lexical_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# markdown code fence tags that differ from the chunk's utils.languages name
+FENCE_TAGS = {"typescript": "ts"}
+
+
+def fence_tag(metadata) -> str:
+    """Code fence tag for a chunk's metadata; chunks without a language are TypeScript."""
+    language = (metadata or {}).get("language") or "typescript"
+    return FENCE_TAGS.get(language, language)
+
+
+def llama_token_counter(model):
+    """Count tokens with a llama.cpp model's own tokenizer."""
+    return lambda text: len(model.tokenize(text.encode("utf8"), add_bos=False))
+
+
+def tiktoken_counter(encoding: str = "cl100k_base"):
+    """
+    Count tokens with a tiktoken encoding, loaded on first use.
+
+    tiktoken downloads encodings the first time; when that fails (offline) counts
+    fall back to about 4 characters per token.
+    """
+    enc = None
+
+    def count(text: str) -> int:
+        nonlocal enc
+        if enc is None:
+            try:
+                enc = tiktoken.get_encoding(encoding)
+            except Exception as e:
+                logger.warning(
+                    "tiktoken encoding %s unavailable (%s), estimating tokens", encoding, e
+                )
+                enc = False
+        if enc is False:
+            return len(text) // 4 + 1
+        return len(enc.encode(text, disallowed_special=()))
+
+    return count
+
+
+class ContextPacker:
+    """
+    Choose which retrieved chunks go into the prompt under a token budget.
+
+    Tokens are counted with the backend's tokenizer and cached per chunk ID (and
+    text). Chunks larger than `max_chunk_tokens` are first trimmed to the lines
+    around the query's identifiers; the set of chunks is then chosen as a 0/1
+    knapsack maximizing total relevance, rather than keeping a greedy prefix.
+    """
+
+    def __init__(self, count_tokens, per_chunk_overhead: int = 24, cache_size: int = 10_000):
+        self.count_tokens = count_tokens
+        self.per_chunk_overhead = per_chunk_overhead
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+    def count(self, chunk_id: str, text: str) -> int:
+        key = (chunk_id, hash(text))
+        tokens = self.cache.get(key)
+        if tokens is None:
+            tokens = self.count_tokens(text)
+            self.cache[key] = tokens
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(key)
+        return tokens
+
+    def trim(self, text: str, query: str, max_tokens: int) -> str:
+        """Keep the run of lines around the line sharing most identifiers with query."""
+        lines = text.split("\n")
+        wanted = set(tokenize(query))
+        scores = [len(wanted.intersection(tokenize(line))) for line in lines]
+        center = scores.index(max(scores))
+        costs = [self.count_tokens(line) + 1 for line in lines]
+
+        start, end, used = center, center + 1, costs[center]
+        while True:
+            grew = False
+            for side in ("down", "up"):
+                if side == "down" and end < len(lines) and used + costs[end] <= max_tokens:
+                    used += costs[end]
+                    end += 1
+                    grew = True
+                elif side == "up" and start > 0 and used + costs[start - 1] <= max_tokens:
+                    start -= 1
+                    used += costs[start]
+                    grew = True
+            if not grew:
+                break
+        return "\n".join(lines[start:end])
+
+    @staticmethod
+    def _knapsack(weights, values, capacity: int):
+        """Indices maximizing sum(values) with sum(weights) <= capacity."""
+        best = [0.0] * (capacity + 1)
+        keep = [[False] * (capacity + 1) for _ in weights]
+        for i, (w, v) in enumerate(zip(weights, values, strict=True)):
+            for c in range(capacity, w - 1, -1):
+                if best[c - w] + v > best[c]:
+                    best[c] = best[c - w] + v
+                    keep[i][c] = True
+        chosen = []
+        c = capacity
+        for i in range(len(weights) - 1, -1, -1):
+            if keep[i][c]:
+                chosen.append(i)
+                c -= weights[i]
+        return sorted(chosen)
+
+    def pack(self, results, query: str, budget: int, max_chunk_tokens: int = None):
+        """
+        Return a copy of a Chroma query result holding only the chunks that fit budget.
+
+        Relevance is 1 / (1 + distance) when distances are present, else 1 / (1 + rank).
+        Chunks keep their original order.
+        """
+        ids = results["ids"][0]
+        docs = list(results["documents"][0])
+        distances = (results.get("distances") or [None])[0]
+        if not ids or budget <= 0:
+            return {key: [[]] for key in ("ids", "distances", "documents", "metadatas")}
+        max_chunk_tokens = max_chunk_tokens or max(budget // 2, 1)
+
+        tokens = []
+        for i, chunk_id in enumerate(ids):
+            count = self.count(chunk_id, docs[i])
+            if count > max_chunk_tokens:
+                docs[i] = self.trim(docs[i], query, max_chunk_tokens)
+                count = self.count_tokens(docs[i])
+            tokens.append(count + self.per_chunk_overhead)
+
+        if distances:
+            values = [1.0 / (1.0 + max(d, 0.0)) for d in distances]
+        else:
+            values = [1.0 / (1.0 + rank) for rank in range(len(ids))]
+
+        # knapsack over coarse token units keeps the table small for large budgets
+        unit = max(1, budget // 512)
+        weights = [-(-t // unit) for t in tokens]
+        chosen = self._knapsack(weights, values, budget // unit)
+
+        packed = {"ids": [[ids[i] for i in chosen]], "documents": [[docs[i] for i in chosen]]}
+        for key in ("distances", "metadatas"):
+            if results.get(key):
+                packed[key] = [[results[key][0][i] for i in chosen]]
+        return packed
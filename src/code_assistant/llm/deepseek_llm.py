@@ -1,8 +1,17 @@
+import logging
 import os
 
-import torch
 from llama_cpp import Llama
 
+from code_assistant.utils.metrics import METRICS
+
+from .context_packing import ContextPacker, fence_tag, llama_token_counter
+from .prompt_cache import PromptCache
+
+# RAM for the KV states of recent requests; a full 4k context is about 2 GB on a 7B
+# model without grouped-query attention, so this keeps the latest two sessions
+SESSION_CACHE_MB = 4096
+
 SYSTEM_PROMPT = """
     You are Bizden Code Assistant, a helpful AI assistant specialized in software development and code understanding. 
     Guidelines for you:
@@ -17,9 +26,20 @@ SYSTEM_PROMPT = """
     9. Only answer questions related to coding, code explanation, code generation, software projects, and technology. For any other type of question, respond: "I am specialized in coding and technology questions, and cannot provide advice on this topic."
 """
 
+logger = logging.getLogger(__name__)
+
 
 class DeepSeekLLM:
-    def __init__(self, model_path: str = None):
+    # context tokens kept free for the answer
+    answer_reserve = 1024
+
+    def __init__(
+        self,
+        model_path: str = None,
+        n_threads: int = 8,
+        prompt_cache_dir: str = "./storage/prompt_cache",
+        session_cache_mb: int = SESSION_CACHE_MB,
+    ):
         if model_path is None:
             model_path = os.path.join(
                 os.path.dirname(__file__),
@@ -27,19 +47,38 @@ class DeepSeekLLM:
             )
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"Model not found at {model_path}")
+        import torch
+
         torch.mps.empty_cache()
         self.model = Llama(
-            model_path=model_path, n_gpu_layers=0, mps=False, n_ctx=4096, n_threads=8
+            model_path=model_path, n_gpu_layers=0, mps=False, n_ctx=4096, n_threads=n_threads
+        )
+        self.packer = ContextPacker(llama_token_counter(self.model))
+        # no system message: the fixed prefix is the chat template's own header
+        self.prompt_cache = PromptCache(
+            self.model,
+            model_path,
+            [{"role": "assistant", "content": "Here is the context:\n"}],
+            cache_dir=prompt_cache_dir,
+            session_cache_mb=session_cache_mb,
         )
 
-    def _generate_answer(self, prompt: str, chunks) -> str:
-        """
-        Generate answer using all available chunks without truncating.
-        """
-        chunks = self._normalize_results(chunks)
-        context = self._make_llm_context(chunks)
+    @property
+    def last_prefill(self):
+        """Prompt tokens skipped / evaluated by the latest request."""
+        return self.prompt_cache.last_prefill
 
-        messages = [
+    def _context_budget(self, prompt: str) -> int:
+        fixed = self.packer.count_tokens(prompt) + 64
+        return self.model.n_ctx() - fixed - self.answer_reserve
+
+    def _build_messages(self, prompt: str, chunks):
+        with METRICS.timer("context_build_seconds", backend=type(self).__name__):
+            chunks = self.packer.pack(chunks, prompt, self._context_budget(prompt))
+            chunks = self._normalize_results(chunks)
+            context = self._make_llm_context(chunks)
+
+        return [
             # {"role": "system", "content": SYSTEM_PROMPT},
             {
                 "role": "assistant",
@@ -48,15 +87,30 @@ class DeepSeekLLM:
             {"role": "user", "content": prompt},
         ]
 
+    def _generate_answer(self, prompt: str, chunks) -> str:
+        """
+        Generate answer from the chunks that fit the context window.
+        """
+        messages = self._build_messages(prompt, chunks)
+        self.prompt_cache.begin()
         result = self.model.create_chat_completion(messages=messages, temperature=0.2)
 
         return result["choices"][0]["message"]["content"].strip()
 
+    def _stream_answer(self, prompt: str, chunks):
+        messages = self._build_messages(prompt, chunks)
+        self.prompt_cache.begin()
+        stream = self.model.create_chat_completion(messages=messages, temperature=0.2, stream=True)
+        for part in stream:
+            token = part["choices"][0]["delta"].get("content")
+            if token:
+                yield token
+
     def _make_llm_context(self, chunks):
         parts = []
         for c in chunks:
-            print(c)
-            parts.append(f"###\n```ts\n{c['code']}\n```")
+            logger.debug("Context chunk %s (distance %s)", c["id"], c["distance"])
+            parts.append(f"###\n```{fence_tag(c['meta'])}\n{c['code']}\n```")
         return "\n\n".join(parts)
 
     def _normalize_results(self, r):
@@ -80,9 +134,15 @@ class DeepSeekLLM:
 
     def generate_from_chunks(self, prompt: str, chunks) -> str:
         """
-        Generate answer from chunks without truncation or token limits.
+        Generate answer from chunks, packed to fit the 4096-token context.
         """
         return self._generate_answer(prompt, chunks)
 
+    def stream_from_chunks(self, prompt: str, chunks):
+        """
+        Same as generate_from_chunks, but yields text pieces as they are generated.
+        """
+        return self._stream_answer(prompt, chunks)
+
     def close(self):
         self.model.close()
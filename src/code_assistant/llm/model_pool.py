@@ -0,0 +1,316 @@
+import importlib
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from collections import OrderedDict, deque
+from multiprocessing.connection import wait
+
+from code_assistant.utils.logs import configure_logging
+
+BACKENDS = {
+    "qwen": "code_assistant.llm.qwen_llm:QwenLLM",
+    "deepseek": "code_assistant.llm.deepseek_llm:DeepSeekLLM",
+}
+
+_END = object()
+
+logger = logging.getLogger(__name__)
+
+
+def _load_backend(spec: dict, n_threads: int):
+    kwargs = dict(spec)
+    target = BACKENDS.get(kwargs.get("backend"), kwargs.get("backend"))
+    kwargs.pop("backend", None)
+    module_name, _, class_name = target.partition(":")
+    backend = getattr(importlib.import_module(module_name), class_name)
+    return backend(n_threads=n_threads, **kwargs)
+
+
+def _model_bytes(llm, spec: dict) -> int:
+    """Resident size of a loaded model: its GGUF file size plus its session cache."""
+    path = spec.get("model_path") or getattr(getattr(llm, "model", None), "model_path", None)
+    size = os.path.getsize(path) if path and os.path.exists(path) else 0
+    return size + getattr(getattr(llm, "prompt_cache", None), "session_cache_bytes", 0)
+
+
+def _worker(worker_id, specs, preload, cap_bytes, n_threads, requests, results):
+    """
+    Serve generation requests in one process, keeping models resident LRU-first.
+
+    Before loading a model, idle models are evicted least recently used first
+    until the estimated total fits cap_bytes (a model larger than the cap still
+    loads, alone).
+    """
+    configure_logging()
+    resident = OrderedDict()  # name -> (llm, bytes)
+
+    def evict(need: int):
+        while resident and sum(size for _, size in resident.values()) + need > cap_bytes:
+            name, (llm, _) = resident.popitem(last=False)
+            close = getattr(llm, "close", None)
+            if close:
+                close()
+            logger.info("Model pool worker %s: evicted %s", worker_id, name)
+
+    def get(name: str):
+        if name in resident:
+            resident.move_to_end(name)
+            return resident[name][0]
+        spec = specs[name]
+        if cap_bytes:
+            path = spec.get("model_path")
+            evict(os.path.getsize(path) if path and os.path.exists(path) else 0)
+        llm = _load_backend(spec, n_threads)
+        size = _model_bytes(llm, spec)
+        if cap_bytes:
+            # without a model_path in the spec, the backend's default file is only known now
+            evict(size)
+        resident[name] = (llm, size)
+        logger.info("Model pool worker %s: loaded %s", worker_id, name)
+        return llm
+
+    for name in preload:
+        get(name)
+    results.send(("ready", worker_id, None, list(resident)))
+
+    while True:
+        item = requests.get()
+        if item is None:
+            break
+        req_id, name, prompt, chunks, stream = item
+        try:
+            llm = get(name)
+            if stream:
+                for piece in llm.stream_from_chunks(prompt, chunks):
+                    results.send(("piece", worker_id, req_id, piece))
+            else:
+                results.send(("piece", worker_id, req_id, llm.generate_from_chunks(prompt, chunks)))
+            prefill = getattr(llm, "last_prefill", None)
+            results.send(("done", worker_id, req_id, (list(resident), prefill)))
+        except Exception as e:
+            results.send(("error", worker_id, req_id, (list(resident), f"{type(e).__name__}: {e}")))
+
+    for llm, _ in resident.values():
+        close = getattr(llm, "close", None)
+        if close:
+            close()
+    results.close()
+
+
+class _Request:
+    def __init__(self, req_id, session, model, prompt, chunks, stream):
+        self.id = req_id
+        self.session = session
+        self.model = model
+        self.payload = (req_id, model, prompt, chunks, stream)
+        self.worker = None
+        self.pieces = queue.Queue()
+        self.prefill = None
+
+    def __iter__(self):
+        while True:
+            item = self.pieces.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+
+class ModelPool:
+    """
+    Serve local GGUF models from a pool of worker processes.
+
+    `models` maps a model name to its spec: {"backend": "qwen" | "deepseek" |
+    "module:Class", **backend kwargs (model_path, n_ctx, ...)}. Each of `workers`
+    processes (default: cores // threads_per_worker) runs one generation at a
+    time with `threads_per_worker` llama.cpp threads and keeps the models it has
+    used resident, evicting the least recently used beyond `memory_cap_mb` (per
+    worker; None = no cap). `preload` names models every worker loads up front.
+
+    Queued requests are scheduled round-robin across sessions, so one session's
+    burst does not hold up the others, and go to an idle worker that already has
+    the model loaded when there is one. When a worker process dies (a crash, or a
+    preload that fails), its request fails with a RuntimeError, and so do the
+    queued ones once no worker is left.
+    """
+
+    def __init__(
+        self,
+        models: dict,
+        workers: int = None,
+        threads_per_worker: int = 4,
+        memory_cap_mb: int = None,
+        preload=(),
+    ):
+        self.models = models
+        self.workers = workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+        cap_bytes = (memory_cap_mb or 0) << 20
+        # spawn: llama.cpp and the caller's threads do not survive a fork
+        ctx = multiprocessing.get_context("spawn")
+        self.inboxes = [ctx.Queue() for _ in range(self.workers)]
+        # one result pipe per worker: a worker that dies mid-write cannot block the others
+        pipes = [ctx.Pipe(duplex=False) for _ in range(self.workers)]
+        self.results = [reader for reader, _ in pipes]
+        self.processes = [
+            ctx.Process(
+                target=_worker,
+                args=(i, models, tuple(preload), cap_bytes, threads_per_worker, inbox, writer),
+                daemon=True,
+            )
+            for i, (inbox, (_, writer)) in enumerate(zip(self.inboxes, pipes, strict=True))
+        ]
+        for process in self.processes:
+            process.start()
+        for _, writer in pipes:
+            # only the worker holds its writer now, so its exit ends the pipe
+            writer.close()
+        self.wakeup, self.waker = ctx.Pipe(duplex=False)
+
+        self.lock = threading.Lock()
+        self.ids = itertools.count()
+        self.sessions = OrderedDict()  # session -> deque of queued requests
+        self.running = {}  # req_id -> _Request
+        self.idle = []  # worker ids, least recently used first
+        self.dead = set()  # worker ids whose process exited
+        self.closing = False
+        self.resident = {i: [] for i in range(self.workers)}
+        self.reader = threading.Thread(target=self._read_results, daemon=True)
+        self.reader.start()
+
+    def _pick_worker(self, model: str):
+        for worker_id in self.idle:
+            if model in self.resident[worker_id]:
+                return worker_id
+        return self.idle[0]
+
+    def _dispatch(self):
+        """Hand queued requests to idle workers, one session at a time in turn. Holds lock."""
+        if len(self.dead) == self.workers:
+            error = RuntimeError("Every model pool worker has exited")
+            for pending in self.sessions.values():
+                for request in pending:
+                    request.pieces.put(error)
+            self.sessions.clear()
+        while self.idle and self.sessions:
+            session, pending = next(iter(self.sessions.items()))
+            request = pending.popleft()
+            if pending:
+                self.sessions.move_to_end(session)
+            else:
+                del self.sessions[session]
+            worker_id = self._pick_worker(request.model)
+            self.idle.remove(worker_id)
+            request.worker = worker_id
+            self.running[request.id] = request
+            self.inboxes[worker_id].put(request.payload)
+
+    def _worker_exited(self, worker_id: int):
+        """Fail the running request of a worker whose process has exited. Holds lock."""
+        self.dead.add(worker_id)
+        if worker_id in self.idle:
+            self.idle.remove(worker_id)
+        if self.closing:
+            return
+        code = self.processes[worker_id].exitcode
+        message = f"Model pool worker {worker_id} exited with code {code}"
+        logger.error(message)
+        for req_id, request in list(self.running.items()):
+            if request.worker == worker_id:
+                del self.running[req_id]
+                request.pieces.put(RuntimeError(message))
+        self._dispatch()
+
+    def _read_results(self):
+        live = {reader: worker_id for worker_id, reader in enumerate(self.results)}
+        while live:
+            ready = wait([self.wakeup, *live])
+            if self.wakeup in ready:
+                return
+            for reader in ready:
+                try:
+                    message = reader.recv()
+                except EOFError:
+                    # the worker exited and every message it sent has been read
+                    worker_id = live.pop(reader)
+                    self.processes[worker_id].join(timeout=5)
+                    with self.lock:
+                        self._worker_exited(worker_id)
+                    continue
+                self._handle(message)
+
+    def _handle(self, message):
+        """Apply one worker message to its request and the worker's state."""
+        kind, worker_id, req_id, data = message
+        with self.lock:
+            if kind == "ready":
+                self.resident[worker_id] = data
+                self.idle.append(worker_id)
+                self._dispatch()
+                return
+            request = self.running.get(req_id)
+            if request is None:
+                return
+            if kind == "piece":
+                request.pieces.put(data)
+                return
+            self.running.pop(req_id)
+            self.resident[worker_id] = data[0]
+            if kind == "done":
+                request.prefill = data[1]
+                request.pieces.put(_END)
+            else:
+                request.pieces.put(RuntimeError(data[1]))
+            self.idle.append(worker_id)
+            self._dispatch()
+
+    def submit(self, model: str, prompt: str, chunks, session="default", stream: bool = True):
+        """Queue a generation; returns an iterable of answer text pieces."""
+        if model not in self.models:
+            raise KeyError(f"Unknown model {model!r}, expected one of {sorted(self.models)}")
+        with self.lock:
+            request = _Request(next(self.ids), session, model, prompt, chunks, stream)
+            self.sessions.setdefault(session, deque()).append(request)
+            self._dispatch()
+        return request
+
+    def llm(self, model: str, session="default"):
+        """A backend object for `model` that QueryService can use like QwenLLM."""
+        return PooledLLM(self, model, session)
+
+    def close(self):
+        with self.lock:
+            self.closing = True
+        for inbox in self.inboxes:
+            inbox.put(None)
+        for process in self.processes:
+            process.join(timeout=30)
+        self.waker.send(None)
+        self.reader.join()
+
+
+class PooledLLM:
+    """generate_from_chunks / stream_from_chunks served by a ModelPool for one session."""
+
+    def __init__(self, pool: ModelPool, model: str, session="default"):
+        self.pool = pool
+        self.name = model
+        self.session = session
+        self.max_concurrency = pool.workers
+        self.last_request = None
+
+    @property
+    def last_prefill(self):
+        """Prompt token counts of the latest finished request, like QwenLLM's."""
+        return self.last_request.prefill if self.last_request is not None else None
+
+    def generate_from_chunks(self, prompt: str, chunks) -> str:
+        self.last_request = self.pool.submit(self.name, prompt, chunks, self.session, stream=False)
+        return "".join(self.last_request)
+
+    def stream_from_chunks(self, prompt: str, chunks):
+        self.last_request = self.pool.submit(self.name, prompt, chunks, self.session)
+        return iter(self.last_request)
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+from pathlib import Path
+
+from llama_cpp import LlamaRAMCache
+
+logger = logging.getLogger(__name__)
+
+
+class PromptCache:
+    """
+    Reuse llama.cpp's KV state for the fixed start of every prompt.
+
+    On each call llama.cpp already skips the prompt tokens it shares with the
+    state left by the previous call. This restores the state after `prefix_messages`
+    (the system prompt) from `cache_dir` when the model loads, or evaluates it once
+    and saves it there, so the first request after a restart skips the prefix too.
+    With `session_cache_mb`, the states of recent requests are also kept in RAM, so
+    interleaved sessions each resume from their own longest prefix.
+
+    Call `begin()` before each completion; `last_prefill` then holds the prompt
+    tokens skipped and evaluated for it.
+    """
+
+    def __init__(
+        self,
+        model,
+        model_path: str,
+        prefix_messages,
+        cache_dir="./storage/prompt_cache",
+        session_cache_mb: int = 0,
+    ):
+        self.model = model
+        self.session_cache_bytes = session_cache_mb << 20
+        self.last_prefill = None
+        self._pending = False
+        # count at the first eval of a request: llama.cpp has then dropped to the matched prefix
+        self._eval = model.eval
+        model.eval = self._counting_eval
+        if session_cache_mb:
+            model.set_cache(LlamaRAMCache(capacity_bytes=self.session_cache_bytes))
+
+        self.path = None
+        if cache_dir is not None:
+            self.path = Path(cache_dir) / f"{self._key(model_path, prefix_messages)}.state"
+            self._restore(prefix_messages)
+
+    def _key(self, model_path: str, prefix_messages) -> str:
+        stat = os.stat(model_path)
+        digest = hashlib.sha1(
+            json.dumps(
+                [os.path.abspath(model_path), stat.st_size, stat.st_mtime_ns, self.model.n_ctx()]
+                + list(prefix_messages)
+            ).encode("utf8")
+        ).hexdigest()
+        return f"{Path(model_path).stem}-{digest[:16]}"
+
+    def _restore(self, prefix_messages):
+        if self.path.exists():
+            try:
+                with open(self.path, "rb") as f:
+                    self.model.load_state(pickle.load(f))
+                logger.info(
+                    "Prompt cache: restored %d tokens from %s", self.model.n_tokens, self.path
+                )
+                return
+            except Exception as e:
+                logger.warning("Prompt cache: could not restore %s (%s), rebuilding", self.path, e)
+
+        # a one-token completion leaves the formatted prefix evaluated in the KV state
+        self.model.create_chat_completion(messages=list(prefix_messages), max_tokens=1)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # pool workers loading the same model at once each write their own file
+        tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(self.model.save_state(), f)
+        os.replace(tmp, self.path)
+        logger.info("Prompt cache: saved %d prefix tokens to %s", self.model.n_tokens, self.path)
+
+    def begin(self):
+        self._pending = True
+
+    def _counting_eval(self, tokens):
+        if self._pending:
+            self._pending = False
+            skipped = self.model.n_tokens
+            self.last_prefill = {
+                "prefill_skipped_tokens": skipped,
+                "prefill_tokens": skipped + len(tokens),
+            }
+            logger.debug("Prefill: skipped %d of %d prompt tokens", skipped, skipped + len(tokens))
+        return self._eval(tokens)
@@ -3,6 +3,10 @@ import os
 from dotenv import load_dotenv
 from groq import Groq
 
+from code_assistant.utils.metrics import METRICS
+
+from .context_packing import ContextPacker, fence_tag, tiktoken_counter
+
 SYSTEM_PROMPT = """
     You are Bizden Code Assistant, a helpful AI assistant specialized in software development and code understanding. 
     Guidelines for you:
@@ -19,21 +23,28 @@ SYSTEM_PROMPT = """
 
 
 class GroqQwenLLM:
-    def __init__(self):
+    # remote API: concurrent requests from several sessions are fine
+    max_concurrency = 8
+
+    def __init__(self, context_tokens: int = 6000):
+        """
+        context_tokens caps the tokens of retrieved code sent per request.
+        """
         load_dotenv()
         api_key = os.environ["GROQ_API_KEY"]
         if not api_key:
             raise RuntimeError("Missing GROQ_API_KEY environment variable")
         
         self.client = Groq(api_key=api_key)
+        self.context_tokens = context_tokens
+        self.packer = ContextPacker(tiktoken_counter())
 
-    def __generate_answer(self, prompt: str, chunks) -> str:
-        """
-        Generate answer using all available chunks without truncating.
-        """
-        context = self._normalize_results(chunks)
+    def _build_messages(self, prompt: str, chunks):
+        with METRICS.timer("context_build_seconds", backend=type(self).__name__):
+            chunks = self.packer.pack(chunks, prompt, self.context_tokens)
+            context = self._normalize_results(chunks)
 
-        messages = [
+        return [
             {"role": "system", "content": SYSTEM_PROMPT},
             {
                 "role": "assistant",
@@ -42,13 +53,38 @@ class GroqQwenLLM:
             {"role": "user", "content": prompt},
         ]
 
+    def __generate_answer(self, prompt: str, chunks) -> str:
+        """
+        Generate answer from the chunks that fit context_tokens.
+        """
+        messages = self._build_messages(prompt, chunks)
         result = self.client.chat.completions.create(
             model="qwen/qwen3-32b", messages=messages, temperature=0.2
         )
+        self._record_usage(result.usage)
 
         return result.choices[0].message.content
 
-    def _normalize_results(self, r):
+    def __stream_answer(self, prompt: str, chunks):
+        messages = self._build_messages(prompt, chunks)
+        stream = self.client.chat.completions.create(
+            model="qwen/qwen3-32b", messages=messages, temperature=0.2, stream=True
+        )
+        for part in stream:
+            # Groq reports the usage of a stream on its last chunk
+            self._record_usage(getattr(getattr(part, "x_groq", None), "usage", None))
+            if not part.choices:
+                continue
+            token = part.choices[0].delta.content
+            if token:
+                yield token
+
+    def _record_usage(self, usage):
+        if usage is not None and usage.prompt_tokens is not None:
+            METRICS.observe("llm_prompt_tokens", usage.prompt_tokens, backend=type(self).__name__)
+
+    @staticmethod
+    def _normalize_results(r):
         parts = []
         ids = r["ids"][0]
         metas = r["metadatas"][0]
@@ -62,15 +98,21 @@ class GroqQwenLLM:
                 f"// type: {meta.get('type')}\n"
                 f"// lines: {meta.get('start_line')}–{meta.get('end_line')}"
             )
-            parts.append(f"###\n{meta_block}\n```ts\n{docs[i]}\n```")
+            parts.append(f"###\n{meta_block}\n```{fence_tag(meta)}\n{docs[i]}\n```")
 
         return "\n\n".join(parts)
 
     def generate_from_chunks(self, prompt: str, chunks) -> str:
         """
-        Generate answer from chunks without truncation or token limits.
+        Generate answer from chunks, packed to at most context_tokens of code.
         """
         return self.__generate_answer(prompt, chunks)
 
+    def stream_from_chunks(self, prompt: str, chunks):
+        """
+        Same as generate_from_chunks, but yields text pieces as they are generated.
+        """
+        return self.__stream_answer(prompt, chunks)
+
     def close(self):
         self.model.close()
@@ -2,6 +2,15 @@ import os
 
 from llama_cpp import Llama
 
+from code_assistant.utils.metrics import METRICS
+
+from .context_packing import ContextPacker, fence_tag, llama_token_counter
+from .prompt_cache import PromptCache
+
+# RAM for the KV states of recent requests (a full 4k context is about 115 MB here),
+# so interleaved sessions each resume from their own prefix
+SESSION_CACHE_MB = 512
+
 SYSTEM_PROMPT = """
     You are Bizden Code Assistant, a helpful AI assistant specialized in software development and code understanding. 
     Guidelines for you:
@@ -18,9 +27,20 @@ SYSTEM_PROMPT = """
 
 
 class QwenLLM:
-    def __init__(self, model_path: str = None):
+    def __init__(
+        self,
+        model_path: str = None,
+        n_ctx: int = 4096,
+        n_threads: int = None,
+        prompt_cache_dir: str = "./storage/prompt_cache",
+        session_cache_mb: int = SESSION_CACHE_MB,
+    ):
         """
         Initialize the LLM with a local GGUF model using llama_cpp.
+
+        The KV state of the system prompt is kept in prompt_cache_dir (None disables
+        saving it), and those of recent requests in session_cache_mb of RAM (0
+        disables it); see PromptCache.
         """
         if model_path is None:
             model_path = os.path.join(
@@ -29,15 +49,35 @@ class QwenLLM:
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"Model not found at {model_path}")
 
-        self.model = Llama(model_path=model_path)
+        self.model = Llama(model_path=model_path, n_ctx=n_ctx, n_threads=n_threads)
         self.max_context_chars = 3000
+        self.packer = ContextPacker(llama_token_counter(self.model))
+        self.system_tokens = self.packer.count_tokens(SYSTEM_PROMPT)
+        self.prompt_cache = PromptCache(
+            self.model,
+            model_path,
+            [{"role": "system", "content": SYSTEM_PROMPT}],
+            cache_dir=prompt_cache_dir,
+            session_cache_mb=session_cache_mb,
+        )
 
-    def _generate_answer(self, prompt: str, chunks, max_tokens: int = 256) -> str:
-        chunks = self._normalize_results(chunks)
-        chunks = self._truncate_chunks_by_context(chunks, max_tokens=350)
-        context = self._make_llm_context(chunks)
+    @property
+    def last_prefill(self):
+        """Prompt tokens skipped / evaluated by the latest request."""
+        return self.prompt_cache.last_prefill
+
+    def _context_budget(self, prompt: str, max_tokens: int) -> int:
+        """Tokens left for chunks once the system prompt, question and answer fit."""
+        fixed = self.system_tokens + self.packer.count_tokens(prompt) + 64
+        return self.model.n_ctx() - fixed - max_tokens
 
-        messages = [
+    def _build_messages(self, prompt: str, chunks, max_tokens: int = 256):
+        with METRICS.timer("context_build_seconds", backend=type(self).__name__):
+            budget = self._context_budget(prompt, max_tokens)
+            chunks = self._normalize_results(self.packer.pack(chunks, prompt, budget))
+            context = self._make_llm_context(chunks)
+
+        return [
             {"role": "system", "content": SYSTEM_PROMPT},
             {
                 "role": "assistant",
@@ -46,18 +86,32 @@ class QwenLLM:
             {"role": "user", "content": prompt},
         ]
 
+    def _generate_answer(self, prompt: str, chunks, max_tokens: int = 256) -> str:
+        messages = self._build_messages(prompt, chunks, max_tokens)
+        self.prompt_cache.begin()
         result = self.model.create_chat_completion(
             messages=messages, max_tokens=max_tokens, temperature=0.7
         )
 
         return result["choices"][0]["message"]["content"].strip()
 
+    def _stream_answer(self, prompt: str, chunks, max_tokens: int = 256):
+        messages = self._build_messages(prompt, chunks, max_tokens)
+        self.prompt_cache.begin()
+        stream = self.model.create_chat_completion(
+            messages=messages, max_tokens=max_tokens, temperature=0.7, stream=True
+        )
+        for part in stream:
+            token = part["choices"][0]["delta"].get("content")
+            if token:
+                yield token
+
     def _make_llm_context(self, chunk):
         parts = []
         for c in chunk:
             block = f"""
-                ### 
-                ```ts
+                ###
+                ```{fence_tag(c["meta"])}
                 {c["code"]}
                 """
             parts.append(block.strip())
@@ -82,28 +136,19 @@ class QwenLLM:
 
         return out
 
-    def _truncate_chunks_by_context(self, chunks, max_tokens=500):
-        """
-        Keep chunks until total estimated tokens < max_tokens.
-        Roughly assume 1 token ≈ 4 chars.
-        """
-        selected = []
-        total_tokens = 0
-        for ch in chunks:
-            est_tokens = len(ch["code"]) // 4
-            if total_tokens + est_tokens > max_tokens:
-                break
-            selected.append(ch)
-            total_tokens += est_tokens
-        return selected
-
     def generate_from_chunks(self, prompt: str, chunks, max_tokens: int = 256) -> str:
         """
         Combine multiple retrieved code chunks into context and generate answer.
-        Truncates context if too long.
+        Chunks are packed to fit the model's context window.
         """
         return self._generate_answer(prompt, chunks=chunks, max_tokens=max_tokens)
 
+    def stream_from_chunks(self, prompt: str, chunks, max_tokens: int = 256):
+        """
+        Same as generate_from_chunks, but yields text pieces as they are generated.
+        """
+        return self._stream_answer(prompt, chunks=chunks, max_tokens=max_tokens)
+
     def close(self):
         """
         Explicitly close the model to avoid destructor warnings.
@@ -0,0 +1,67 @@
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+
+def _partial_tag_len(text: str, tag: str) -> int:
+    """Length of the longest suffix of text that is a proper prefix of tag."""
+    for n in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:n]):
+            return n
+    return 0
+
+
+class ThinkFilter:
+    """
+    Incrementally removes <think>...</think> blocks from a token stream.
+
+    Tags may be split across tokens, so a possible partial tag is held back
+    until the next token decides it.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.inside = False
+
+    def feed(self, piece: str) -> str:
+        self.buffer += piece
+        out = []
+        while True:
+            tag = THINK_CLOSE if self.inside else THINK_OPEN
+            idx = self.buffer.find(tag)
+            if idx == -1:
+                keep = _partial_tag_len(self.buffer, tag)
+                if not self.inside:
+                    out.append(self.buffer[: len(self.buffer) - keep])
+                self.buffer = self.buffer[len(self.buffer) - keep :]
+                return "".join(out)
+            if not self.inside:
+                out.append(self.buffer[:idx])
+            self.buffer = self.buffer[idx + len(tag) :]
+            self.inside = not self.inside
+
+    def flush(self) -> str:
+        rest = "" if self.inside else self.buffer
+        self.buffer = ""
+        return rest
+
+
+def strip_think_stream(pieces):
+    """Yield the visible text of a token stream, without think blocks or leading whitespace."""
+    think_filter = ThinkFilter()
+    started = False
+    for piece in pieces:
+        text = think_filter.feed(piece)
+        if not started:
+            text = text.lstrip()
+            started = bool(text)
+        if text:
+            yield text
+    rest = think_filter.flush()
+    if rest and not started:
+        rest = rest.lstrip()
+    if rest:
+        yield rest
+
+
+def strip_think(text: str) -> str:
+    return "".join(strip_think_stream([text])).strip()
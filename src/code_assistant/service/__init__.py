@@ -0,0 +1,4 @@
+from .answer_cache import AnswerCache
+from .query_service import QueryService, StreamingAnswer
+
+__all__ = ["AnswerCache", "QueryService", "StreamingAnswer"]
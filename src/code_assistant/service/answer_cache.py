@@ -0,0 +1,117 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+def chunk_fingerprint(chunks, namespace: str = "") -> str:
+    """
+    Identify a retrieval result by its chunk IDs and their current text.
+
+    Re-indexing a chunk changes its text, so answers cached for the old version
+    stop matching without explicit invalidation.
+    """
+    ids = chunks["ids"][0]
+    docs = chunks["documents"][0]
+    digest = hashlib.sha1(namespace.encode("utf8"))
+    for chunk_id, doc in sorted(zip(ids, docs, strict=True)):
+        digest.update(f"\0{chunk_id}\0{doc}".encode("utf8"))
+    return digest.hexdigest()
+
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers, persisted in SQLite.
+
+    A cached answer is reused when the retrieved chunks have the same fingerprint
+    and the query embedding's cosine similarity is at least `threshold`. Entries
+    expire after `ttl` seconds; beyond `max_entries` the least recently used go.
+    """
+
+    def __init__(
+        self,
+        path,
+        threshold: float = 0.95,
+        ttl: float = 7 * 24 * 3600,
+        max_entries: int = 10_000,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS answers_fp ON answers (fingerprint)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS answers_lru ON answers (last_used)")
+        self.conn.commit()
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, query_embedding, fingerprint: str):
+        """Return the best cached answer for this query and retrieval, or None."""
+        query = self._unit(query_embedding)
+        now = time.time()
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, embedding, answer FROM answers WHERE fingerprint = ? AND created >= ?",
+                (fingerprint, now - self.ttl),
+            ).fetchall()
+            best_id, best_answer, best_score = None, None, self.threshold
+            for row_id, blob, answer in rows:
+                score = float(np.dot(query, np.frombuffer(blob, dtype=np.float32)))
+                if score >= best_score:
+                    best_id, best_answer, best_score = row_id, answer, score
+            if best_id is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (now, best_id))
+            self.conn.commit()
+            return best_answer
+
+    def put(self, query_embedding, fingerprint: str, answer: str):
+        now = time.time()
+        blob = self._unit(query_embedding).tobytes()
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO answers (fingerprint, embedding, answer, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (fingerprint, blob, answer, now, now),
+            )
+            self.conn.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl,))
+            self.conn.execute(
+                "DELETE FROM answers WHERE id IN ("
+                "SELECT id FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self.conn.commit()
+
+    def stats(self) -> dict:
+        with self.lock:
+            (entries,) = self.conn.execute("SELECT COUNT(*) FROM answers").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self):
+        self.conn.close()
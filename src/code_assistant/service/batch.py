@@ -0,0 +1,92 @@
+import json
+
+from code_assistant.llm.streaming import strip_think
+from code_assistant.vector_db.vector_store import result_hits
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def field(body: dict, name: str, kind, default=None):
+    """body[name] (or default), checked to be a kind."""
+    value = body.get(name, default)
+    if value is not None and not isinstance(value, kind):
+        raise BadRequest(f"{name!r} must be {kind.__name__}")
+    return value
+
+
+def require_query(body: dict) -> str:
+    query = field(body, "query", str)
+    if not query:
+        raise BadRequest("'query' is required")
+    return query
+
+
+def answer_json(response: dict) -> dict:
+    """A QueryService.answer response with its chunks as hits, without think blocks."""
+    return {
+        "answer": strip_think(response["answer"]),
+        "hits": result_hits(response["chunks"]),
+        "cache_hit": response["cache_hit"],
+        "timings": response["timings"],
+    }
+
+
+def _with_id(result: dict, body) -> dict:
+    return {"id": body["id"], **result} if isinstance(body, dict) and "id" in body else result
+
+
+def run_batch(service, requests) -> list:
+    """
+    Answer a batch of requests over a QueryService, one result per request, in order.
+
+    A request is a dict or a JSON line: {"query", "k", "mode", "scope"} searches,
+    and with "generate": true the answer is generated as well. An "id" is echoed
+    back, and a bad request gets {"error": ...} without failing the others.
+
+    Searches with the same k, mode and scope run as one batched retrieval (one
+    encode and one k-NN call, then graph expansion); generations are submitted
+    together, so they run as concurrently as the service's LLM slots allow.
+    """
+    requests = list(requests)
+    results = [None] * len(requests)
+    searches = {}  # (k, mode, scope JSON) -> [(index, body)]
+    pending = []  # (index, body, future)
+    for i, body in enumerate(requests):
+        try:
+            if isinstance(body, (str, bytes)):
+                body = json.loads(body)
+            if not isinstance(body, dict):
+                raise BadRequest("Expected a JSON object")
+            query = require_query(body)
+            k = field(body, "k", int, 5)
+            scope = field(body, "scope", dict)
+            if body.get("generate"):
+                if service.llm is None:
+                    raise BadRequest("No LLM is loaded; only searches can be answered")
+                pending.append((i, body, service.submit(query, k=k, scope=scope)))
+            else:
+                mode = field(body, "mode", str, service.search_mode)
+                key = (k, mode, json.dumps(scope, sort_keys=True))
+                searches.setdefault(key, []).append((i, body))
+        except ValueError as e:
+            results[i] = _with_id({"error": str(e)}, body)
+
+    for (k, mode, scope), group in searches.items():
+        queries = [body["query"] for _, body in group]
+        try:
+            found = service.run(
+                service.retrieve_many(queries, k=k, scope=json.loads(scope), mode=mode)
+            )
+            for (i, body), result in zip(group, found, strict=True):
+                results[i] = _with_id({"hits": result_hits(result)}, body)
+        except Exception as e:
+            for i, body in group:
+                results[i] = _with_id({"error": str(e)}, body)
+    for i, body, future in pending:
+        try:
+            results[i] = _with_id(answer_json(future.result()), body)
+        except Exception as e:
+            results[i] = _with_id({"error": str(e)}, body)
+    return results
@@ -0,0 +1,85 @@
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4
+
+
+def _parse_span(chunk_id: str):
+    path, _, lines = chunk_id.rpartition(":")
+    start, _, end = lines.partition("-")
+    return path, int(start), int(end)
+
+
+def _overlaps(chunk_id: str, spans) -> bool:
+    """True if chunk_id shares lines with an already selected chunk of the same file."""
+    path, start, end = _parse_span(chunk_id)
+    return any(p == path and s <= end and start <= e for p, s, e in spans)
+
+
+def expand_results(
+    results,
+    graph,
+    db,
+    hops: int = 1,
+    token_budget: int = 1500,
+    max_neighbours: int = 8,
+    count_tokens=_estimate_tokens,
+):
+    """
+    Add the callers and callees of the retrieved chunks to a search result.
+
+    Neighbours come from the code graph's precomputed lists (a single indexed
+    lookup per chunk and hop), are followed up to `hops` steps, skipped when they
+    overlap an already selected chunk (a method inside a retrieved class), and
+    added until `token_budget` extra tokens are used. Expanded chunks get a
+    distance of 1 + hop and a "graph_relation" metadata entry. Returns a new result
+    in Chroma's query shape.
+    """
+    ids = list(results["ids"][0])
+    spans = [_parse_span(chunk_id) for chunk_id in ids]
+    selected = set(ids)
+    candidates = []  # (neighbour id, relation, hop)
+
+    frontier = ids
+    for hop in range(1, hops + 1):
+        next_frontier = []
+        for node_id in frontier:
+            for neighbour_id, relation in graph.neighbours(node_id, limit=max_neighbours):
+                if neighbour_id in selected or _overlaps(neighbour_id, spans):
+                    continue
+                selected.add(neighbour_id)
+                candidates.append((neighbour_id, relation, hop))
+                next_frontier.append(neighbour_id)
+        frontier = next_frontier
+
+    expanded = {
+        key: [list(results[key][0])]
+        for key in ("ids", "distances", "documents", "metadatas")
+        if results.get(key)
+    }
+    if not candidates:
+        return expanded
+
+    fetched = db.get_by_ids([c[0] for c in candidates])
+    by_id = {
+        chunk_id: (doc, meta)
+        for chunk_id, doc, meta in zip(
+            fetched["ids"][0], fetched["documents"][0], fetched["metadatas"][0], strict=True
+        )
+    }
+
+    used = 0
+    for neighbour_id, relation, hop in candidates:
+        if neighbour_id not in by_id or _overlaps(neighbour_id, spans):
+            continue
+        doc, meta = by_id[neighbour_id]
+        tokens = count_tokens(doc)
+        if used + tokens > token_budget:
+            continue
+        used += tokens
+        spans.append(_parse_span(neighbour_id))
+        expanded["ids"][0].append(neighbour_id)
+        expanded["documents"][0].append(doc)
+        expanded["metadatas"][0].append(dict(meta, graph_relation=relation))
+        if "distances" in expanded:
+            expanded["distances"][0].append(1.0 + hop)
+
+    return expanded
@@ -0,0 +1,153 @@
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from code_assistant.llm.streaming import strip_think_stream
+from code_assistant.utils.metrics import METRICS
+from code_assistant.vector_db.vector_store import result_hits
+
+from .batch import BadRequest, answer_json, field, require_query, run_batch
+
+logger = logging.getLogger(__name__)
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """
+    JSON endpoints over a QueryService (set as the server's `service`).
+
+    - GET /health: {"status": "ok", "chunks": stored chunk count}
+    - GET /metrics: utils.metrics in Prometheus text format
+    - POST /search: {"query", "k", "mode", "scope"} -> {"hits": [...]};
+      {"queries": [...], ...} -> {"results": [{"hits": [...]}, ...]} in one batched search;
+      hits are expanded over the code graph like the context of /generate
+    - POST /generate: {"query", "k", "scope"} -> {"answer", "hits", "cache_hit", "timings"};
+      with "stream": true, JSON lines {"piece": text} and then {"done": true, ...}
+    - POST /batch: JSON lines of requests (see batch.run_batch) -> one JSON line each
+    """
+
+    protocol_version = "HTTP/1.1"
+    server_version = "CodeAssistant/0.1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        logger.debug("%s %s", self.address_string(), format % args)
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload):
+        self._send(status, json.dumps(payload).encode("utf8"), "application/json")
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _read_json(self) -> dict:
+        try:
+            body = json.loads(self._read_body() or b"{}")
+        except json.JSONDecodeError as e:
+            raise BadRequest(f"Invalid JSON: {e}") from e
+        if not isinstance(body, dict):
+            raise BadRequest("Expected a JSON object")
+        return body
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "chunks": self.service.db.count()})
+        elif self.path == "/metrics":
+            self._send(200, METRICS.prometheus().encode("utf8"), "text/plain; version=0.0.4")
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        routes = {"/search": self._search, "/generate": self._generate, "/batch": self._batch}
+        route = routes.get(self.path)
+        if route is None:
+            self._read_body()
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            with METRICS.timer("http_request_seconds", path=self.path):
+                route()
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            logger.exception("%s failed", self.path)
+            self._send_json(500, {"error": str(e)})
+
+    def _search(self):
+        body = self._read_json()
+        k = field(body, "k", int, 5)
+        mode = field(body, "mode", str, self.service.search_mode)
+        scope = field(body, "scope", dict)
+        queries = field(body, "queries", list)
+        service = self.service
+        if queries is not None:
+            results = service.run(service.retrieve_many(queries, k=k, scope=scope, mode=mode))
+            self._send_json(200, {"results": [{"hits": result_hits(r)} for r in results]})
+            return
+        query = require_query(body)
+        result = service.run(service.retrieve(query, k=k, scope=scope, mode=mode))
+        self._send_json(200, {"hits": result_hits(result)})
+
+    def _generate(self):
+        body = self._read_json()
+        if self.service.llm is None:
+            raise BadRequest("The server was started without an LLM; only /search is available")
+        query = require_query(body)
+        k = field(body, "k", int, 5)
+        scope = field(body, "scope", dict)
+        if not body.get("stream"):
+            response = self.service.submit(query, k=k, scope=scope).result()
+            self._send_json(200, answer_json(response))
+            return
+
+        response = self.service.stream(query, k=k, scope=scope)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for piece in strip_think_stream(response):
+                self._write_chunk({"piece": piece})
+            final = {
+                "done": True,
+                "hits": result_hits(response.chunks),
+                "cache_hit": response.cache_hit,
+                "timings": response.timings,
+            }
+        except Exception as e:
+            # the status line is already sent; report the failure in the stream
+            final = {"done": True, "error": str(e)}
+        self._write_chunk(final)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, payload):
+        data = (json.dumps(payload) + "\n").encode("utf8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _batch(self):
+        lines = [line for line in self._read_body().decode("utf8").splitlines() if line.strip()]
+        results = run_batch(self.service, lines)
+        body = "".join(json.dumps(result) + "\n" for result in results)
+        self._send(200, body.encode("utf8"), "application/x-ndjson")
+
+
+def make_server(service, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    """
+    HTTP server answering ApiHandler's endpoints with service (a QueryService).
+
+    Requests run on their own threads over the one service, so the embedding model,
+    vector store and LLM stay loaded between requests. Call `serve_forever()`.
+    """
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
@@ -0,0 +1,318 @@
+import asyncio
+import contextvars
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from code_assistant.utils.metrics import METRICS
+
+from .answer_cache import chunk_fingerprint
+from .graph_expansion import expand_results
+
+_END = object()
+
+
+class StreamingAnswer:
+    """
+    Iterable of answer text pieces produced by QueryService.stream.
+
+    `chunks` and `cache_hit` are set once retrieval finishes, `timings` and the
+    request's `trace` (utils.metrics.Trace.to_dict) once generation ends.
+    """
+
+    def __init__(self):
+        self.pieces = queue.Queue()
+        self.chunks = None
+        self.cache_hit = False
+        self.timings = {}
+        self.trace = None
+
+    def __iter__(self):
+        while True:
+            item = self.pieces.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+
+class QueryService:
+    """
+    Asyncio query service shared by all UI sessions.
+
+    Retrieval and generation are awaitable stages; the blocking model calls run in
+    a thread pool. The service owns an event loop on a background thread, so a
+    synchronous caller (a Streamlit script run) can submit queries with `submit`
+    while other sessions' queries keep running.
+
+    Generation is limited to `llm.max_concurrency` calls at a time (1 when the
+    backend does not declare it, e.g. a single local llama.cpp model). Backends
+    exposing `last_prefill` (local models with a PromptCache) add its prompt
+    token counts to the timings. `answer`, `stream` and `submit` take an optional
+    `llm` that replaces the default backend for that query (e.g. a session's
+    PooledLLM), which has its own concurrency limit.
+
+    With an `answer_cache`, answers to near-identical questions over the same
+    retrieved chunks are served from the cache without calling the LLM (except
+    in lexical mode, which never embeds the question).
+    `search_mode` is passed to the vector store's search ("vector", "lexical" or "hybrid"),
+    and so is the optional `scope` of each query (e.g. {"path": "services/billing"}).
+    With a `graph` (CodeGraphStore), hits are expanded with their callers and
+    callees, bounded by `graph_hops` and `graph_token_budget`.
+
+    Every query runs inside a utils.metrics trace, so the stages timed below it
+    (encode, k-NN, BM25, graph expansion, context building) become its spans, and
+    records time to first token, generated tokens and tokens/sec per LLM backend.
+    """
+
+    def __init__(
+        self,
+        db,
+        llm,
+        max_workers: int = 8,
+        answer_cache=None,
+        search_mode: str = "vector",
+        graph=None,
+        graph_hops: int = 1,
+        graph_token_budget: int = 1500,
+    ):
+        self.db = db
+        self.llm = llm
+        self.answer_cache = answer_cache
+        self.search_mode = search_mode
+        self.graph = graph
+        self.graph_hops = graph_hops
+        self.graph_token_budget = graph_token_budget
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="query")
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.llm_slots = asyncio.Semaphore(getattr(llm, "max_concurrency", 1))
+        self.other_slots = weakref.WeakKeyDictionary()
+
+    async def _run(self, fn, *args, **kwargs):
+        # the copied context carries the current trace into the executor thread
+        context = contextvars.copy_context()
+        return await self.loop.run_in_executor(
+            self.executor, lambda: context.run(fn, *args, **kwargs)
+        )
+
+    @staticmethod
+    def _backend(llm) -> str:
+        return getattr(llm, "name", type(llm).__name__)
+
+    def _search(self, query: str, k: int, scope: dict = None, mode: str = None):
+        """
+        Search, also returning the query embedding when the answer cache needs it.
+
+        Lexical search never loads the embedding model, so it also skips the cache.
+        """
+        mode = mode or self.search_mode
+        with METRICS.timer("retrieval_seconds"):
+            query_embedding = None
+            if self.answer_cache is not None and mode != "lexical":
+                query_embedding = self.db.embed_query(query)
+            chunks = self.db.search(
+                query, k=k, query_embedding=query_embedding, mode=mode, scope=scope
+            )
+            if self.graph is not None:
+                with METRICS.timer("graph_expansion_seconds"):
+                    chunks = expand_results(
+                        chunks,
+                        self.graph,
+                        self.db,
+                        hops=self.graph_hops,
+                        token_budget=self.graph_token_budget,
+                    )
+        return chunks, query_embedding
+
+    async def retrieve(self, query: str, k: int = 5, scope: dict = None, mode: str = None):
+        """Search and expand the hits over the code graph; mode overrides `search_mode`."""
+        chunks, _ = await self._run(self._search, query, k, scope, mode)
+        return chunks
+
+    def _search_many(self, queries, k: int, scope: dict = None, mode: str = None):
+        results = self.db.search_many(queries, k=k, mode=mode or self.search_mode, scope=scope)
+        if self.graph is not None:
+            results = [
+                expand_results(
+                    chunks,
+                    self.graph,
+                    self.db,
+                    hops=self.graph_hops,
+                    token_budget=self.graph_token_budget,
+                )
+                for chunks in results
+            ]
+        return results
+
+    async def retrieve_many(self, queries, k: int = 5, scope: dict = None, mode: str = None):
+        """Retrieve for many queries with one batched embedding and k-NN (e.g. evaluation runs)."""
+        return await self._run(self._search_many, list(queries), k, scope, mode)
+
+    def _slots(self, llm):
+        if llm is self.llm:
+            return self.llm_slots
+        if llm not in self.other_slots:
+            self.other_slots[llm] = asyncio.Semaphore(getattr(llm, "max_concurrency", 1))
+        return self.other_slots[llm]
+
+    async def _cached(self, query_embedding, chunks, llm):
+        """Return (cached answer or None, fingerprint) for this retrieval."""
+        if self.answer_cache is None or query_embedding is None:
+            return None, None
+        fingerprint = chunk_fingerprint(chunks, namespace=self._backend(llm))
+        cached = await self._run(self.answer_cache.get, query_embedding, fingerprint)
+        METRICS.inc("answer_cache_requests_total", hit=str(cached is not None).lower())
+        return cached, fingerprint
+
+    async def _remember(self, query_embedding, fingerprint: str, answer: str):
+        if fingerprint is not None:
+            await self._run(self.answer_cache.put, query_embedding, fingerprint, answer)
+
+    def _prefill(self, llm) -> dict:
+        """Prefill stats of the backend's latest call; read while holding its slot."""
+        prefill = dict(getattr(llm, "last_prefill", None) or {})
+        if "prefill_tokens" in prefill:
+            backend = self._backend(llm)
+            METRICS.observe("llm_prompt_tokens", prefill["prefill_tokens"], backend=backend)
+            METRICS.observe(
+                "llm_prefill_skipped_tokens", prefill["prefill_skipped_tokens"], backend=backend
+            )
+        return prefill
+
+    async def _generate(self, prompt: str, chunks, llm):
+        async with self._slots(llm):
+            with METRICS.timer("llm_generation_seconds", backend=self._backend(llm)):
+                answer = await self._run(llm.generate_from_chunks, prompt, chunks)
+            return answer, self._prefill(llm)
+
+    async def generate(self, prompt: str, chunks, llm=None):
+        answer, _ = await self._generate(prompt, chunks, llm or self.llm)
+        return answer
+
+    async def answer(self, query: str, k: int = 5, llm=None, scope: dict = None) -> dict:
+        """Retrieve, then generate. Returns the answer, the raw hits and per-stage timings (ms)."""
+        llm = llm or self.llm
+        with METRICS.trace("query", backend=self._backend(llm), mode=self.search_mode) as trace:
+            started = time.perf_counter()
+            chunks, query_embedding = await self._run(self._search, query, k, scope)
+            retrieved = time.perf_counter()
+            answer, fingerprint = await self._cached(query_embedding, chunks, llm)
+            cache_hit = answer is not None
+            prefill = {}
+            if not cache_hit:
+                answer, prefill = await self._generate(query, chunks, llm)
+                await self._remember(query_embedding, fingerprint, answer)
+            finished = time.perf_counter()
+            trace.attrs["cache_hit"] = cache_hit
+
+        return {
+            "answer": answer,
+            "chunks": chunks,
+            "cache_hit": cache_hit,
+            "timings": {
+                "retrieval_ms": (retrieved - started) * 1000,
+                "generation_ms": (finished - retrieved) * 1000,
+                "total_ms": (finished - started) * 1000,
+                **prefill,
+            },
+            "trace": trace.to_dict(),
+        }
+
+    def _pump(self, prompt: str, answer: StreamingAnswer, llm):
+        """
+        Forward the backend's token stream to the answer.
+
+        Returns (first-token time, text, pieces); llama.cpp and Groq stream one token
+        per piece, so pieces counts generated tokens.
+        """
+        first_token = None
+        pieces = []
+        for piece in llm.stream_from_chunks(prompt, answer.chunks):
+            if first_token is None:
+                first_token = time.perf_counter()
+            answer.pieces.put(piece)
+            pieces.append(piece)
+        return first_token, "".join(pieces), len(pieces)
+
+    def _record_stream(self, trace, llm, started: float, first_token, finished: float, tokens):
+        backend = self._backend(llm)
+        METRICS.observe("llm_generation_seconds", finished - started, backend=backend)
+        METRICS.observe("llm_generated_tokens", tokens, backend=backend)
+        trace.attrs["generated_tokens"] = tokens
+        if first_token is None:
+            return
+        METRICS.observe("llm_time_to_first_token_seconds", first_token - started, backend=backend)
+        trace.attrs["first_token_ms"] = (first_token - started) * 1000
+        if tokens > 1 and finished > first_token:
+            # the first token's latency is prefill; the rate covers the decoding after it
+            tokens_per_second = (tokens - 1) / (finished - first_token)
+            METRICS.observe("llm_tokens_per_second", tokens_per_second, backend=backend)
+            trace.attrs["tokens_per_second"] = tokens_per_second
+
+    async def _stream(self, query: str, k: int, answer: StreamingAnswer, llm, scope: dict):
+        try:
+            with METRICS.trace(
+                "query", backend=self._backend(llm), mode=self.search_mode
+            ) as trace:
+                started = time.perf_counter()
+                answer.chunks, query_embedding = await self._run(self._search, query, k, scope)
+                retrieved = time.perf_counter()
+                cached, fingerprint = await self._cached(query_embedding, answer.chunks, llm)
+                prefill = {}
+                if cached is not None:
+                    answer.cache_hit = True
+                    first_token = time.perf_counter()
+                    answer.pieces.put(cached)
+                else:
+                    async with self._slots(llm):
+                        generating = time.perf_counter()
+                        first_token, text, tokens = await self._run(
+                            self._pump, query, answer, llm
+                        )
+                        prefill = self._prefill(llm)
+                    self._record_stream(
+                        trace, llm, generating, first_token, time.perf_counter(), tokens
+                    )
+                    await self._remember(query_embedding, fingerprint, text)
+                finished = time.perf_counter()
+                trace.attrs["cache_hit"] = answer.cache_hit
+            answer.trace = trace.to_dict()
+            answer.timings = {
+                "retrieval_ms": (retrieved - started) * 1000,
+                "first_token_ms": ((first_token or finished) - retrieved) * 1000,
+                "generation_ms": (finished - retrieved) * 1000,
+                "total_ms": (finished - started) * 1000,
+                **prefill,
+            }
+        except Exception as e:
+            answer.pieces.put(e)
+        finally:
+            answer.pieces.put(_END)
+
+    def stream(self, query: str, k: int = 5, llm=None, scope: dict = None) -> StreamingAnswer:
+        """Retrieve, then stream the generated answer piece by piece."""
+        answer = StreamingAnswer()
+        asyncio.run_coroutine_threadsafe(
+            self._stream(query, k, answer, llm or self.llm, scope), self.loop
+        )
+        return answer
+
+    def submit(self, query: str, k: int = 5, llm=None, scope: dict = None):
+        """Schedule `answer` on the service loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(
+            self.answer(query, k=k, llm=llm, scope=scope), self.loop
+        )
+
+    def run(self, coroutine):
+        """Run one of this service's coroutines (e.g. `retrieve`) from another thread."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.executor.shutdown(wait=False)
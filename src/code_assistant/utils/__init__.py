@@ -1,4 +1,5 @@
 from .code_chunk_extractor import CodeChunkExtractor
 from .code_graph import build_code_graph
+from .graph_store import CodeGraphStore
 
-__all__ = ["CodeChunkExtractor", "build_code_graph"]
+__all__ = ["CodeChunkExtractor", "CodeGraphStore", "build_code_graph"]
@@ -1,22 +1,35 @@
-import tree_sitter_typescript as tstypescript
-from tree_sitter import Language, Parser
+from tree_sitter import Parser, QueryCursor
+
+from .languages import LANGUAGES, get_chunk_query, get_parser
 
 
 class CodeChunkExtractor:
-    def __init__(self, code: str):
-        self.chunks = []
-        self.code_lines = code.split("\n")
-        self.code_bytes = code.encode("utf8")
-        lang_grammar = tstypescript.language_typescript()
-        self.parser = Parser(Language(lang_grammar))
+    def __init__(self, code, parser: Parser = None, language: str = "typescript"):
+        """
+        code may be str or utf8 bytes; only the bytes are kept.
+        language is a key of languages.LANGUAGES.
+
+        Chunk nodes are found with a tree-sitter query, so the traversal runs in C
+        and only the matching nodes reach Python; deeply nested code does not
+        recurse in Python.
+        """
+        self.code_bytes = code if isinstance(code, bytes) else code.encode("utf8")
+        self.language = LANGUAGES[language]
+        self.parser = parser or get_parser(language)
         self.tree = self.parser.parse(self.code_bytes)
 
     def get_text(self, node):
-        start = node.start_point[0]
-        end = node.end_point[0]
-        return "\n".join(self.code_lines[start : end + 1])
+        """Full source lines spanned by node, sliced from the byte buffer."""
+        start = node.start_byte - node.start_point[1]
+        end = self.code_bytes.find(b"\n", node.end_byte)
+        if end == -1:
+            end = len(self.code_bytes)
+        return self.code_bytes[start:end].decode("utf8")
 
     def get_name(self, node):
+        name = node.child_by_field_name("name")
+        if name is not None:
+            return self.code_bytes[name.start_byte : name.end_byte].decode("utf8")
         for child in node.children:
             if child.type in (
                 "identifier",
@@ -31,25 +44,24 @@ class CodeChunkExtractor:
             "text": self.get_text(node),
             "node_type": node.type,
             "name": self.get_name(node),
+            "language": self.language.name,
             "start_line": node.start_point[0] + 1,
             "end_line": node.end_point[0] + 1,
         }
 
-    def walk(self, node):
-        relevant_types = [
-            "class_declaration",
-            "function_declaration",
-            "method_definition",
-            "arrow_function",
-            "function_signature",
-        ]
+    def chunk_nodes(self, node=None):
+        """Chunk nodes under node (default: the whole tree), outer before inner, in source order."""
+        node = node or self.tree.root_node
+        captures = QueryCursor(get_chunk_query(self.language.name)).captures(node)
+        return sorted(captures.get("chunk", ()), key=lambda n: (n.start_byte, -n.end_byte))
 
-        if node.type in relevant_types:
-            self.chunks.append(self.get_chunk(node))
+    def walk(self, node):
+        for chunk_node in self.chunk_nodes(node):
+            yield self.get_chunk(chunk_node)
 
-        for c in node.children:
-            self.walk(c)
+    def iter_chunks(self):
+        """Yield chunks lazily in source order."""
+        yield from self.walk(self.tree.root_node)
 
     def get_chunks(self):
-        self.walk(self.tree.root_node)
-        return self.chunks
+        return list(self.iter_chunks())
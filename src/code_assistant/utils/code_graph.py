@@ -1,107 +1,178 @@
+import hashlib
 import json
+import logging
 import os
 
-import tree_sitter_typescript as tstypescript
-from tree_sitter import Language, Parser
+from .graph_store import CodeGraphStore
+from .languages import LANGUAGES, get_parser, language_for_path, source_extensions
+from .logs import configure_logging
 
-TS_LANGUAGE = tstypescript.language_typescript()
-
-parser = Parser(Language(TS_LANGUAGE))
-
-
-def read_file(path):
-    with open(path, "r", encoding="utf8") as f:
-        return f.read()
-
-
-def walk(node):
-    stack = [node]
-    while stack:
-        n = stack.pop()
-        yield n
-        stack.extend(reversed(n.children))
+logger = logging.getLogger(__name__)
 
 
 def get_text(code, node):
-    return code[node.start_byte : node.end_byte]
-
-
-def build_graph_for_file(path):
-    code = read_file(path)
-    print(code, "code")
-    tree = parser.parse(code.encode("utf8"))
-    root = tree.root_node
+    return code[node.start_byte : node.end_byte].decode("utf8")
+
+
+def callee_name(code, func_node, language=LANGUAGES["typescript"]):
+    """`foo()` -> foo, `this.auth.refresh()` -> refresh."""
+    field = language.member_types.get(func_node.type)
+    if field:
+        prop = func_node.child_by_field_name(field)
+        if prop:
+            return get_text(code, prop)
+    return get_text(code, func_node)
+
+
+def import_targets(code, node, field):
+    """Module texts named by an import node: `'./store'`, `os.path`, `"net/http"`."""
+    for target in node.children_by_field_name(field):
+        if target.type == "aliased_import":
+            target = target.child_by_field_name("name")
+        yield get_text(code, target).strip("\"'`")
+
+
+def build_graph_for_file(path, code: bytes = None, tree=None):
+    """
+    Nodes (classes, methods, functions) and edges (calls, decorators, imports) of one file.
+
+    Node IDs are `path:start-end`, matching chunk IDs. Call and decorator edges start
+    at the innermost enclosing node, or at the file for top-level code. Files in an
+    unsupported language have no nodes or edges. Pass the tree when the file has
+    already been parsed (e.g. for chunking).
+    """
+    language = language_for_path(path)
+    if language is None:
+        return {}, []
+    if code is None:
+        with open(path, "rb") as f:
+            code = f.read()
+    if tree is None:
+        tree = get_parser(language.name).parse(code)
 
     nodes = {}
     edges = []
 
     file_id = path
-
-    for node in walk(root):
+    # iterative pre-order walk; owners[-1] encloses the node under the cursor
+    cursor = tree.walk()
+    owners = [file_id]
+    while True:
+        node = cursor.node
+        owner = owners[-1]
         kind = node.type
+        line = node.start_point[0] + 1
 
-        if kind == "class_declaration":
-            name_node = node.child_by_field_name("name")
-            if name_node:
-                class_name = get_text(code, name_node)
-                class_id = f"{file_id}:{class_name}"
-
-                nodes[class_id] = {"type": "class", "name": class_name, "file": file_id}
-
-        if kind == "method_definition":
+        if kind in language.graph_nodes:
             name_node = node.child_by_field_name("name")
             if name_node:
-                method_name = get_text(code, name_node)
-                method_id = f"{file_id}:{method_name}"
-
-                nodes[method_id] = {"type": "method", "name": method_name, "file": file_id}
+                node_id = f"{file_id}:{line}-{node.end_point[0] + 1}"
+                nodes[node_id] = {
+                    "type": language.graph_nodes[kind],
+                    "name": get_text(code, name_node),
+                    "file": file_id,
+                    "start_line": line,
+                    "end_line": node.end_point[0] + 1,
+                }
+                owner = node_id
 
         if kind == "decorator":
-            expr = node.child_by_field_name("expression")
+            expr = node.child_by_field_name("expression") or (
+                node.named_children[0] if node.named_children else None
+            )
             if expr:
-                decorator_name = get_text(code, expr)
-                edges.append({"from": file_id, "to": decorator_name, "type": "decorator"})
-
-        # ---------------------------------------
-        # CALL EXPRESSIONS
-        # ---------------------------------------
-        if kind == "call_expression":
-            func_node = node.child_by_field_name("function")
-            if func_node:
-                func_name = get_text(code, func_node)
-                edges.append({"from": file_id, "to": func_name, "type": "call"})
-
-        if kind == "import_statement":
-            src_node = node.child_by_field_name("source")
-            if src_node:
-                module_path = get_text(code, src_node).strip("\"'")
-                edges.append({"from": file_id, "to": module_path, "type": "import"})
+                if expr.type in language.call_types:
+                    expr = expr.child_by_field_name(language.call_types[expr.type]) or expr
+                name = get_text(code, expr)
+                edges.append({"from": owner, "to": name, "type": "decorator", "line": line})
 
-    return nodes, edges
-
-
-def build_code_graph(root_dir):
-    graph_nodes = {}
-    graph_edges = []
+        elif kind in language.call_types:
+            func_node = node.child_by_field_name(language.call_types[kind])
+            if func_node:
+                name = callee_name(code, func_node, language)
+                edges.append({"from": owner, "to": name, "type": "call", "line": line})
+
+        elif kind in language.import_types:
+            for module_path in import_targets(code, node, language.import_types[kind]):
+                edges.append(
+                    {
+                        "from": file_id,
+                        "to": language.resolve_import(path, module_path),
+                        "type": "import",
+                        "line": line,
+                    }
+                )
+
+        if cursor.goto_first_child():
+            owners.append(owner)
+            continue
+        while not cursor.goto_next_sibling():
+            if not cursor.goto_parent():
+                return nodes, edges
+            owners.pop()
+
+
+def build_code_graph(
+    root_dir,
+    store: CodeGraphStore = None,
+    db_path: str = "./storage/code_graph.sqlite",
+    parse_cache=None,
+):
+    """
+    Build or refresh the persisted code graph for root_dir.
+
+    Only files whose content hash changed are re-parsed, and files that no longer
+    exist are dropped; neighbour lists are then recomputed in one pass so query
+    time expansion is a lookup. With a ParseCache, results extracted by an earlier
+    run (or by embed_project) are reused. Returns the CodeGraphStore.
+
+    embed_project builds the graph in the same pass as the chunks; this is for
+    refreshing the graph on its own.
+    """
+    # extraction imports this module
+    from .extraction import extract_cached
+
+    store = store or CodeGraphStore(db_path)
+    seen = set()
+    updated = 0
 
     for root, _, files in os.walk(root_dir):
-        print(root, files)
         for file in files:
-            if not file.endswith((".ts", ".tsx")):
+            if not file.endswith(source_extensions()):
                 continue
 
             path = os.path.join(root, file)
-            nodes, edges = build_graph_for_file(path)
+            seen.add(path)
+            with open(path, "rb") as f:
+                code = f.read()
+            content_hash = hashlib.sha1(code).hexdigest()
+            if store.file_hash(path) == content_hash:
+                continue
+
+            if parse_cache is None:
+                nodes, edges = build_graph_for_file(path, code)
+            else:
+                _, nodes, edges = extract_cached(path, code, content_hash, parse_cache)
+            store.replace_file(path, content_hash, nodes, edges)
+            updated += 1
 
-            graph_nodes.update(nodes)
-            graph_edges.extend(edges)
+    prefix = os.path.join(root_dir, "")
+    removed = [path for path in store.files() if path.startswith(prefix) and path not in seen]
+    for path in removed:
+        store.remove_file(path)
+    if updated or removed:
+        store.rebuild_neighbours()
 
-    return {"nodes": graph_nodes, "edges": graph_edges}
+    logger.info(
+        "Code graph: %d files updated, %d removed, %d total", updated, len(removed), len(seen)
+    )
+    return store
 
 
 if __name__ == "__main__":
+    configure_logging()
     graph = build_code_graph("sample_data")
     with open("code_graph.json", "w") as f:
-        json.dump(graph, f, indent=2)
+        json.dump(graph.to_dict(), f, indent=2)
 
-    print("Graph saved → code_graph.json")
+    logger.info("Graph saved → code_graph.json")
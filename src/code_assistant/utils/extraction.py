@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from .code_chunk_extractor import CodeChunkExtractor
+from .code_graph import build_graph_for_file
+from .languages import language_for_path
+
+# bump when chunking or graph rules change, so cached results are not reused
+PARSE_CACHE_VERSION = 1
+
+
+def extract_file(path: str, code: bytes, with_graph: bool = True):
+    """
+    Parse a file once and return (chunks, nodes, edges) from the same tree.
+
+    Chunks carry their file_path. Without with_graph, nodes and edges are None.
+    Files in an unsupported language give ([], {}, []).
+    """
+    language = language_for_path(path)
+    if language is None:
+        return [], {}, []
+    extractor = CodeChunkExtractor(code, language=language.name)
+    chunks = []
+    for ch in extractor.iter_chunks():
+        ch["file_path"] = path
+        chunks.append(ch)
+    if not with_graph:
+        return chunks, None, None
+    nodes, edges = build_graph_for_file(path, code, tree=extractor.tree)
+    return chunks, nodes, edges
+
+
+class ParseCache:
+    """
+    Extraction results on disk, keyed by file path and content hash.
+
+    One JSON file per entry, written atomically, so parser worker processes can
+    share the cache without locking. Switching back to a branch or rebuilding a
+    store re-uses the results instead of parsing again.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+
+    def _path(self, path: str, content_hash: str) -> Path:
+        key = hashlib.sha1(f"{PARSE_CACHE_VERSION}\0{path}\0{content_hash}".encode("utf8"))
+        key = key.hexdigest()
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, path: str, content_hash: str, with_graph: bool = True):
+        """(chunks, nodes, edges), or None on a miss (or when the graph was not cached)."""
+        entry = self._path(path, content_hash)
+        try:
+            with open(entry, "r", encoding="utf8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if with_graph and data["nodes"] is None:
+            return None
+        return data["chunks"], data["nodes"], data["edges"]
+
+    def put(self, path: str, content_hash: str, chunks, nodes, edges):
+        entry = self._path(path, content_hash)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = entry.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf8") as f:
+            json.dump({"chunks": chunks, "nodes": nodes, "edges": edges}, f)
+        os.replace(tmp, entry)
+
+
+def extract_cached(path: str, code: bytes, content_hash: str, cache=None, with_graph=True):
+    """extract_file, served from and stored into a ParseCache when one is given."""
+    if cache is not None:
+        cached = cache.get(path, content_hash, with_graph)
+        if cached is not None:
+            return cached
+    result = extract_file(path, code, with_graph)
+    if cache is not None:
+        cache.put(path, content_hash, *result)
+    return result
@@ -0,0 +1,217 @@
+import sqlite3
+import threading
+from pathlib import Path
+
+
+class CodeGraphStore:
+    """
+    Code graph persisted in SQLite.
+
+    Node IDs use the chunk ID format (`file:start-end`), so vector search hits map
+    straight onto graph nodes. Edges go from a node (or a file, for top-level code)
+    to a callee name, decorator or import target, and are indexed on both ends so
+    caller / callee / importer queries cost O(degree). Each file can be replaced
+    on its own, keyed by its content hash.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, hash TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS nodes (
+                id TEXT PRIMARY KEY,
+                file TEXT NOT NULL,
+                name TEXT NOT NULL,
+                type TEXT NOT NULL,
+                start_line INTEGER NOT NULL,
+                end_line INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS edges (
+                src TEXT NOT NULL,
+                dst TEXT NOT NULL,
+                type TEXT NOT NULL,
+                file TEXT NOT NULL,
+                line INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS nodes_file ON nodes (file);
+            CREATE INDEX IF NOT EXISTS nodes_name ON nodes (name);
+            CREATE INDEX IF NOT EXISTS edges_src ON edges (src, type);
+            CREATE INDEX IF NOT EXISTS edges_dst ON edges (dst, type);
+            CREATE INDEX IF NOT EXISTS edges_file ON edges (file);
+            CREATE TABLE IF NOT EXISTS neighbours (
+                node_id TEXT NOT NULL,
+                neighbour_id TEXT NOT NULL,
+                relation TEXT NOT NULL,
+                weight INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS neighbours_node ON neighbours (node_id, weight);
+            """
+        )
+        self.conn.commit()
+
+    def file_hash(self, path: str):
+        with self.lock:
+            row = self.conn.execute("SELECT hash FROM files WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else None
+
+    def files(self):
+        with self.lock:
+            return [row[0] for row in self.conn.execute("SELECT path FROM files")]
+
+    def _remove(self, path: str):
+        self.conn.execute("DELETE FROM nodes WHERE file = ?", (path,))
+        self.conn.execute("DELETE FROM edges WHERE file = ?", (path,))
+        self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def replace_file(self, path: str, content_hash: str, nodes: dict, edges: list):
+        """Swap in the nodes and edges of one file in a single transaction."""
+        with self.lock:
+            self._remove(path)
+            self.conn.execute(
+                "INSERT INTO files (path, hash) VALUES (?, ?)", (path, content_hash)
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO nodes (id, file, name, type, start_line, end_line) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (node_id, n["file"], n["name"], n["type"], n["start_line"], n["end_line"])
+                    for node_id, n in nodes.items()
+                ],
+            )
+            self.conn.executemany(
+                "INSERT INTO edges (src, dst, type, file, line) VALUES (?, ?, ?, ?, ?)",
+                [(e["from"], e["to"], e["type"], path, e["line"]) for e in edges],
+            )
+            self.conn.commit()
+
+    def remove_file(self, path: str):
+        with self.lock:
+            self._remove(path)
+            self.conn.commit()
+
+    def rebuild_neighbours(self, max_ambiguity: int = 3):
+        """
+        Materialize callee / caller neighbour lists for every node.
+
+        A call resolves to every node with the callee's name. Targets in the caller's
+        own file or in a file it imports get weight 2; others get weight 1 and are
+        dropped when more than max_ambiguity nodes share the name (`get`, `map`, ...).
+        """
+        with self.lock:
+            self.conn.executescript(
+                f"""
+                DELETE FROM neighbours;
+                CREATE TEMP TABLE resolved AS
+                SELECT DISTINCT e.src AS node_id, n.id AS neighbour_id,
+                    CASE WHEN n.file = s.file OR EXISTS (
+                        SELECT 1 FROM edges i
+                        WHERE i.src = s.file AND i.type = 'import' AND i.dst = n.file
+                    ) THEN 2 ELSE 1 END AS weight
+                FROM edges e
+                JOIN nodes s ON s.id = e.src
+                JOIN nodes n ON n.name = e.dst
+                WHERE e.type = 'call' AND n.id != s.id;
+                DELETE FROM resolved WHERE weight = 1 AND neighbour_id IN (
+                    SELECT id FROM nodes WHERE name IN (
+                        SELECT name FROM nodes GROUP BY name HAVING COUNT(*) > {int(max_ambiguity)}
+                    )
+                );
+                INSERT INTO neighbours (node_id, neighbour_id, relation, weight)
+                SELECT node_id, neighbour_id, 'callee', weight FROM resolved;
+                INSERT INTO neighbours (node_id, neighbour_id, relation, weight)
+                SELECT neighbour_id, node_id, 'caller', weight FROM resolved;
+                DROP TABLE resolved;
+                """
+            )
+            self.conn.commit()
+
+    def neighbours(self, node_id: str, limit: int = 8):
+        """Precomputed [(neighbour id, relation)] of node_id, strongest first, callees first."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT neighbour_id, relation FROM neighbours WHERE node_id = ? "
+                "ORDER BY weight DESC, relation ASC LIMIT ?",
+                (node_id, limit),
+            ).fetchall()
+        return rows
+
+    def node(self, node_id: str):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id, file, name, type, start_line, end_line FROM nodes WHERE id = ?",
+                (node_id,),
+            ).fetchone()
+        return self._node(row) if row else None
+
+    @staticmethod
+    def _node(row) -> dict:
+        node_id, file, name, node_type, start_line, end_line = row
+        return {
+            "id": node_id,
+            "file": file,
+            "name": name,
+            "type": node_type,
+            "start_line": start_line,
+            "end_line": end_line,
+        }
+
+    def nodes_named(self, name: str):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, file, name, type, start_line, end_line FROM nodes WHERE name = ?",
+                (name,),
+            ).fetchall()
+        return [self._node(row) for row in rows]
+
+    def callers(self, name: str):
+        """IDs of the nodes (or files) that call something named `name`."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT src FROM edges WHERE dst = ? AND type = 'call'", (name,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def callees(self, node_id: str):
+        """Names called from inside node_id."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT dst FROM edges WHERE src = ? AND type = 'call'", (node_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def importers(self, target: str):
+        """Files importing `target` (a resolved file path or a bare module name)."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT src FROM edges WHERE dst = ? AND type = 'import'", (target,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def imports(self, path: str):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT dst FROM edges WHERE src = ? AND type = 'import'", (path,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def to_dict(self) -> dict:
+        """Export in the old build_code_graph JSON shape (plus line info)."""
+        with self.lock:
+            nodes = self.conn.execute(
+                "SELECT id, file, name, type, start_line, end_line FROM nodes"
+            ).fetchall()
+            edges = self.conn.execute("SELECT src, dst, type, file, line FROM edges").fetchall()
+        return {
+            "nodes": {row[0]: self._node(row) for row in nodes},
+            "edges": [
+                {"from": src, "to": dst, "type": edge_type, "file": file, "line": line}
+                for src, dst, edge_type, file, line in edges
+            ],
+        }
+
+    def close(self):
+        self.conn.close()
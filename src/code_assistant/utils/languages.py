@@ -0,0 +1,161 @@
+import importlib
+import os
+
+from tree_sitter import Language, Parser, Query
+
+TS_IMPORT_EXTENSIONS = (".ts", ".tsx", "/index.ts", "/index.tsx")
+
+
+def resolve_ts_import(path, module_path):
+    """Resolve a relative import to a file path; bare module names are kept as is."""
+    if not module_path.startswith("."):
+        return module_path
+    base = os.path.normpath(os.path.join(os.path.dirname(path), module_path))
+    for ext in ("",) + TS_IMPORT_EXTENSIONS:
+        if os.path.isfile(base + ext):
+            return base + ext
+    return base
+
+
+def resolve_python_import(path, module):
+    """`from ..auth.store import x` in pkg/api/views.py -> pkg/auth/store.py."""
+    if not module.startswith("."):
+        return module
+    dots = len(module) - len(module.lstrip("."))
+    base = os.path.dirname(path)
+    for _ in range(dots - 1):
+        base = os.path.dirname(base)
+    rest = module[dots:].replace(".", "/")
+    base = os.path.normpath(os.path.join(base, rest)) if rest else base
+    for candidate in (base + ".py", os.path.join(base, "__init__.py")):
+        if os.path.isfile(candidate):
+            return candidate
+    return base
+
+
+def keep_import(path, module):
+    return module
+
+
+class LanguageSpec:
+    """
+    How one language is parsed, chunked and turned into graph nodes and edges.
+
+    - grammar: (module, function) returning the tree-sitter language capsule
+    - chunk_types: node types emitted as chunks
+    - graph_nodes: node type -> graph node kind ("class", "method", ...)
+    - call_types: call node type -> field holding the callee
+    - member_types: member access node type -> field holding the called name
+    - import_types: import node type -> field holding the imported module
+    - resolve_import: (importing file, module text) -> file path or module name
+    """
+
+    def __init__(
+        self,
+        name,
+        extensions,
+        grammar,
+        chunk_types,
+        graph_nodes,
+        call_types,
+        member_types,
+        import_types,
+        resolve_import=keep_import,
+    ):
+        self.name = name
+        self.extensions = tuple(extensions)
+        self.grammar = grammar
+        self.chunk_types = frozenset(chunk_types)
+        self.graph_nodes = graph_nodes
+        self.call_types = call_types
+        self.member_types = member_types
+        self.import_types = import_types
+        self.resolve_import = resolve_import
+
+
+_TS_RULES = dict(
+    chunk_types=(
+        "class_declaration",
+        "function_declaration",
+        "method_definition",
+        "arrow_function",
+        "function_signature",
+    ),
+    graph_nodes={
+        "class_declaration": "class",
+        "method_definition": "method",
+        "function_declaration": "function",
+    },
+    call_types={"call_expression": "function"},
+    member_types={"member_expression": "property"},
+    import_types={"import_statement": "source"},
+    resolve_import=resolve_ts_import,
+)
+
+LANGUAGES = {
+    spec.name: spec
+    for spec in (
+        LanguageSpec(
+            "typescript", (".ts",), ("tree_sitter_typescript", "language_typescript"), **_TS_RULES
+        ),
+        LanguageSpec("tsx", (".tsx",), ("tree_sitter_typescript", "language_tsx"), **_TS_RULES),
+        LanguageSpec(
+            "python",
+            (".py",),
+            ("tree_sitter_python", "language"),
+            chunk_types=("class_definition", "function_definition"),
+            graph_nodes={"class_definition": "class", "function_definition": "function"},
+            call_types={"call": "function"},
+            member_types={"attribute": "attribute"},
+            import_types={"import_statement": "name", "import_from_statement": "module_name"},
+            resolve_import=resolve_python_import,
+        ),
+        LanguageSpec(
+            "go",
+            (".go",),
+            ("tree_sitter_go", "language"),
+            chunk_types=("function_declaration", "method_declaration", "type_spec"),
+            graph_nodes={
+                "function_declaration": "function",
+                "method_declaration": "method",
+                "type_spec": "type",
+            },
+            call_types={"call_expression": "function"},
+            member_types={"selector_expression": "field"},
+            import_types={"import_spec": "path"},
+        ),
+    )
+}
+
+_BY_EXTENSION = {ext: spec for spec in LANGUAGES.values() for ext in spec.extensions}
+_parsers = {}
+_chunk_queries = {}
+
+
+def language_for_path(path):
+    """LanguageSpec for a file name, or None when its extension is not supported."""
+    return _BY_EXTENSION.get(os.path.splitext(path)[1])
+
+
+def source_extensions():
+    return tuple(_BY_EXTENSION)
+
+
+def get_parser(language: str = "typescript") -> Parser:
+    """Return this process's parser for language, loading the grammar on first use."""
+    parser = _parsers.get(language)
+    if parser is None:
+        module_name, function = LANGUAGES[language].grammar
+        capsule = getattr(importlib.import_module(module_name), function)()
+        parser = _parsers[language] = Parser(Language(capsule))
+    return parser
+
+
+def get_chunk_query(language: str = "typescript") -> Query:
+    """This process's query capturing every chunk node type of language as @chunk."""
+    query = _chunk_queries.get(language)
+    if query is None:
+        node_types = LANGUAGES[language].chunk_types
+        pattern = " ".join(f"({node_type}) @chunk" for node_type in node_types)
+        query = _chunk_queries[language] = Query(get_parser(language).language, pattern)
+    return query
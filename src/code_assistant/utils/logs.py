@@ -0,0 +1,19 @@
+import logging
+import os
+import sys
+
+
+def configure_logging(level: str = None):
+    """
+    Send code_assistant's log records to stderr at level (LOG_LEVEL, default INFO).
+
+    Below the level, records are dropped before formatting, so debug output such
+    as per-batch progress costs nothing unless LOG_LEVEL=DEBUG.
+    """
+    logger = logging.getLogger("code_assistant")
+    logger.setLevel((level or os.environ.get("LOG_LEVEL") or "INFO").upper())
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+    return logger
@@ -0,0 +1,231 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+_current_trace = ContextVar("current_trace", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels_text(labels, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Summary:
+    """Count and sum of one series, plus a window of recent values for quantiles."""
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+    def quantiles(self) -> dict:
+        values = sorted(self.recent)
+        if not values:
+            return {}
+        return {q: values[min(int(q * len(values)), len(values) - 1)] for q in QUANTILES}
+
+
+class Trace:
+    """
+    The timed stages of one request, in the order they finished.
+
+    Every `Metrics.timer` run while the trace is current (also in executor threads
+    started with contextvars.copy_context) adds a span; `attrs` holds request-level
+    values such as the backend or time to first token.
+    """
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.spans = []
+
+    def add(self, name: str, started: float, seconds: float, labels=()):
+        self.spans.append(
+            {
+                "name": name,
+                "start_ms": (started - self.started) * 1000,
+                "ms": seconds * 1000,
+                **dict(labels),
+            }
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "trace": self.name,
+            "timestamp": self.started_at,
+            "total_ms": None if self.seconds is None else self.seconds * 1000,
+            **self.attrs,
+            "spans": list(self.spans),
+        }
+
+
+class Metrics:
+    """
+    Process-wide counters, timing/size summaries and recent request traces.
+
+    Series are keyed by name and labels (e.g. backend="ann"). Summaries keep
+    count, sum and the last `window` values, from which p50/p90/p99 are computed
+    on export. Everything can be exported as Prometheus text (`prometheus`) or JSON
+    lines (`jsonl`); finished traces are also appended to `trace_path` when set.
+    Recording is a lock and a deque append, cheap enough for the query hot path.
+    """
+
+    def __init__(
+        self,
+        namespace: str = "code_assistant",
+        window: int = 1024,
+        max_traces: int = 100,
+        trace_path: str = None,
+    ):
+        self.namespace = namespace
+        self.window = window
+        self.trace_path = trace_path
+        self.lock = threading.Lock()
+        self.counters = {}  # (name, labels) -> value
+        self.summaries = {}  # (name, labels) -> Summary
+        self.traces = deque(maxlen=max_traces)
+
+    @staticmethod
+    def _key(name: str, labels: dict):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            summary = self.summaries.get(key)
+            if summary is None:
+                summary = self.summaries[key] = Summary(self.window)
+            summary.add(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Observe the seconds spent in the block, as a span of the current trace too."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self.observe(name, seconds, **labels)
+            trace = _current_trace.get()
+            if trace is not None:
+                trace.add(name, started, seconds, self._key(name, labels)[1])
+
+    @contextmanager
+    def trace(self, name: str, **attrs):
+        """Make a new Trace current for the block and keep it once the block ends."""
+        trace = Trace(name, **attrs)
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+            trace.seconds = time.perf_counter() - trace.started
+            record = trace.to_dict()
+            with self.lock:
+                self.traces.append(record)
+                if self.trace_path:
+                    with open(self.trace_path, "a", encoding="utf8") as f:
+                        f.write(json.dumps(record) + "\n")
+
+    def recent_traces(self, n: int = 20) -> list:
+        with self.lock:
+            return list(self.traces)[-n:]
+
+    def snapshot(self) -> dict:
+        """{"counters": [...], "summaries": [...]}, one dict per series."""
+        with self.lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            summaries = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": summary.count,
+                    "sum": summary.total,
+                    "quantiles": {str(q): v for q, v in summary.quantiles().items()},
+                }
+                for (name, labels), summary in sorted(self.summaries.items())
+            ]
+        return {"counters": counters, "summaries": summaries}
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition format."""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            summaries = sorted(
+                (key, summary.count, summary.total, summary.quantiles())
+                for key, summary in self.summaries.items()
+            )
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            full = f"{self.namespace}_{name}"
+            if full not in typed:
+                typed.add(full)
+                lines.append(f"# TYPE {full} counter")
+            lines.append(f"{full}{_labels_text(labels)} {value}")
+        for (name, labels), count, total, quantiles in summaries:
+            full = f"{self.namespace}_{name}"
+            if full not in typed:
+                typed.add(full)
+                lines.append(f"# TYPE {full} summary")
+            for q, value in quantiles.items():
+                quantile = f'quantile="{q}"'
+                lines.append(f"{full}{_labels_text(labels, quantile)} {value}")
+            lines.append(f"{full}_sum{_labels_text(labels)} {total}")
+            lines.append(f"{full}_count{_labels_text(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def jsonl(self) -> str:
+        """One JSON object per series, stamped with the export time."""
+        now = time.time()
+        snapshot = self.snapshot()
+        records = [{"timestamp": now, "type": "counter", **c} for c in snapshot["counters"]]
+        records += [{"timestamp": now, "type": "summary", **s} for s in snapshot["summaries"]]
+        return "".join(json.dumps(record) + "\n" for record in records)
+
+    def write(self, path: str):
+        """Write Prometheus text to a .prom file, else append JSON lines."""
+        if str(path).endswith(".prom"):
+            with open(path, "w", encoding="utf8") as f:
+                f.write(self.prometheus())
+        else:
+            with open(path, "a", encoding="utf8") as f:
+                f.write(self.jsonl())
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.summaries.clear()
+            self.traces.clear()
+
+
+# METRICS_TRACE_PATH appends every finished request trace to a JSON lines file
+METRICS = Metrics(trace_path=os.environ.get("METRICS_TRACE_PATH"))
@@ -1,3 +1,20 @@
-from .chroma_store import ChromaStore
+import importlib
 
-__all__ = ["ChromaStore"]
+# exports are imported on first access, so importing one vector_db module does
+# not also load chromadb, or torch through the encoder
+_EXPORTS = {
+    "AnnStore": ".ann_store",
+    "ChromaStore": ".chroma_store",
+    "Encoder": ".encoder",
+    "VectorStore": ".vector_store",
+    "get_encoder": ".encoder",
+    "open_store": ".stores",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
@@ -0,0 +1,644 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from .quantization import (
+    BLOCK_ROWS,
+    ProductQuantizer,
+    ScalarQuantizer,
+    assign,
+    kmeans,
+    make_quantizer,
+    squared_distances,
+)
+from .scope import SCOPE_FIELDS
+from .vector_store import VectorStore, query_result
+
+TRAIN_SAMPLE = 100_000
+SQL_VARIABLES = 900
+
+logger = logging.getLogger(__name__)
+
+
+def smallest(values, n: int) -> np.ndarray:
+    """Indices of the n smallest values, smallest first."""
+    if n < len(values):
+        part = np.argpartition(values, n)[:n]
+        return part[np.argsort(values[part], kind="stable")]
+    return np.argsort(values, kind="stable")
+
+
+def smallest_per_row(values, n: int) -> np.ndarray:
+    """Column indices of the n smallest values of every row, smallest first."""
+    if n < values.shape[1]:
+        part = np.argpartition(values, n, axis=1)[:, :n]
+    else:
+        part = np.broadcast_to(np.arange(values.shape[1]), values.shape)
+    order = np.argsort(np.take_along_axis(values, part, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+class AnnStore(VectorStore):
+    """
+    In-process vector store: float32 vectors in a memory-mapped file under an IVF index.
+
+    Below `train_size` vectors every search is exact over the memory-mapped matrix.
+    From then on k-means centroids split the vectors into inverted lists, and a
+    query only scans the `nprobe` lists nearest to it. With `quantization` the scan
+    reads compact codes instead of the float32 vectors ("int8": 1 byte per
+    dimension, "pq": `pq_subvectors` bytes per vector) and the best `k * rerank`
+    candidates are re-ranked exactly, so only those float32 rows are paged in.
+
+    Vectors added after training go to their nearest list. The index is retrained,
+    and deleted rows compacted, when the store has grown `retrain_growth` times
+    since the last training or when `build_index()` is called (e.g. after changing
+    `quantization` or `nlist`); deleted rows are also compacted away as soon as they
+    outnumber the live ones. Documents and metadata live in SQLite next to the
+    vectors. Distances are squared L2, like Chroma's default.
+
+    The scope fields of each chunk (type, language, package, directory prefixes)
+    are indexed in a tags table, so a scoped search looks its rows up instead of
+    filtering a larger top-k. A scope smaller than an IVF scan is searched exactly
+    over just its rows; a larger one is scanned through the lists with the other
+    rows masked out.
+    """
+
+    backend = "ann"
+
+    def __init__(
+        self,
+        persist_dir: str = "./storage",
+        collection_name: str = "code_embeddings",
+        cache_dir: str = None,
+        cache_size: int = 200_000,
+        encoder=None,
+        quantization: str = "int8",
+        nlist: int = None,
+        nprobe: int = 16,
+        rerank: int = 4,
+        pq_subvectors: int = 16,
+        train_size: int = 20_000,
+        retrain_growth: float = 4.0,
+    ):
+        """
+        - quantization: None (scan float32 vectors), "int8" or "pq"
+        - nlist: number of inverted lists (defaults to the square root of the vector count)
+        - nprobe: lists scanned per query
+        - rerank: candidates re-ranked exactly, as a multiple of k
+        - pq_subvectors: bytes per vector with "pq" (must divide the vector size)
+        - train_size: vectors needed before an index is trained
+        - retrain_growth: growth factor since the last training that triggers a retrain
+        """
+        self.dir = Path(persist_dir) / f"{collection_name}.ann"
+        super().__init__(
+            persist_dir,
+            lexical_path=self.dir / "lexical.sqlite",
+            cache_dir=cache_dir,
+            cache_size=cache_size,
+            encoder=encoder,
+        )
+        self.quantization = quantization
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self.pq_subvectors = pq_subvectors
+        self.train_size = train_size
+        self.retrain_growth = retrain_growth
+        self.lock = threading.RLock()
+
+        self.conn = sqlite3.connect(str(self.dir / "chunks.sqlite"), check_same_thread=False)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                id TEXT PRIMARY KEY, row INTEGER NOT NULL, document TEXT, metadata TEXT
+            );
+            CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS tags (
+                id TEXT NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS tags_value ON tags (field, value);
+            CREATE INDEX IF NOT EXISTS tags_id ON tags (id);
+            """
+        )
+        self.conn.commit()
+        settings = dict(self.conn.execute("SELECT key, value FROM settings"))
+        self.dim = int(settings["dim"]) if "dim" in settings else None
+        self.rows = int(settings.get("rows", 0))
+        self.row_ids = [None] * self.rows
+        for chunk_id, row in self.conn.execute("SELECT id, row FROM chunks"):
+            self.row_ids[row] = chunk_id
+        self.live = sum(chunk_id is not None for chunk_id in self.row_ids)
+
+        self.capacity = 0
+        self.alive = np.zeros(0, dtype=bool)
+        self.vectors = self.lists = self.codes = None
+        self.centroids = None
+        self.quantizer = None
+        self.trained_rows = 0
+        self._order = None  # (live rows sorted by list, list boundaries), rebuilt after writes
+        self._scopes = {}  # scope conditions -> matching rows, cleared after writes
+        if self.dim is not None:
+            self.capacity = os.path.getsize(self.dir / "vectors.f32") // (self.dim * 4)
+            self._load_index()
+            self._remap()
+            self.alive = np.zeros(self.capacity, dtype=bool)
+            self.alive[[row for row, i in enumerate(self.row_ids) if i is not None]] = True
+            if self.centroids is not None and self._index_kind() != self.quantization:
+                self.build_index()
+
+    def _setting(self, key: str, value):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, str(value))
+        )
+
+    def _map(self, name: str, dtype, width: int = None):
+        shape = (self.capacity, width) if width else (self.capacity,)
+        return np.memmap(self.dir / name, dtype=dtype, mode="r+", shape=shape)
+
+    def _files(self):
+        """(file name, bytes per row) of every per-row file in use."""
+        files = [("vectors.f32", self.dim * 4)]
+        if self.centroids is not None:
+            files.append(("lists.i32", 4))
+        if self.quantizer is not None:
+            files.append(("codes.u8", self.quantizer.code_size(self.dim)))
+        return files
+
+    def _remap(self):
+        self.vectors = self._map("vectors.f32", np.float32, self.dim)
+        self.lists = self._map("lists.i32", np.int32) if self.centroids is not None else None
+        self.codes = None
+        if self.quantizer is not None:
+            self.codes = self._map("codes.u8", np.uint8, self.quantizer.code_size(self.dim))
+
+    def _resize_files(self, capacity: int):
+        for name, row_bytes in self._files():
+            with open(self.dir / name, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        self.capacity = capacity
+        self._remap()
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: len(self.alive)] = self.alive[:capacity]
+        self.alive = alive
+
+    def _index_kind(self):
+        return self.quantizer.kind if self.quantizer is not None else None
+
+    def _load_index(self):
+        path = self.dir / "index.npz"
+        if not path.exists():
+            return
+        with np.load(path) as index:
+            self.centroids = index["centroids"]
+            self.trained_rows = int(index["trained_rows"])
+            if "codebooks" in index:
+                codebooks = index["codebooks"]
+                self.quantizer = ProductQuantizer(len(codebooks), codebooks)
+            elif "low" in index:
+                self.quantizer = ScalarQuantizer(index["low"], index["scale"])
+
+    def _save_index(self):
+        state = self.quantizer.state() if self.quantizer is not None else {}
+        tmp = self.dir / "index.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, centroids=self.centroids, trained_rows=self.trained_rows, **state)
+        os.replace(tmp, self.dir / "index.npz")
+
+    def add_embeddings(self, ids: List[str], texts: List[str], embeddings, metadata):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        with self.lock:
+            # re-adding an ID replaces it
+            self._remove(ids)
+            self._compact_if_sparse()
+            if self.dim is None:
+                self.dim = embeddings.shape[1]
+                self._setting("dim", self.dim)
+            start, end = self.rows, self.rows + len(ids)
+            if end > self.capacity:
+                self._resize_files(max(end, self.capacity * 2, 1024))
+            self.vectors[start:end] = embeddings
+            if self.centroids is not None:
+                self.lists[start:end] = assign(embeddings, self.centroids)
+            if self.quantizer is not None:
+                self.codes[start:end] = self.quantizer.encode(embeddings)
+            self.alive[start:end] = True
+            self.row_ids.extend(ids)
+            self.rows, self.live = end, self.live + len(ids)
+            self.conn.executemany(
+                "INSERT INTO chunks (id, row, document, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (chunk_id, start + i, text, json.dumps(meta))
+                    for i, (chunk_id, text, meta) in enumerate(
+                        zip(ids, texts, metadata, strict=True)
+                    )
+                ],
+            )
+            self.conn.executemany(
+                "INSERT INTO tags (id, field, value) VALUES (?, ?, ?)",
+                [
+                    (chunk_id, field, str(meta[field]))
+                    for chunk_id, meta in zip(ids, metadata, strict=True)
+                    for field in SCOPE_FIELDS
+                    if meta.get(field) not in (None, "")
+                ],
+            )
+            self._setting("rows", self.rows)
+            self.conn.commit()
+            self._order = None
+            self._scopes = {}
+
+            if self.centroids is None:
+                if self.live >= self.train_size:
+                    self.build_index()
+            elif self.live >= self.trained_rows * self.retrain_growth:
+                self.build_index()
+        self.lexical_index.add(ids, texts, metadata)
+
+    def _remove(self, ids: List[str]):
+        removed = 0
+        for i in range(0, len(ids), SQL_VARIABLES):
+            page = ids[i : i + SQL_VARIABLES]
+            marks = ",".join("?" * len(page))
+            for (row,) in self.conn.execute(f"SELECT row FROM chunks WHERE id IN ({marks})", page):
+                self.row_ids[row] = None
+                self.alive[row] = False
+                removed += 1
+            self.conn.execute(f"DELETE FROM chunks WHERE id IN ({marks})", page)
+            self.conn.execute(f"DELETE FROM tags WHERE id IN ({marks})", page)
+        if removed:
+            self.live -= removed
+            self._order = None
+            self._scopes = {}
+
+    def _delete(self, ids: List[str]):
+        with self.lock:
+            self._remove(ids)
+            self._compact_if_sparse()
+            self.conn.commit()
+
+    def _new_file(self, name: str, dtype, width: int = None):
+        """A fresh memory-mapped file written next to name, swapped in by _replace_files."""
+        row_bytes = np.dtype(dtype).itemsize * (width or 1)
+        with open(self.dir / f"{name}.new", "wb") as f:
+            f.truncate(self.capacity * row_bytes)
+        shape = (self.capacity, width) if width else (self.capacity,)
+        return np.memmap(self.dir / f"{name}.new", dtype=dtype, mode="r+", shape=shape)
+
+    def _replace_files(self, *names):
+        # searches running outside the lock keep reading the old files until they finish
+        for name in names:
+            os.replace(self.dir / f"{name}.new", self.dir / name)
+        self._remap()
+
+    def _compact(self):
+        """Move live rows to the front of every per-row file, dropping deleted ones."""
+        keep = np.flatnonzero(self.alive[: self.rows])
+        if len(keep) == self.rows:
+            return
+        names = []
+        for name, source in (
+            ("vectors.f32", self.vectors),
+            ("lists.i32", self.lists),
+            ("codes.u8", self.codes),
+        ):
+            if source is None:
+                continue
+            width = source.shape[1] if source.ndim > 1 else None
+            target = self._new_file(name, source.dtype, width)
+            for start in range(0, len(keep), BLOCK_ROWS):
+                block = keep[start : start + BLOCK_ROWS]
+                target[start : start + len(block)] = source[block]
+            target.flush()
+            del target
+            names.append(name)
+        self._replace_files(*names)
+        self.row_ids = [self.row_ids[row] for row in keep]
+        self.conn.executemany(
+            "UPDATE chunks SET row = ? WHERE id = ?", list(enumerate(self.row_ids))
+        )
+        self.rows = len(keep)
+        self._setting("rows", self.rows)
+        self.conn.commit()
+        self.alive = np.zeros(self.capacity, dtype=bool)
+        self.alive[: self.rows] = True
+        self._order = None
+        self._scopes = {}
+
+    def _compact_if_sparse(self):
+        # keep deleted rows from outnumbering live ones, so delete and re-add
+        # cycles don't grow the files and the scans without bound
+        if self.rows - self.live > self.live:
+            self._compact()
+
+    def build_index(self):
+        """Compact the vectors and train the lists and quantizer on the current contents."""
+        with self.lock:
+            if self.dim is None:
+                return
+            self._compact()
+            if not self.rows:
+                return
+            rng = np.random.default_rng(0)
+            sample_rows = np.sort(rng.choice(self.rows, min(self.rows, TRAIN_SAMPLE), False))
+            sample = np.asarray(self.vectors[sample_rows])
+            nlist = self.nlist or max(1, int(np.sqrt(self.rows)))
+            self.centroids = kmeans(sample, nlist)
+            self.quantizer = None
+            if self.quantization:
+                self.quantizer = make_quantizer(self.quantization, self.pq_subvectors)
+                self.quantizer.train(sample)
+
+            lists = self._new_file("lists.i32", np.int32)
+            codes = None
+            if self.quantizer is not None:
+                code_size = self.quantizer.code_size(self.dim)
+                codes = self._new_file("codes.u8", np.uint8, code_size)
+            for start in range(0, self.rows, BLOCK_ROWS):
+                block = np.asarray(self.vectors[start : min(start + BLOCK_ROWS, self.rows)])
+                lists[start : start + len(block)] = assign(block, self.centroids)
+                if codes is not None:
+                    codes[start : start + len(block)] = self.quantizer.encode(block)
+            for matrix in (lists, codes):
+                if matrix is not None:
+                    matrix.flush()
+            del lists, codes
+            self._replace_files(*[name for name, _ in self._files()[1:]])
+            if self.quantizer is None and (self.dir / "codes.u8").exists():
+                os.remove(self.dir / "codes.u8")
+            self.trained_rows = self.rows
+            self._save_index()
+            self._order = None
+            logger.info(
+                "ANN index: %d lists over %d vectors, %s scan",
+                len(self.centroids),
+                self.rows,
+                self.quantization or "float32",
+            )
+
+    def flush(self):
+        """Persist the embedding cache index and the memory-mapped vectors and codes."""
+        super().flush()
+        with self.lock:
+            for matrix in (self.vectors, self.lists, self.codes):
+                if matrix is not None:
+                    matrix.flush()
+
+    def iter_ids(self, page_size: int = 10_000):
+        """Stream every stored ID page by page, without documents, embeddings or metadata."""
+        offset = 0
+        while True:
+            with self.lock:
+                ids = [
+                    chunk_id
+                    for (chunk_id,) in self.conn.execute(
+                        "SELECT id FROM chunks ORDER BY row LIMIT ? OFFSET ?", (page_size, offset)
+                    )
+                ]
+            if not ids:
+                return
+            yield from ids
+            offset += len(ids)
+
+    def _select(self, columns: str, ids: List[str]):
+        rows = []
+        with self.lock:
+            for i in range(0, len(ids), SQL_VARIABLES):
+                page = ids[i : i + SQL_VARIABLES]
+                marks = ",".join("?" * len(page))
+                rows.extend(
+                    self.conn.execute(f"SELECT {columns} FROM chunks WHERE id IN ({marks})", page)
+                )
+        return rows
+
+    def existing_ids(self, ids: List[str], page_size: int = 10_000) -> set:
+        """Return the subset of ids already stored."""
+        return {chunk_id for (chunk_id,) in self._select("id", ids)}
+
+    def count(self) -> int:
+        return self.live
+
+    def get_all(self):
+        with self.lock:
+            found = self.conn.execute(
+                "SELECT id, row, document, metadata FROM chunks ORDER BY row"
+            ).fetchall()
+            rows = [row for _, row, _, _ in found]
+            embeddings = np.asarray(self.vectors[rows]).tolist() if rows else []
+        return {
+            "ids": [chunk_id for chunk_id, _, _, _ in found],
+            "embeddings": embeddings,
+            "documents": [document for _, _, document, _ in found],
+            "metadatas": [json.loads(meta) for _, _, _, meta in found],
+        }
+
+    def _get(self, ids: List[str]):
+        found = self._select("id, document, metadata", ids)
+        return (
+            [chunk_id for chunk_id, _, _ in found],
+            [document for _, document, _ in found],
+            [json.loads(meta) for _, _, meta in found],
+        )
+
+    def _lists(self):
+        """Live rows grouped by inverted list and each list's [start, end) in that order."""
+        if self._order is None:
+            rows = np.flatnonzero(self.alive[: self.rows])
+            labels = np.asarray(self.lists[rows])
+            by_list = np.argsort(labels, kind="stable")
+            bounds = np.searchsorted(labels[by_list], np.arange(len(self.centroids) + 1))
+            self._order = (rows[by_list], bounds)
+        return self._order
+
+    def _scope_rows(self, conditions) -> np.ndarray:
+        """Sorted rows of the live chunks matching every condition, from the tags table."""
+        key = tuple(sorted((field, tuple(values)) for field, values in conditions.items()))
+        if key not in self._scopes:
+            rows = None
+            for field, values in conditions.items():
+                marks = ",".join("?" * len(values))
+                matched = self.conn.execute(
+                    "SELECT c.row FROM tags t JOIN chunks c ON c.id = t.id "
+                    f"WHERE t.field = ? AND t.value IN ({marks})",
+                    [field, *map(str, values)],
+                ).fetchall()
+                matched = np.unique(np.array([row for (row,) in matched], dtype=np.int64))
+                rows = matched if rows is None else np.intersect1d(rows, matched)
+            self._scopes[key] = rows
+        return self._scopes[key]
+
+    def _scope_ids(self, conditions) -> set:
+        with self.lock:
+            return {self.row_ids[row] for row in self._scope_rows(conditions)}
+
+    def nearest(self, query_embedding, n: int, exact: bool = False, conditions=None):
+        """
+        (ids, squared distances) of the n nearest stored vectors, nearest first.
+
+        With exact=True, or before an index is trained, every vector is compared.
+        conditions ({field: [allowed values]}) limits the search to matching chunks.
+        An ID is None when its chunk was deleted while the search ran.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)[None, :]
+        ids, distances = self.nearest_many(query, n, exact, conditions)
+        return ids[0], distances[0]
+
+    def nearest_many(self, query_embeddings, n: int, exact: bool = False, conditions=None):
+        """`nearest` for every row of query_embeddings: ([ids], [distances]) per query."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        with self.lock:
+            allowed = self._scope_rows(conditions) if conditions else None
+            if not self.live or (allowed is not None and not len(allowed)):
+                return [[] for _ in queries], [np.zeros(0, dtype=np.float32) for _ in queries]
+            # a consistent snapshot; writes replace these objects rather than the files behind them
+            vectors, rows, alive, row_ids = self.vectors, self.rows, self.alive, self.row_ids
+            if exact or self.centroids is None:
+                order = None
+            else:
+                order, bounds = self._lists()
+                centroids, quantizer, codes = self.centroids, self.quantizer, self.codes
+                # rows an IVF query reads; a smaller scope is cheaper to compare exactly
+                if allowed is not None and len(allowed) <= rows * self.nprobe / len(centroids):
+                    order = None
+
+        if allowed is not None and order is None:
+            found, distances = self._scan_rows(queries, n, vectors, allowed)
+        elif order is None:
+            found, distances = self._scan_all(queries, n, vectors, rows, alive)
+        else:
+            mask = None
+            if allowed is not None:
+                mask = np.zeros(len(alive), dtype=bool)
+                mask[allowed] = True
+            found, distances = self._scan_lists(
+                queries, n, vectors, order, bounds, centroids, quantizer, codes, mask
+            )
+            # a scope spread thinly over the probed lists can leave a query short
+            short = [i for i, f in enumerate(found) if mask is not None and len(f) < n]
+            if short:
+                exact_found, exact_distances = self._scan_rows(queries[short], n, vectors, allowed)
+                for i, f, d in zip(short, exact_found, exact_distances, strict=True):
+                    found[i], distances[i] = f, d
+        return [[row_ids[row] for row in rows] for rows in found], distances
+
+    @staticmethod
+    def _scan_rows(queries, n, vectors, rows):
+        """Exact search over the given rows only."""
+        found, distances = [], []
+        for start in range(0, len(rows), BLOCK_ROWS):
+            block_rows = rows[start : start + BLOCK_ROWS]
+            d = squared_distances(queries, vectors[block_rows])
+            top = smallest_per_row(d, n)
+            found.append(block_rows[top])
+            distances.append(np.take_along_axis(d, top, axis=1))
+        found, distances = np.concatenate(found, axis=1), np.concatenate(distances, axis=1)
+        top = smallest_per_row(distances, n)
+        return (
+            list(np.take_along_axis(found, top, axis=1)),
+            list(np.take_along_axis(distances, top, axis=1)),
+        )
+
+    @staticmethod
+    def _scan_all(queries, n, vectors, rows, alive):
+        found, distances = [], []
+        for start in range(0, rows, BLOCK_ROWS):
+            block = vectors[start : min(start + BLOCK_ROWS, rows)]
+            d = squared_distances(queries, block)
+            d[:, ~alive[start : start + len(block)]] = np.inf
+            top = smallest_per_row(d, n)
+            found.append(top + start)
+            distances.append(np.take_along_axis(d, top, axis=1))
+        found, distances = np.concatenate(found, axis=1), np.concatenate(distances, axis=1)
+        top = smallest_per_row(distances, n)
+        found = np.take_along_axis(found, top, axis=1)
+        distances = np.take_along_axis(distances, top, axis=1)
+        # fewer than n live vectors: drop the deleted rows' infinite distances
+        keep = [np.isfinite(row) for row in distances]
+        return [f[k] for f, k in zip(found, keep, strict=True)], [
+            d[k] for d, k in zip(distances, keep, strict=True)
+        ]
+
+    def _scan_lists(self, queries, n, vectors, order, bounds, centroids, quantizer, codes, mask):
+        probes = smallest_per_row(squared_distances(queries, centroids), self.nprobe)
+        keep = n * self.rerank if quantizer is not None else n
+        if len(queries) == 1:
+            lists = [order[bounds[i] : bounds[i + 1]] for i in probes[0]]
+            groups = [(np.zeros(1, dtype=np.int64), np.concatenate(lists))]
+        else:
+            # each list is scanned once, for all the queries probing it
+            groups = (
+                (np.flatnonzero((probes == i).any(axis=1)), order[bounds[i] : bounds[i + 1]])
+                for i in np.unique(probes)
+            )
+
+        candidates = [[] for _ in queries]
+        for members, rows in groups:
+            if mask is not None:
+                rows = rows[mask[rows]]
+            if not len(rows):
+                continue
+            if quantizer is not None:
+                d = quantizer.distances(queries[members], codes[rows])
+            else:
+                d = squared_distances(queries[members], vectors[rows])
+            top = smallest_per_row(d, keep)
+            for i, query in enumerate(members):
+                candidates[query].append((rows[top[i]], d[i, top[i]]))
+
+        found, distances = [], []
+        for query, parts in zip(queries, candidates, strict=True):
+            if not parts:
+                found.append(np.zeros(0, dtype=np.int64))
+                distances.append(np.zeros(0, dtype=np.float32))
+                continue
+            rows = np.concatenate([part_rows for part_rows, _ in parts])
+            d = np.concatenate([part_d for _, part_d in parts])
+            best = smallest(d, keep)
+            rows, d = rows[best], d[best]
+            if quantizer is not None:
+                # exact re-ranking reads only these float32 rows
+                rows = np.sort(rows)
+                d = squared_distances(query[None, :], vectors[rows])[0]
+                best = smallest(d, n)
+                rows, d = rows[best], d[best]
+            found.append(rows)
+            distances.append(d)
+        return found, distances
+
+    def _query(self, query_embedding: List[float], n_results: int, conditions=None) -> dict:
+        query_embeddings = np.asarray([query_embedding], dtype=np.float32)
+        return self._query_many(query_embeddings, n_results, conditions)[0]
+
+    def _query_many(self, query_embeddings, n_results: int, conditions=None) -> List[dict]:
+        ids, distances = self.nearest_many(query_embeddings, n_results, conditions=conditions)
+        found = [
+            [
+                (i, float(d))
+                for i, d in zip(query_ids, query_distances, strict=True)
+                if i is not None
+            ]
+            for query_ids, query_distances in zip(ids, distances, strict=True)
+        ]
+        # one SQLite lookup for the documents of every query
+        chunk_ids, documents, metadatas = self._get(list({i for hits in found for i, _ in hits}))
+        by_id = {
+            i: (doc, meta) for i, doc, meta in zip(chunk_ids, documents, metadatas, strict=True)
+        }
+        return [query_result(hits, by_id) for hits in found]
+
+    def index_stats(self) -> dict:
+        """Size of the index: lists, scan kind and bytes read per scanned vector."""
+        dim = self.dim or 0
+        return {
+            "vectors": self.live,
+            "lists": len(self.centroids) if self.centroids is not None else 0,
+            "quantization": self._index_kind(),
+            "scan_bytes_per_vector": (
+                self.quantizer.code_size(dim) if self.quantizer is not None else dim * 4
+            ),
+        }
@@ -2,35 +2,99 @@ from pathlib import Path
 from typing import List
 
 import chromadb
-import torch
-from sentence_transformers import SentenceTransformer
+import numpy as np
 
+from .vector_store import VectorStore
 
-class ChromaStore:
-    def __init__(self, persist_dir: str = "./storage", collection_name: str = "code_embeddings"):
-        self.persist_dir = Path(persist_dir)
-        self.persist_dir.mkdir(parents=True, exist_ok=True)
+
+def where_filter(conditions) -> dict:
+    """Chroma `where` clause for scope conditions {field: [allowed values]}."""
+    if not conditions:
+        return None
+    clauses = [
+        {field: values[0]} if len(values) == 1 else {field: {"$in": values}}
+        for field, values in conditions.items()
+    ]
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+class ChromaStore(VectorStore):
+    backend = "chroma"
+
+    def __init__(
+        self,
+        persist_dir: str = "./storage",
+        collection_name: str = "code_embeddings",
+        cache_dir: str = None,
+        cache_size: int = 200_000,
+        encoder=None,
+    ):
+        """
+        The embedding model is borrowed from the process-wide encoder (or `encoder`)
+        and only loaded on the first call that needs to embed or tokenize.
+        """
+        super().__init__(
+            persist_dir,
+            lexical_path=Path(persist_dir) / f"{collection_name}.lexical.sqlite",
+            cache_dir=cache_dir,
+            cache_size=cache_size,
+            encoder=encoder,
+        )
         self.client = chromadb.PersistentClient(path=str(self.persist_dir))
-        device = "mps" if torch.backends.mps.is_available() else "cpu"
         self.collection = self.client.get_or_create_collection(name=collection_name)
-        model = SentenceTransformer(
-            "jinaai/jina-embeddings-v2-base-code", trust_remote_code=True, device=device
-        )
-        self.embedding_fn = lambda texts: model.encode(texts, show_progress_bar=False).tolist()
 
-    def add(self, ids: List[str], texts: List[str], metadata):
-        if not ids or not texts:
-            return
+    def add_embeddings(self, ids: List[str], texts: List[str], embeddings, metadata):
+        embeddings = np.asarray(embeddings, dtype=np.float32).tolist()
+        self.collection.add(ids=ids, documents=texts, embeddings=embeddings, metadatas=metadata)
+        self.lexical_index.add(ids, texts, metadata)
 
-        self.collection.add(
-            ids=ids, documents=texts, embeddings=self.embedding_fn(texts=texts), metadatas=metadata
-        )
+    def _delete(self, ids: List[str]):
+        self.collection.delete(ids=ids)
+
+    def iter_ids(self, page_size: int = 10_000):
+        """Stream every stored ID page by page, without documents, embeddings or metadata."""
+        offset = 0
+        while True:
+            ids = self.collection.get(include=[], limit=page_size, offset=offset)["ids"]
+            if not ids:
+                return
+            yield from ids
+            offset += len(ids)
+
+    def existing_ids(self, ids: List[str], page_size: int = 10_000) -> set:
+        """Return the subset of ids already stored."""
+        found = set()
+        for i in range(0, len(ids), page_size):
+            found.update(self.collection.get(ids=ids[i : i + page_size], include=[])["ids"])
+        return found
+
+    def count(self) -> int:
+        return self.collection.count()
 
     def get_all(self):
         return self.collection.get(include=["documents", "embeddings", "metadatas", "ids"])
 
-    def search(self, query: str, k: int = 5):
-        query_embedding = self.embedding_fn(query)
-        result = self.collection.query(query_embeddings=[query_embedding], n_results=k)
+    def _query(self, query_embedding: List[float], n_results: int, conditions=None) -> dict:
+        return self.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results,
+            where=where_filter(conditions),
+        )
+
+    def _query_many(self, query_embeddings, n_results: int, conditions=None) -> List[dict]:
+        result = self.collection.query(
+            query_embeddings=query_embeddings.tolist(),
+            n_results=n_results,
+            where=where_filter(conditions),
+        )
+        return [
+            {key: [result[key][i]] for key in ("ids", "distances", "documents", "metadatas")}
+            for i in range(len(query_embeddings))
+        ]
+
+    def _scope_ids(self, conditions) -> set:
+        return set(self.collection.get(where=where_filter(conditions), include=[])["ids"])
 
-        return result
+    def _get(self, ids: List[str]):
+        found = self.collection.get(ids=ids, include=["documents", "metadatas"])
+        return found["ids"], found["documents"], found["metadatas"]
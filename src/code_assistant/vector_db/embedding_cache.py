@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    """Ignore line-ending and trailing-whitespace differences between copies of the same code."""
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def cache_key(model_name: str, text: str) -> str:
+    return hashlib.sha1(f"{model_name}\0{normalize_text(text)}".encode("utf8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed on-disk embedding cache.
+
+    Vectors live in a memory-mapped float32 matrix (vectors.f32); index.json maps
+    hash(model name + normalized text) to a row of that matrix and keeps the LRU
+    order. Once max_entries rows are in use the least recently used row is reused.
+    index.json is rewritten whole, so it is only written by `flush`, once per run
+    (embed_project flushes its store at the end), not while a large index grows.
+    """
+
+    def __init__(self, cache_dir, model_name: str, max_entries: int = 200_000):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.unflushed = 0
+        self.vectors_path = self.cache_dir / "vectors.f32"
+        self.index_path = self.cache_dir / "index.json"
+
+        self.hits = 0
+        self.misses = 0
+        self.dim = None
+        self.capacity = 0
+        self.slots = OrderedDict()  # key -> row, least recently used first
+        self.free_rows = []
+        self.matrix = None
+
+        if self.index_path.exists():
+            with open(self.index_path, "r", encoding="utf8") as f:
+                index = json.load(f)
+            if index.get("model_name") == model_name:
+                self.dim = index["dim"]
+                self.capacity = index["capacity"]
+                self.slots = OrderedDict(index["slots"])
+                self.free_rows = index["free_rows"]
+                self.matrix = self._open("r+")
+
+    def _open(self, mode: str):
+        return np.memmap(
+            self.vectors_path, dtype=np.float32, mode=mode, shape=(self.capacity, self.dim)
+        )
+
+    def _grow(self, needed: int):
+        new_capacity = min(self.max_entries, max(needed, self.capacity * 2, 1024))
+        if self.matrix is not None:
+            self.matrix.flush()
+            del self.matrix
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(new_capacity * self.dim * 4)
+        self.free_rows.extend(range(self.capacity, new_capacity))
+        self.capacity = new_capacity
+        self.matrix = self._open("r+")
+
+    def _take_row(self) -> int:
+        if not self.free_rows and self.capacity < self.max_entries:
+            self._grow(self.capacity + 1)
+        if self.free_rows:
+            return self.free_rows.pop()
+        _, row = self.slots.popitem(last=False)
+        return row
+
+    def get_many(self, texts):
+        """Return a vector (np.ndarray) or None per text, counting hits and misses."""
+        out = []
+        for text in texts:
+            key = cache_key(self.model_name, text)
+            row = self.slots.get(key)
+            if row is None:
+                self.misses += 1
+                out.append(None)
+            else:
+                self.hits += 1
+                self.slots.move_to_end(key)
+                out.append(np.array(self.matrix[row]))
+        return out
+
+    def put_many(self, texts, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        for text, vector in zip(texts, vectors, strict=True):
+            key = cache_key(self.model_name, text)
+            row = self.slots.get(key)
+            if row is None:
+                row = self._take_row()
+            self.matrix[row] = vector
+            self.slots[key] = row
+            self.slots.move_to_end(key)
+        self.unflushed += len(vectors)
+
+    def encode(self, texts, encode_fn):
+        """
+        Embed texts, calling encode_fn only for texts missing from the cache.
+
+        encode_fn takes a list of strings and returns a 2-D array-like.
+        """
+        cached = self.get_many(texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            fresh = np.asarray(encode_fn([texts[i] for i in missing]), dtype=np.float32)
+            self.put_many([texts[i] for i in missing], fresh)
+            for i, vector in zip(missing, fresh, strict=True):
+                cached[i] = vector
+        return np.stack(cached)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self.slots),
+        }
+
+    def flush(self):
+        if self.matrix is None or not self.unflushed:
+            return
+        self.matrix.flush()
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf8") as f:
+            json.dump(
+                {
+                    "model_name": self.model_name,
+                    "dim": self.dim,
+                    "capacity": self.capacity,
+                    "slots": list(self.slots.items()),
+                    "free_rows": self.free_rows,
+                },
+                f,
+            )
+        os.replace(tmp_path, self.index_path)
+        self.unflushed = 0
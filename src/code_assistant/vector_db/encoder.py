@@ -0,0 +1,69 @@
+import threading
+import time
+
+from code_assistant.utils.metrics import METRICS
+
+EMBEDDING_MODEL = "jinaai/jina-embeddings-v2-base-code"
+
+_encoders = {}
+_encoders_lock = threading.Lock()
+
+
+class Encoder:
+    """
+    Lazily loaded SentenceTransformer shared by every vector store in the process.
+
+    The model, and torch with it, is imported and loaded on the first encode or
+    tokenizer access, so read-only and ID-only callers never pay for it. Loading and
+    encoding are serialized with locks, which keeps concurrent sessions safe on MPS as
+    well as CPU.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL):
+        self.model_name = model_name
+        self.load_seconds = None
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._encode_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    started = time.perf_counter()
+                    import torch
+                    from sentence_transformers import SentenceTransformer
+
+                    device = "mps" if torch.backends.mps.is_available() else "cpu"
+                    self._model = SentenceTransformer(
+                        self.model_name, trust_remote_code=True, device=device
+                    )
+                    self.load_seconds = time.perf_counter() - started
+        return self._model
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    @property
+    def max_seq_length(self) -> int:
+        return self.model.max_seq_length
+
+    def encode(self, texts):
+        model = self.model
+        METRICS.inc("embedding_texts_total", 1 if isinstance(texts, str) else len(texts))
+        with self._encode_lock, METRICS.timer("embedding_encode_seconds"):
+            return model.encode(texts, show_progress_bar=False)
+
+
+def get_encoder(model_name: str = EMBEDDING_MODEL) -> Encoder:
+    """Return the process-wide encoder for model_name (not loaded until first use)."""
+    with _encoders_lock:
+        if model_name not in _encoders:
+            _encoders[model_name] = Encoder(model_name)
+        return _encoders[model_name]
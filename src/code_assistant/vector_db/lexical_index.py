@@ -0,0 +1,188 @@
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import List
+
+_IDENTIFIER = re.compile(r"[A-Za-z_$][A-Za-z0-9_$]*")
+_WORD_PART = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+# the symbol name says more about a chunk than any identifier inside it
+NAME_WEIGHT = 3
+SQL_VARIABLES = 900
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased identifiers plus their camelCase / snake_case parts.
+
+    "refreshTokenGuard" -> ["refreshtokenguard", "refresh", "token", "guard"]
+    """
+    tokens = []
+    for identifier in _IDENTIFIER.findall(text):
+        if len(identifier) > 1:
+            tokens.append(identifier.lower())
+        parts = _WORD_PART.findall(identifier)
+        if len(parts) > 1:
+            tokens.extend(p.lower() for p in parts if len(p) > 1)
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings, k: int = 60) -> List[tuple]:
+    """Fuse ranked ID lists into [(id, score)], best first."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over chunk text and symbol names, persisted in SQLite.
+
+    Kept in step with the vectors by the vector store's add / delete, so it is
+    built as embed_project runs. Queries never touch the embedding model.
+    """
+
+    def __init__(self, path, k1: float = 1.2, b: float = 0.75):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS docs (doc_id TEXT PRIMARY KEY, length INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL, doc_id TEXT NOT NULL, tf INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS postings_term ON postings (term);
+            CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id, term);
+            """
+        )
+        self.conn.commit()
+        self._stats = None
+
+    def _doc_stats(self):
+        """(document count, average length), cached until the next write."""
+        if self._stats is None:
+            count, total = self.conn.execute("SELECT COUNT(*), SUM(length) FROM docs").fetchone()
+            self._stats = (count, (total or 0) / count if count else 0.0)
+        return self._stats
+
+    def _delete(self, ids):
+        for doc_id in ids:
+            terms = self.conn.execute(
+                "SELECT term FROM postings WHERE doc_id = ?", (doc_id,)
+            ).fetchall()
+            self.conn.executemany("UPDATE terms SET df = df - 1 WHERE term = ?", terms)
+            self.conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+            self.conn.execute("DELETE FROM docs WHERE doc_id = ?", (doc_id,))
+        self.conn.execute("DELETE FROM terms WHERE df <= 0")
+
+    def add(self, ids: List[str], texts: List[str], metadata=None):
+        metadata = metadata or [{}] * len(ids)
+        with self.lock:
+            self._delete(ids)
+            added = set()
+            for doc_id, text, meta in zip(ids, texts, metadata, strict=True):
+                if doc_id in added:
+                    continue
+                added.add(doc_id)
+                counts = Counter(tokenize(text))
+                for token in tokenize(str(meta.get("name") or "")):
+                    counts[token] += NAME_WEIGHT
+                self.conn.execute(
+                    "INSERT INTO docs (doc_id, length) VALUES (?, ?)",
+                    (doc_id, sum(counts.values())),
+                )
+                self.conn.executemany(
+                    "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                    [(term, doc_id, tf) for term, tf in counts.items()],
+                )
+                self.conn.executemany(
+                    "INSERT INTO terms (term, df) VALUES (?, 1) "
+                    "ON CONFLICT(term) DO UPDATE SET df = df + 1",
+                    [(term,) for term in counts],
+                )
+            self.conn.commit()
+            self._stats = None
+
+    def delete(self, ids: List[str]):
+        with self.lock:
+            self._delete(ids)
+            self.conn.commit()
+            self._stats = None
+
+    def search(
+        self, query: str, k: int = 5, max_candidates: int = 1000, allowed: set = None
+    ) -> List[tuple]:
+        """
+        Top-k [(doc_id, bm25 score)] for the identifiers and words in query.
+
+        With allowed, only those doc IDs are scored (a scoped search).
+
+        Terms are scored rarest first. Once rarer terms have produced candidates, a
+        term with more than max_candidates postings (e.g. "token" from a split
+        identifier) only re-scores those candidates instead of scanning its whole
+        posting list, which keeps exact identifier lookups sub-millisecond.
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        # the candidates are bound as SQL variables next to the term
+        max_candidates = min(max_candidates, SQL_VARIABLES - 1)
+        with self.lock:
+            n_docs, avg_len = self._doc_stats()
+            found = []
+            for term in terms:
+                row = self.conn.execute("SELECT df FROM terms WHERE term = ?", (term,)).fetchone()
+                if row is not None:
+                    found.append((row[0], term))
+            found.sort()
+
+            scores = {}
+            for df, term in found:
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                sql = (
+                    "SELECT p.doc_id, p.tf, d.length FROM postings p "
+                    "JOIN docs d ON d.doc_id = p.doc_id WHERE p.term = ?"
+                )
+                params = [term]
+                if scores and df > max_candidates and len(scores) <= max_candidates:
+                    sql += f" AND p.doc_id IN ({','.join('?' * len(scores))})"
+                    params.extend(scores)
+                for doc_id, tf, length in self.conn.execute(sql, params):
+                    if allowed is not None and doc_id not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * length / (avg_len or 1))
+                    bm25 = idf * tf * (self.k1 + 1) / (tf + norm)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + bm25
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def count(self) -> int:
+        with self.lock:
+            return self._doc_stats()[0]
+
+    def existing_ids(self, ids: List[str]) -> set:
+        """Return the subset of ids already indexed."""
+        found = set()
+        with self.lock:
+            for i in range(0, len(ids), SQL_VARIABLES):
+                page = ids[i : i + SQL_VARIABLES]
+                marks = ",".join("?" * len(page))
+                found.update(
+                    doc_id
+                    for (doc_id,) in self.conn.execute(
+                        f"SELECT doc_id FROM docs WHERE doc_id IN ({marks})", page
+                    )
+                )
+        return found
+
+    def close(self):
+        self.conn.close()
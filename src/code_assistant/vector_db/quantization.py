@@ -0,0 +1,157 @@
+import numpy as np
+
+BLOCK_ROWS = 65_536
+
+
+def squared_distances(queries, data):
+    """(len(queries), len(data)) squared L2 distances, in float32."""
+    queries = np.asarray(queries, dtype=np.float32)
+    data = np.asarray(data, dtype=np.float32)
+    dots = queries @ data.T
+    return (
+        np.einsum("ij,ij->i", queries, queries)[:, None]
+        - 2.0 * dots
+        + np.einsum("ij,ij->i", data, data)[None, :]
+    )
+
+
+def assign(data, centroids, block_rows: int = BLOCK_ROWS) -> np.ndarray:
+    """Index of the nearest centroid for every row of data, computed block by block."""
+    labels = np.empty(len(data), dtype=np.int32)
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    for start in range(0, len(data), block_rows):
+        block = np.asarray(data[start : start + block_rows], dtype=np.float32)
+        # |x|^2 is the same for every centroid, so it does not change the argmin
+        labels[start : start + len(block)] = np.argmin(
+            centroid_norms[None, :] - 2.0 * (block @ centroids.T), axis=1
+        )
+    return labels
+
+
+def kmeans(data, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means on data (n, dim); returns (k, dim) float32 centroids."""
+    data = np.asarray(data, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign(data, centroids)
+        counts = np.bincount(labels, minlength=k)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        used = counts > 0
+        sums = np.add.reduceat(data[np.argsort(labels, kind="stable")], starts[used], axis=0)
+        centroids[used] = sums / counts[used, None]
+        # restart empty clusters on random points so every list gets used
+        centroids[~used] = data[rng.choice(len(data), size=int((~used).sum()))]
+    return centroids
+
+
+class ScalarQuantizer:
+    """
+    int8 codes: every dimension is mapped linearly from its trained [min, max] to 0..255.
+
+    A quarter of the float32 size; distances are computed on the decoded vectors.
+    """
+
+    kind = "int8"
+
+    def __init__(self, low=None, scale=None):
+        self.low = low
+        self.scale = scale
+
+    def train(self, data):
+        data = np.asarray(data, dtype=np.float32)
+        self.low = data.min(axis=0)
+        self.scale = np.maximum(data.max(axis=0) - self.low, 1e-12) / 255.0
+        return self
+
+    def code_size(self, dim: int) -> int:
+        return dim
+
+    def encode(self, data) -> np.ndarray:
+        codes = np.rint((np.asarray(data, dtype=np.float32) - self.low) / self.scale)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def decode(self, codes) -> np.ndarray:
+        return codes.astype(np.float32) * self.scale + self.low
+
+    def distances(self, queries, codes) -> np.ndarray:
+        """(len(queries), len(codes)) approximate squared L2 distances."""
+        return squared_distances(queries, self.decode(codes))
+
+    def state(self) -> dict:
+        return {"low": self.low, "scale": self.scale}
+
+
+class ProductQuantizer:
+    """
+    Product quantization: the vector is split into `subvectors` parts and each part is
+    stored as the index of its nearest of 256 trained centroids, one byte per part.
+
+    768 float32 dimensions in 16 parts take 16 bytes instead of 3072. Distances
+    are looked up per part from a table computed once per query.
+    """
+
+    kind = "pq"
+
+    def __init__(self, subvectors: int = 16, codebooks=None):
+        self.subvectors = subvectors
+        self.codebooks = codebooks  # (subvectors, 256, dim // subvectors)
+
+    def _split(self, data):
+        data = np.asarray(data, dtype=np.float32)
+        if data.shape[1] % self.subvectors:
+            raise ValueError(
+                f"Vector size {data.shape[1]} is not divisible by {self.subvectors} subvectors"
+            )
+        return np.split(data, self.subvectors, axis=1)
+
+    def train(self, data):
+        self.codebooks = np.stack(
+            [kmeans(part, 256, seed=i) for i, part in enumerate(self._split(data))]
+        )
+        return self
+
+    def code_size(self, dim: int) -> int:
+        return self.subvectors
+
+    def encode(self, data) -> np.ndarray:
+        return np.stack(
+            [
+                assign(part, book)
+                for part, book in zip(self._split(data), self.codebooks, strict=True)
+            ],
+            axis=1,
+        ).astype(np.uint8)
+
+    def decode(self, codes) -> np.ndarray:
+        return np.concatenate(
+            [self.codebooks[i][codes[:, i]] for i in range(self.subvectors)], axis=1
+        )
+
+    def distances(self, queries, codes) -> np.ndarray:
+        """(len(queries), len(codes)) approximate squared L2 distances."""
+        # table[q, part, centroid]: distance from each query part to each centroid of that part
+        parts = self._split(queries)
+        table = np.stack(
+            [
+                squared_distances(part, book)
+                for part, book in zip(parts, self.codebooks, strict=True)
+            ],
+            axis=1,
+        )
+        out = np.zeros((len(table), len(codes)), dtype=np.float32)
+        for part in range(self.subvectors):
+            out += table[:, part, codes[:, part]]
+        return out
+
+    def state(self) -> dict:
+        return {"codebooks": self.codebooks}
+
+
+def make_quantizer(kind: str, pq_subvectors: int = 16):
+    if kind == "int8":
+        return ScalarQuantizer()
+    if kind == "pq":
+        return ProductQuantizer(pq_subvectors)
+    raise ValueError(f"Unknown quantization {kind!r}, expected None, 'int8' or 'pq'")
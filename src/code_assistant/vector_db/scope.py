@@ -0,0 +1,86 @@
+import os
+
+# directory prefixes stored per chunk (dir_1 .. dir_N), so path scopes are equality filters
+MAX_DIR_DEPTH = 6
+PACKAGE_MANIFESTS = ("package.json", "pyproject.toml", "setup.py", "go.mod", "Cargo.toml")
+SCOPE_KEYS = ("path", "type", "language", "package")
+
+
+def dir_field(depth: int) -> str:
+    return f"dir_{depth}"
+
+
+# metadata fields scope conditions are expressed in
+SCOPE_FIELDS = ("type", "language", "package") + tuple(
+    dir_field(depth) for depth in range(1, MAX_DIR_DEPTH + 1)
+)
+
+
+def normalize_dir(path: str) -> str:
+    """'./services\\billing/' -> 'services/billing'; '' for the project root."""
+    parts = path.replace("\\", "/").split("/")
+    return "/".join(part for part in parts if part not in ("", "."))
+
+
+def find_package(directory: str, root: str, cache: dict = None) -> str:
+    """Name of the nearest folder from directory up to root holding a package manifest."""
+    cache = {} if cache is None else cache
+    if directory not in cache:
+        if any(os.path.isfile(os.path.join(directory, name)) for name in PACKAGE_MANIFESTS):
+            cache[directory] = os.path.basename(os.path.abspath(directory))
+        elif os.path.abspath(directory) == os.path.abspath(root):
+            cache[directory] = ""
+        else:
+            parent = os.path.dirname(directory)
+            cache[directory] = find_package(parent, root, cache) if parent != directory else ""
+    return cache[directory]
+
+
+def directory_metadata(file_path: str, root: str, package_cache: dict = None) -> dict:
+    """
+    Scope metadata of a file in the project at root.
+
+    {"directory": "services/billing/src", "package": "billing",
+     "dir_1": "services", "dir_2": "services/billing", "dir_3": "services/billing/src",
+     "dir_4": "", ...}
+    """
+    directory = normalize_dir(os.path.relpath(os.path.dirname(file_path), root))
+    if directory.startswith(".."):
+        directory = ""
+    parts = directory.split("/") if directory else []
+    meta = {
+        "directory": directory,
+        "package": find_package(os.path.dirname(file_path), root, package_cache),
+    }
+    for depth in range(1, MAX_DIR_DEPTH + 1):
+        meta[dir_field(depth)] = "/".join(parts[:depth]) if len(parts) >= depth else ""
+    return meta
+
+
+def scope_conditions(scope: dict = None) -> dict:
+    """
+    Metadata conditions {field: [allowed values]} for a search scope.
+
+    - path: directory prefix relative to the project root ("services/billing")
+    - type: node type or list of them ("method_definition")
+    - language: language name or list of them (keys of utils.languages.LANGUAGES)
+    - package: package name or list of them (the folder holding package.json, go.mod, ...)
+    """
+    if not scope:
+        return {}
+    unknown = set(scope) - set(SCOPE_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown scope keys {sorted(unknown)}, expected some of {SCOPE_KEYS}")
+
+    conditions = {}
+    path = normalize_dir(scope.get("path") or "")
+    if path:
+        depth = path.count("/") + 1
+        if depth > MAX_DIR_DEPTH:
+            raise ValueError(f"Scope path {path!r} is deeper than {MAX_DIR_DEPTH} folders")
+        conditions[dir_field(depth)] = [path]
+    for field in ("type", "language", "package"):
+        value = scope.get(field)
+        if value:
+            conditions[field] = [value] if isinstance(value, str) else list(value)
+    return conditions
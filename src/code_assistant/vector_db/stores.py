@@ -0,0 +1,24 @@
+import importlib
+import os
+
+STORE_BACKENDS = {
+    "chroma": "code_assistant.vector_db.chroma_store:ChromaStore",
+    "ann": "code_assistant.vector_db.ann_store:AnnStore",
+}
+DEFAULT_BACKEND = "chroma"
+
+
+def open_store(backend: str = None, **kwargs):
+    """
+    Open a vector store; kwargs are passed to its constructor.
+
+    - backend: a STORE_BACKENDS key, defaulting to the VECTOR_STORE environment
+      variable and then to "chroma"
+    """
+    backend = backend or os.getenv("VECTOR_STORE", DEFAULT_BACKEND)
+    if backend not in STORE_BACKENDS:
+        raise ValueError(
+            f"Unknown vector store {backend!r}, expected one of {list(STORE_BACKENDS)}"
+        )
+    module_name, _, class_name = STORE_BACKENDS[backend].partition(":")
+    return getattr(importlib.import_module(module_name), class_name)(**kwargs)
@@ -0,0 +1,314 @@
+import itertools
+import logging
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from code_assistant.utils.metrics import METRICS
+
+from .embedding_cache import EmbeddingCache
+from .encoder import get_encoder
+from .lexical_index import LexicalIndex, reciprocal_rank_fusion
+from .scope import scope_conditions
+
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+
+logger = logging.getLogger(__name__)
+
+
+def empty_result() -> dict:
+    return {"ids": [[]], "distances": [[]], "documents": [[]], "metadatas": [[]]}
+
+
+def query_result(hits, by_id: dict) -> dict:
+    """One query's result from [(id, distance)] and id -> (document, metadata)."""
+    hits = [(i, d) for i, d in hits if i in by_id]
+    return {
+        "ids": [[i for i, _ in hits]],
+        "distances": [[d for _, d in hits]],
+        "documents": [[by_id[i][0] for i, _ in hits]],
+        "metadatas": [[by_id[i][1] for i, _ in hits]],
+    }
+
+
+def result_hits(result: dict) -> list:
+    """One query result as [{"id", "distance", "document", "metadata"}], nearest first."""
+    columns = [
+        (result.get(key) or [[]])[0] for key in ("ids", "distances", "documents", "metadatas")
+    ]
+    return [
+        {"id": chunk_id, "distance": distance, "document": document, "metadata": metadata}
+        for chunk_id, distance, document, metadata in zip(*columns, strict=False)
+    ]
+
+
+class VectorStore(ABC):
+    """
+    Chunks with their embeddings and a BM25 index, searched by vector, lexical or hybrid.
+
+    Embedding (through the encoder and the embedding cache), the lexical index and
+    the search modes are shared; a backend stores the vectors and documents by
+    implementing the abstract `add_embeddings`, `_delete`, `_query`, `_get`, `iter_ids`,
+    `existing_ids`, `count`, `get_all` and `_scope_ids`, and may batch
+    `search_many`'s k-NN by overriding `_query_many`. Scope conditions
+    (scope.scope_conditions) are passed down to `_query` so backends filter inside
+    the k-NN. Results use Chroma's query shape:
+    {"ids": [[...]], "distances": [[...]], "documents": [[...]], "metadatas": [[...]]}.
+
+    Adds, searches, k-NN queries and BM25 lookups are timed in utils.metrics,
+    labelled with the subclass's `backend`. Chunks stored before the BM25 index
+    existed are added to it on the first lexical or hybrid search.
+    """
+
+    backend = None
+
+    def __init__(
+        self,
+        persist_dir: str,
+        lexical_path,
+        cache_dir: str = None,
+        cache_size: int = 200_000,
+        encoder=None,
+    ):
+        """
+        The embedding model is borrowed from the process-wide encoder (or `encoder`)
+        and only loaded on the first call that needs to embed or tokenize.
+        """
+        self.persist_dir = Path(persist_dir)
+        self.persist_dir.mkdir(parents=True, exist_ok=True)
+        self.encoder = encoder or get_encoder()
+        self.encode = self.encoder.encode
+        self.embedding_fn = lambda texts: self.encode(texts).tolist()
+        self.lexical_index = LexicalIndex(lexical_path)
+        self._lexical_lock = threading.Lock()
+        self._lexical_checked = False
+        self.embedding_cache = None
+        if cache_size:
+            self.embedding_cache = EmbeddingCache(
+                cache_dir or self.persist_dir / "embedding_cache",
+                model_name=self.encoder.model_name,
+                max_entries=cache_size,
+            )
+
+    def add(self, ids: List[str], texts: List[str], metadata):
+        if not ids or not texts:
+            return
+
+        # chunks on the same lines share an ID (and their text); the last one wins
+        latest = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        if len(latest) < len(ids):
+            keep = sorted(latest.values())
+            ids = [ids[i] for i in keep]
+            texts = [texts[i] for i in keep]
+            metadata = [metadata[i] for i in keep]
+
+        if self.embedding_cache is not None:
+            embeddings = self.embedding_cache.encode(texts, self.encode)
+        else:
+            embeddings = np.asarray(self.encode(texts), dtype=np.float32)
+        with METRICS.timer("store_add_seconds", backend=self.backend):
+            self.add_embeddings(ids, texts, embeddings, metadata)
+        METRICS.inc("store_chunks_added_total", len(ids), backend=self.backend)
+
+    @abstractmethod
+    def add_embeddings(self, ids: List[str], texts: List[str], embeddings, metadata):
+        """Store chunks whose embeddings are already computed (an (n, dim) array)."""
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Token count per text as seen by the embedding model (capped at its max length)."""
+        tokenizer = self.encoder.tokenizer
+        encoded = tokenizer(texts, add_special_tokens=True, truncation=False)["input_ids"]
+        return [min(len(ids), self.encoder.max_seq_length) for ids in encoded]
+
+    def flush(self):
+        """Persist the embedding cache index."""
+        if self.embedding_cache is not None:
+            self.embedding_cache.flush()
+
+    def delete(self, ids: List[str]):
+        if not ids:
+            return
+
+        self._delete(ids)
+        self.lexical_index.delete(ids)
+
+    @abstractmethod
+    def _delete(self, ids: List[str]):
+        """Remove the stored chunks among ids."""
+
+    @abstractmethod
+    def iter_ids(self, page_size: int = 10_000):
+        """Stream every stored ID page by page, without documents, embeddings or metadata."""
+
+    @abstractmethod
+    def existing_ids(self, ids: List[str], page_size: int = 10_000) -> set:
+        """Return the subset of ids already stored."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of stored chunks."""
+
+    @abstractmethod
+    def get_all(self):
+        """Every stored chunk: {"ids", "embeddings", "documents", "metadatas"}."""
+
+    def backfill_lexical_index(self, page_size: int = 5_000) -> int:
+        """
+        Add stored chunks missing from the BM25 index, e.g. of a store built before
+        it existed; returns how many were added.
+        """
+        with self._lexical_lock:
+            self._lexical_checked = True
+            if self.lexical_index.count() >= self.count():
+                return 0
+            added = 0
+            for page in itertools.batched(self.iter_ids(page_size), page_size, strict=False):
+                missing = list(set(page) - self.lexical_index.existing_ids(list(page)))
+                if not missing:
+                    continue
+                ids, documents, metadatas = self._get(missing)
+                self.lexical_index.add(ids, documents, metadatas)
+                added += len(ids)
+            if added:
+                logger.info("Lexical index: added %d stored chunks", added)
+            return added
+
+    def _check_lexical(self, mode: str):
+        if mode != "vector" and not self._lexical_checked:
+            self.backfill_lexical_index()
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.embedding_fn(query)
+
+    @abstractmethod
+    def _query(self, query_embedding: List[float], n_results: int, conditions=None) -> dict:
+        """
+        The n_results nearest chunks to query_embedding, in query result shape.
+
+        conditions ({field: [allowed values]}) restricts the chunks searched.
+        """
+
+    def _query_many(self, query_embeddings, n_results: int, conditions=None) -> List[dict]:
+        """_query for every row of query_embeddings (an (n, dim) array)."""
+        return [
+            self._query(embedding.tolist(), n_results, conditions) for embedding in query_embeddings
+        ]
+
+    @abstractmethod
+    def _scope_ids(self, conditions) -> set:
+        """IDs of the chunks matching conditions."""
+
+    @abstractmethod
+    def _get(self, ids: List[str]):
+        """(ids, documents, metadatas) of the stored chunks among ids."""
+
+    def get_by_ids(self, ids: List[str], distances: List[float] = None):
+        """Fetch stored chunks by ID in the same shape as a vector query."""
+        if distances is None:
+            distances = [0.0] * len(ids)
+        found_ids, documents, metadatas = self._get(ids)
+        by_id = {
+            chunk_id: (doc, meta)
+            for chunk_id, doc, meta in zip(found_ids, documents, metadatas, strict=True)
+        }
+        return query_result(zip(ids, distances, strict=True), by_id)
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        query_embedding: List[float] = None,
+        mode: str = "vector",
+        scope: dict = None,
+    ):
+        """
+        Top-k chunks for query, in Chroma's query result shape.
+
+        - mode="vector": dense k-NN over the embeddings
+        - mode="lexical": BM25 over identifiers and names, without the embedding model
+        - mode="hybrid": both, fused with reciprocal rank fusion
+        - scope: only search chunks under a path prefix, of a node type, language or
+          package, e.g. {"path": "services/billing", "type": "method_definition"}
+          (see scope.scope_conditions)
+        For lexical and hybrid, distances are 1 - score / best score.
+        """
+        self._check_mode(mode)
+        self._check_lexical(mode)
+        with METRICS.timer("search_seconds", backend=self.backend, mode=mode):
+            conditions = scope_conditions(scope)
+            allowed = self._scope_ids(conditions) if conditions and mode != "vector" else None
+            if mode == "lexical":
+                return self._fuse(query, None, k, allowed)
+            if query_embedding is None:
+                query_embedding = self.embed_query(query)
+            with METRICS.timer("store_query_seconds", backend=self.backend):
+                result = self._query(query_embedding, self._n_results(k, mode), conditions or None)
+            return result if mode == "vector" else self._fuse(query, result, k, allowed)
+
+    def search_many(
+        self,
+        queries: List[str],
+        k: int = 5,
+        query_embeddings=None,
+        mode: str = "vector",
+        scope: dict = None,
+    ) -> List[dict]:
+        """
+        `search` for many queries at once, one result per query in the same shape.
+
+        The queries are embedded in one batched encode and the vector k-NN runs as one
+        batched query; only the BM25 side of lexical and hybrid runs per query.
+        """
+        self._check_mode(mode)
+        self._check_lexical(mode)
+        with METRICS.timer("search_many_seconds", backend=self.backend, mode=mode):
+            conditions = scope_conditions(scope)
+            allowed = self._scope_ids(conditions) if conditions and mode != "vector" else None
+            if mode == "lexical":
+                return [self._fuse(query, None, k, allowed) for query in queries]
+            if not queries:
+                return []
+            if query_embeddings is None:
+                query_embeddings = self.encode(list(queries))
+            query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+            with METRICS.timer("store_query_many_seconds", backend=self.backend):
+                results = self._query_many(
+                    query_embeddings, self._n_results(k, mode), conditions or None
+                )
+            if mode == "vector":
+                return results
+            return [
+                self._fuse(query, result, k, allowed)
+                for query, result in zip(queries, results, strict=True)
+            ]
+
+    @staticmethod
+    def _check_mode(mode: str):
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode {mode!r}, expected one of {SEARCH_MODES}")
+
+    @staticmethod
+    def _n_results(k: int, mode: str) -> int:
+        return k if mode == "vector" else max(k * 4, 20)
+
+    def _fuse(self, query: str, vector_result, k: int, allowed: set = None) -> dict:
+        """BM25 hits for query among allowed, fused with vector_result's ranking if any."""
+        if vector_result is None:
+            with METRICS.timer("lexical_search_seconds", backend=self.backend):
+                ranked = self.lexical_index.search(query, k=k, allowed=allowed)
+        else:
+            n_results = self._n_results(k, "hybrid")
+            with METRICS.timer("lexical_search_seconds", backend=self.backend):
+                lexical = self.lexical_index.search(query, k=n_results, allowed=allowed)
+            lexical = [doc_id for doc_id, _ in lexical]
+            ranked = reciprocal_rank_fusion([vector_result["ids"][0], lexical])[:k]
+
+        if not ranked:
+            return empty_result()
+        best = ranked[0][1]
+        return self.get_by_ids(
+            [doc_id for doc_id, _ in ranked], [1.0 - score / best for _, score in ranked]
+        )
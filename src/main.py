@@ -1,9 +1,28 @@
-import re
+import uuid
+from pathlib import Path
 
 import streamlit as st
 
+from code_assistant.llm.model_pool import ModelPool
 from code_assistant.llm.qrok_qwen_llm import GroqQwenLLM
-from code_assistant.vector_db.chroma_store import ChromaStore
+from code_assistant.llm.streaming import strip_think_stream
+from code_assistant.service.answer_cache import AnswerCache
+from code_assistant.service.query_service import QueryService
+from code_assistant.utils.graph_store import CodeGraphStore
+from code_assistant.utils.languages import LANGUAGES
+from code_assistant.utils.logs import configure_logging
+from code_assistant.utils.metrics import METRICS
+from code_assistant.vector_db.stores import open_store
+
+REMOTE_MODEL = "Qwen (Groq)"
+LOCAL_MODELS = {
+    "Qwen 2.5 Coder 1.5B (local)": {"backend": "qwen"},
+    "DeepSeek Coder 7B (local)": {"backend": "deepseek"},
+}
+
+
+# LOG_LEVEL=DEBUG shows per-request details such as context chunks and prefill reuse
+configure_logging()
 
 
 @st.cache_resource
@@ -11,17 +30,76 @@ def load_llm():
     return GroqQwenLLM()
 
 
+@st.cache_resource
+def load_pool():
+    # weights are mmapped, so the cap mostly bounds KV caches and per-process copies
+    return ModelPool(LOCAL_MODELS, memory_cap_mb=12_000)
+
+
 @st.cache_resource
 def load_db():
-    return ChromaStore()
+    # VECTOR_STORE=ann selects the in-process ANN index instead of Chroma
+    return open_store()
 
 
-def strip_think(text: str) -> str:
-    return re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL).strip()
+@st.cache_resource
+def load_graph():
+    path = Path("./storage/code_graph.sqlite")
+    return CodeGraphStore(path) if path.exists() else None
 
 
-llm = load_llm()
-db = load_db()
+@st.cache_resource
+def load_service():
+    db = load_db()
+    answer_cache = AnswerCache(db.persist_dir / "answers.sqlite")
+    return QueryService(
+        db, load_llm(), answer_cache=answer_cache, search_mode="hybrid", graph=load_graph()
+    )
+
+
+def show_debug_panel():
+    traces = METRICS.recent_traces(1)
+    snapshot = METRICS.snapshot()
+    with st.expander("Debug: latest trace and metrics", expanded=True):
+        if traces:
+            trace = traces[-1]
+            st.caption(
+                " · ".join(
+                    f"{key} {value:.1f}" if isinstance(value, float) else f"{key} {value}"
+                    for key, value in trace.items()
+                    if key not in ("spans", "timestamp", "trace")
+                )
+            )
+            st.dataframe(trace["spans"], use_container_width=True)
+        st.dataframe(
+            [
+                {
+                    "metric": s["name"],
+                    "labels": ", ".join(f"{k}={v}" for k, v in s["labels"].items()),
+                    "count": s["count"],
+                    **{f"p{float(q) * 100:g}": v for q, v in s["quantiles"].items()},
+                }
+                for s in snapshot["summaries"]
+            ],
+            use_container_width=True,
+        )
+        st.dataframe(
+            [
+                {
+                    "counter": c["name"],
+                    "labels": ", ".join(f"{k}={v}" for k, v in c["labels"].items()),
+                    "value": c["value"],
+                }
+                for c in snapshot["counters"]
+            ],
+            use_container_width=True,
+        )
+        left, right = st.columns(2)
+        left.download_button("Prometheus text", METRICS.prometheus(), "metrics.prom")
+        right.download_button("JSON lines", METRICS.jsonl(), "metrics.jsonl")
+
+
+service = load_service()
 
 
 st.set_page_config(page_title="Bizden Code Assistant", page_icon="💻", layout="wide")
@@ -32,6 +110,21 @@ st.write("Ask anything related to **code, debugging, or software architecture**.
 
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+model = st.sidebar.selectbox("Model", [REMOTE_MODEL, *LOCAL_MODELS])
+llm = None
+if model != REMOTE_MODEL:
+    session_llms = st.session_state.setdefault("llms", {})
+    if model not in session_llms:
+        session_llms[model] = load_pool().llm(model, st.session_state.session_id)
+    llm = session_llms[model]
+
+scope_path = st.sidebar.text_input("Limit to folder", placeholder="e.g. services/billing")
+scope_languages = st.sidebar.multiselect("Languages", list(LANGUAGES))
+scope = {"path": scope_path, "language": scope_languages} if scope_path or scope_languages else None
+show_debug = st.sidebar.checkbox("Debug panel")
 
 for msg in st.session_state.messages:
     with st.chat_message(msg["role"]):
@@ -45,13 +138,27 @@ if user_input:
     with st.chat_message("user"):
         st.markdown(user_input)
 
-    vector_result = db.search(user_input)
-
     with st.chat_message("assistant"):
-        with st.spinner("Thinking…"):
-            answer = llm.generate_from_chunks(user_input, vector_result)
-            assistant_text = strip_think(answer)
-
-            st.markdown(assistant_text)
+        response = service.stream(user_input, llm=llm, scope=scope)
+        assistant_text = st.write_stream(strip_think_stream(response))
+
+        timings = response.timings
+        st.caption(
+            ("cached answer · " if response.cache_hit else "")
+            + f"retrieval {timings['retrieval_ms']:.0f} ms · "
+            f"first token {timings['first_token_ms']:.0f} ms · "
+            f"generation {timings['generation_ms']:.0f} ms · "
+            f"total {timings['total_ms']:.0f} ms"
+            + (
+                f" · prefill reused {timings['prefill_skipped_tokens']}/"
+                f"{timings['prefill_tokens']} tokens"
+                if "prefill_tokens" in timings
+                else ""
+            )
+        )
 
     st.session_state.messages.append({"role": "assistant", "content": assistant_text})
+
+
+if show_debug:
+    show_debug_panel()
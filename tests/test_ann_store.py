@@ -0,0 +1,174 @@
+import zlib
+
+import numpy as np
+import pytest
+
+from code_assistant.benchmarks.stub_encoder import StubEncoder
+from code_assistant.benchmarks.synthetic import synthetic_chunks, synthetic_queries
+from code_assistant.vector_db.ann_store import AnnStore
+from code_assistant.vector_db.stores import open_store
+
+
+class RandomEncoder(StubEncoder):
+    """A random vector per text, so no two chunks tie on distance."""
+
+    def encode(self, texts):
+        if isinstance(texts, str):
+            return self.encode([texts])[0]
+        return np.stack(
+            [
+                np.random.default_rng(zlib.crc32(t.encode("utf8"))).normal(size=self.dim)
+                for t in texts
+            ]
+        ).astype(np.float32)
+
+
+def make_store(path, size=3000, encoder=None, **kwargs):
+    encoder = encoder or StubEncoder(dim=32)
+    db = AnnStore(str(path), encoder=encoder, cache_size=0, **kwargs)
+    ids, texts, metadata = zip(*synthetic_chunks(size), strict=True)
+    db.add(list(ids), list(texts), list(metadata))
+    return db
+
+
+def brute_force(db, query, k):
+    found = db.get_all()
+    vectors = np.asarray(found["embeddings"], dtype=np.float32)
+    distances = ((vectors - db.encode(query)) ** 2).sum(axis=1)
+    return sorted(distances)[:k]
+
+
+def test_exact_search_before_training(tmp_path):
+    db = make_store(tmp_path, size=500, train_size=10_000)
+    query = synthetic_queries(1, 500)[0]
+
+    result = db.search(query, k=5)
+
+    assert db.index_stats()["lists"] == 0
+    assert len(result["ids"][0]) == 5
+    assert np.allclose(result["distances"][0], brute_force(db, query, 5), atol=1e-5)
+    assert result["metadatas"][0][0]["type"] == "method_definition"
+
+
+@pytest.mark.parametrize("quantization", [None, "int8", "pq"])
+def test_index_recall_with_all_lists_probed(tmp_path, quantization):
+    db = make_store(tmp_path, train_size=1000, quantization=quantization, pq_subvectors=8)
+    db.nprobe = db.index_stats()["lists"]
+
+    for query in synthetic_queries(20, 3000):
+        result = db.search(query, k=5)
+        # re-ranking is exact, so scanning every list finds the true neighbours
+        assert np.allclose(result["distances"][0], brute_force(db, query, 5), atol=1e-5)
+    assert db.index_stats()["quantization"] == quantization
+
+
+def test_delete_replace_and_reopen(tmp_path):
+    db = make_store(tmp_path, size=1500, train_size=1000)
+    chunk_ids = list(db.iter_ids())
+    query = db.get_by_ids(chunk_ids[:1])["documents"][0][0]
+
+    db.delete(chunk_ids[:1])
+    db.add(["new"], [query], [{"name": "replacement"}])
+    db.flush()
+    reopened = AnnStore(str(tmp_path), encoder=StubEncoder(dim=32), cache_size=0)
+
+    assert reopened.count() == 1500
+    assert reopened.existing_ids(chunk_ids[:2] + ["new"]) == {chunk_ids[1], "new"}
+    assert reopened.search(query, k=1)["ids"][0] == ["new"]
+
+
+def test_build_index_compacts_deleted_rows(tmp_path):
+    db = make_store(tmp_path, size=1200, train_size=1000)
+    chunk_ids = list(db.iter_ids())
+
+    db.delete(chunk_ids[:200])
+    db.build_index()
+
+    assert db.rows == db.count() == 1000
+    assert list(db.iter_ids()) == chunk_ids[200:]
+    assert db.get_by_ids(chunk_ids[199:201])["ids"][0] == [chunk_ids[200]]
+
+
+@pytest.mark.parametrize("train_size", [10_000, 100])
+def test_delete_and_re_add_keeps_rows_bounded(tmp_path, train_size):
+    db = make_store(tmp_path, size=300, train_size=train_size)
+    db.nprobe = max(db.index_stats()["lists"], 1)
+    found = db.get_all()
+    churn = slice(0, 100)
+
+    for _ in range(20):
+        db.delete(found["ids"][churn])
+        db.add(found["ids"][churn], found["documents"][churn], found["metadatas"][churn])
+        assert db.rows < 2 * 300
+        assert db.count() == 300
+
+    query = found["documents"][0]
+    assert np.allclose(db.search(query, k=5)["distances"][0], brute_force(db, query, 5), atol=1e-5)
+
+
+def test_lexical_index_is_backfilled_from_stored_chunks(tmp_path):
+    db = make_store(tmp_path, size=300)
+    found = db.get_all()
+    # a store written before it had a BM25 index
+    db.lexical_index.delete(found["ids"])
+    query = found["metadatas"][7]["name"]
+
+    reopened = AnnStore(str(tmp_path), encoder=StubEncoder(dim=32), cache_size=0)
+    result = reopened.search(query, k=3, mode="lexical")
+
+    assert reopened.lexical_index.count() == 300
+    assert found["ids"][7] in result["ids"][0]
+    assert reopened.backfill_lexical_index() == 0
+
+
+def test_open_store_selects_backend(tmp_path, monkeypatch):
+    monkeypatch.setenv("VECTOR_STORE", "ann")
+
+    db = open_store(persist_dir=str(tmp_path), encoder=StubEncoder(), cache_size=0)
+
+    assert isinstance(db, AnnStore)
+    with pytest.raises(ValueError):
+        open_store("faiss", persist_dir=str(tmp_path))
+
+
+@pytest.mark.parametrize("train_size", [10_000, 1000])
+@pytest.mark.parametrize("mode", ["vector", "hybrid", "lexical"])
+def test_search_many_matches_search(tmp_path, train_size, mode):
+    db = make_store(tmp_path, size=2000, encoder=RandomEncoder(dim=32), train_size=train_size)
+    queries = synthetic_queries(8, 2000)
+
+    batched = db.search_many(queries, k=4, mode=mode)
+
+    assert len(batched) == len(queries)
+    for query, result in zip(queries, batched, strict=True):
+        single = db.search(query, k=4, mode=mode)
+        assert result["ids"] == single["ids"]
+        assert np.allclose(result["distances"][0], single["distances"][0], atol=1e-5)
+    assert db.search_many([], k=4, mode=mode) == []
+
+
+@pytest.mark.parametrize("train_size, nprobe", [(10_000, 16), (1000, 2)])
+@pytest.mark.parametrize("mode", ["vector", "hybrid", "lexical"])
+def test_scoped_search_stays_in_scope(tmp_path, train_size, nprobe, mode):
+    db = make_store(
+        tmp_path, size=3000, encoder=RandomEncoder(dim=32), train_size=train_size, nprobe=nprobe
+    )
+    # pkg1 is 500 of the chunks: scanned exactly before training, through masked lists after
+    scope = {"path": "pkg1", "language": "typescript"}
+    found = db.get_all()
+    in_scope = np.asarray(
+        [
+            v
+            for v, m in zip(found["embeddings"], found["metadatas"], strict=True)
+            if m["package"] == "pkg1"
+        ]
+    )
+
+    for query in synthetic_queries(10, 3000):
+        result = db.search(query, k=5, mode=mode, scope=scope)
+        assert len(result["ids"][0]) == 5
+        assert {meta["package"] for meta in result["metadatas"][0]} == {"pkg1"}
+        if mode == "vector" and db.centroids is None:
+            expected = sorted(((in_scope - db.encode(query)) ** 2).sum(axis=1))[:5]
+            assert np.allclose(result["distances"][0], expected, atol=1e-4)
+    assert db.search("anything", k=5, scope={"package": "missing"})["ids"] == [[]]
@@ -0,0 +1,43 @@
+from code_assistant.service.answer_cache import AnswerCache, chunk_fingerprint
+
+
+def make_chunks(docs):
+    return {"ids": [[f"a.ts:{i}-{i}" for i in range(len(docs))]], "documents": [docs]}
+
+
+def test_similar_query_over_same_chunks_hits(tmp_path):
+    cache = AnswerCache(tmp_path / "answers.sqlite", threshold=0.9)
+    fingerprint = chunk_fingerprint(make_chunks(["function a() {}"]))
+
+    cache.put([1.0, 0.0, 0.0], fingerprint, "answer")
+
+    assert cache.get([0.98, 0.05, 0.0], fingerprint) == "answer"
+    assert cache.get([0.0, 1.0, 0.0], fingerprint) is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_reindexed_chunk_text_changes_the_fingerprint(tmp_path):
+    before = chunk_fingerprint(make_chunks(["function a() {}"]))
+    after = chunk_fingerprint(make_chunks(["function a() { return 1; }"]))
+    cache = AnswerCache(tmp_path / "answers.sqlite")
+
+    cache.put([1.0, 0.0], before, "stale")
+
+    assert before != after
+    assert cache.get([1.0, 0.0], after) is None
+
+
+def test_entries_persist_expire_and_are_bounded(tmp_path):
+    path = tmp_path / "answers.sqlite"
+    cache = AnswerCache(path, max_entries=2)
+    for i in range(3):
+        cache.put([1.0, float(i)], f"fp{i}", f"answer {i}")
+    cache.close()
+
+    reopened = AnswerCache(path, max_entries=2)
+    assert reopened.stats()["entries"] == 2
+    assert reopened.get([1.0, 0.0], "fp0") is None
+    assert reopened.get([1.0, 2.0], "fp2") == "answer 2"
+
+    expired = AnswerCache(path, ttl=-1)
+    assert expired.get([1.0, 2.0], "fp2") is None
@@ -0,0 +1,36 @@
+from code_assistant.embeddings.batcher import iter_token_batches
+
+
+def count_tokens(texts):
+    return [len(t) for t in texts]
+
+
+def make_chunks(lengths):
+    return [{"text": "x" * n} for n in lengths]
+
+
+def test_batches_group_similar_lengths_within_budget():
+    chunks = make_chunks([3, 500, 4, 480, 5, 6])
+
+    batches = list(iter_token_batches(chunks, count_tokens, token_budget=1000))
+
+    assert all(len(b) * b[-1]["tokens"] <= 1000 for b in batches)
+    assert [ch["tokens"] for ch in batches[0]] == [3, 4, 5, 6]
+    assert sum(len(b) for b in batches) == len(chunks)
+
+
+def test_oversized_chunk_gets_its_own_batch_and_max_batch_size_holds():
+    chunks = make_chunks([2000, 1, 1, 1])
+
+    batches = list(iter_token_batches(chunks, count_tokens, token_budget=100, max_batch_size=2))
+
+    assert [len(b) for b in batches] == [2, 1, 1]
+    assert batches[-1][0]["tokens"] == 2000
+
+
+def test_window_bounds_reordering():
+    chunks = make_chunks([9, 8, 1, 2])
+
+    batches = list(iter_token_batches(chunks, count_tokens, token_budget=1000, window=2))
+
+    assert [[ch["tokens"] for ch in b] for b in batches] == [[8, 9], [1, 2]]
@@ -0,0 +1,83 @@
+import numpy as np
+
+from code_assistant.benchmarks.stub_encoder import StubEncoder
+from code_assistant.benchmarks.suite import (
+    bench_chunking,
+    bench_context,
+    bench_graph,
+    bench_recall,
+    bench_startup,
+    compare,
+    fill_store,
+)
+from code_assistant.benchmarks.synthetic import generate_repo, synthetic_chunks
+from code_assistant.vector_db.ann_store import AnnStore
+
+
+def test_synthetic_repo_is_deterministic(tmp_path):
+    first = generate_repo(tmp_path / "a", files=5, seed=3)
+    second = generate_repo(tmp_path / "b", files=5, seed=3)
+
+    for a, b in zip(first, second, strict=True):
+        assert open(a).read() == open(b).read()
+    ids = [chunk_id for chunk_id, _, _ in synthetic_chunks(50)]
+    assert len(set(ids)) == 50
+
+
+def test_stub_encoder_is_normalized_and_deterministic():
+    encoder = StubEncoder(dim=32)
+    vectors = encoder.encode(["refreshToken(user)", "refreshToken(user)", "render cart"])
+
+    assert vectors.shape == (3, 32)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert np.array_equal(vectors[0], vectors[1])
+    assert encoder.encode("render cart").shape == (32,)
+
+
+def test_chunking_graph_and_context_stages(tmp_path):
+    paths = generate_repo(tmp_path / "repo", files=10)
+
+    chunking = bench_chunking(paths)
+    graph = bench_graph(str(tmp_path / "repo"), str(tmp_path))
+    context = bench_context(calls=3)
+
+    assert chunking["files"] == 10 and chunking["chunks"] > 10
+    assert graph["files"] == 10
+    assert set(context) == {"GroqQwenLLM", "QwenLLM", "DeepSeekLLM"}
+    assert all(stats["p50_ms"] >= 0 for stats in context.values())
+
+
+def test_compare_flags_slower_metrics():
+    def run(p50_ms, chunks_per_sec, chunks):
+        return {
+            "results": {
+                "search": {"10000": {"vector": {"p50_ms": p50_ms}}},
+                "embed": {"chunks_per_sec": chunks_per_sec, "chunks": chunks},
+            }
+        }
+
+    old, new = run(2.0, 1000.0, 50), run(3.0, 1050.0, 60)
+
+    rows, regressions = compare(old, new)
+
+    assert [name for name, *_ in rows] == ["search.10000.vector.p50_ms", "embed.chunks_per_sec"]
+    assert [name for name, *_ in regressions] == ["search.10000.vector.p50_ms"]
+
+
+def test_ann_recall_per_setting(tmp_path):
+    db = AnnStore(str(tmp_path), encoder=StubEncoder(dim=32), cache_size=0, pq_subvectors=8)
+    fill_store(db, 2000)
+
+    recall = bench_recall(db, 2000, queries=10, k=5, nprobes=(1, 1000))
+
+    assert set(recall) == {"float32", "int8", "pq"}
+    assert recall["pq"]["scan_bytes_per_vector"] == 8
+    assert all(index["nprobe_1000"]["recall"] == 1.0 for index in recall.values())
+    assert all(index["nprobe_1"]["p50_ms"] > 0 for index in recall.values())
+
+
+def test_startup_imports_skip_heavy_dependencies():
+    startup = bench_startup(["code_assistant.cli"], runs=1)
+
+    assert startup["code_assistant.cli"]["import_seconds"] > 0
+    assert startup["code_assistant.cli"]["heavy_imports"] == []
@@ -0,0 +1,58 @@
+import json
+
+from code_assistant import cli
+from code_assistant.benchmarks.stub_encoder import StubEncoder
+from code_assistant.benchmarks.synthetic import generate_repo, synthetic_chunks
+from code_assistant.vector_db.ann_store import AnnStore
+
+
+def test_graph_command_exports_json(tmp_path):
+    generate_repo(tmp_path / "repo", files=6)
+
+    status = cli.main(
+        [
+            "--storage",
+            str(tmp_path / "storage"),
+            "graph",
+            str(tmp_path / "repo"),
+            "--out",
+            str(tmp_path / "graph.json"),
+        ]
+    )
+
+    assert status == 0
+    assert (tmp_path / "storage" / "code_graph.sqlite").exists()
+    assert json.loads((tmp_path / "graph.json").read_text())
+
+
+def test_batch_search_writes_one_line_per_query(tmp_path, monkeypatch):
+    db = AnnStore(str(tmp_path), encoder=StubEncoder(dim=32), cache_size=0)
+    ids, texts, metadata = zip(*synthetic_chunks(600), strict=True)
+    db.add(list(ids), list(texts), list(metadata))
+    monkeypatch.setattr(cli, "open_store", lambda backend, persist_dir: db)
+    batch = tmp_path / "queries.jsonl"
+    batch.write_text('{"id": 1, "query": "loadToken", "k": 2}\nrefreshOrder\n')
+
+    status = cli.main(
+        [
+            "--storage",
+            str(tmp_path),
+            "--metrics",
+            str(tmp_path / "metrics.prom"),
+            "query",
+            "--batch",
+            str(batch),
+            "--out",
+            str(tmp_path / "out.jsonl"),
+            "--search-only",
+            "--path",
+            "pkg1",
+        ]
+    )
+
+    results = [json.loads(line) for line in (tmp_path / "out.jsonl").read_text().splitlines()]
+    assert status == 0
+    assert results[0]["id"] == 1 and len(results[0]["hits"]) == 2
+    assert len(results[1]["hits"]) == 5
+    assert {h["metadata"]["package"] for r in results for h in r["hits"]} == {"pkg1"}
+    assert "code_assistant_search_many_seconds" in (tmp_path / "metrics.prom").read_text()
@@ -0,0 +1,59 @@
+from code_assistant.benchmarks.walker import run, synthetic_source
+from code_assistant.utils.code_chunk_extractor import CodeChunkExtractor
+
+CODE = """const ü = 1;
+  export class Ä {
+    run() { return 'é'; }
+}
+function helper() {}
+"""
+
+
+def test_chunks_are_whole_source_lines():
+    lines = CODE.split("\n")
+
+    chunks = CodeChunkExtractor(CODE).get_chunks()
+
+    assert [(ch["node_type"], ch["name"]) for ch in chunks] == [
+        ("class_declaration", "Ä"),
+        ("method_definition", "run"),
+        ("function_declaration", "helper"),
+    ]
+    for ch in chunks:
+        assert ch["text"] == "\n".join(lines[ch["start_line"] - 1 : ch["end_line"]])
+
+
+def test_iter_chunks_accepts_bytes_and_is_lazy():
+    chunks = CodeChunkExtractor(CODE.encode("utf8")).iter_chunks()
+
+    assert next(chunks)["name"] == "Ä"
+
+
+def test_deeply_nested_code_does_not_hit_recursion_limit():
+    depth = 3000
+    code = "const f = " + "() => " * depth + "1;\n"
+
+    chunks = CodeChunkExtractor(code).get_chunks()
+
+    assert len(chunks) == depth
+    assert all(ch["node_type"] == "arrow_function" for ch in chunks)
+
+
+def test_nested_chunks_come_outer_first_in_source_order():
+    code = "class A {\n  m() { return () => 1; }\n}\nfunction b() {}\n"
+
+    chunks = CodeChunkExtractor(code).get_chunks()
+
+    assert [ch["node_type"] for ch in chunks] == [
+        "class_declaration",
+        "method_definition",
+        "arrow_function",
+        "function_declaration",
+    ]
+
+
+def test_walker_benchmark_reports_nodes_per_sec():
+    result = run(code=synthetic_source(20), repeat=1)
+
+    assert result["nodes"] > 1000
+    assert set(result["nodes_per_sec"]) == {"query_chunks", "cursor_graph", "recursive_walk"}
@@ -0,0 +1,57 @@
+from code_assistant.utils.code_graph import build_code_graph
+from code_assistant.utils.graph_store import CodeGraphStore
+
+AUTH = """import { TokenStore } from './store';
+
+export class AuthService {
+  refresh(user) {
+    return this.store.refreshToken(user);
+  }
+}
+
+export function refreshTokenGuard(req) {
+  return new AuthService().refresh(req.user);
+}
+"""
+
+STORE = """export class TokenStore {
+  refreshToken(user) { return issue(user); }
+}
+function issue(u) { return u; }
+"""
+
+
+def write_repo(root):
+    (root / "auth.ts").write_text(AUTH)
+    (root / "store.ts").write_text(STORE)
+
+
+def test_graph_answers_caller_callee_and_import_queries(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    write_repo(repo)
+    auth, store_file = str(repo / "auth.ts"), str(repo / "store.ts")
+
+    store = build_code_graph(str(repo), db_path=str(tmp_path / "graph.sqlite"))
+
+    assert store.callers("refresh") == [f"{auth}:9-11"]
+    assert store.callees(f"{auth}:4-6") == ["refreshToken"]
+    assert store.importers(store_file) == [auth]
+    assert [n["id"] for n in store.nodes_named("refreshToken")] == [f"{store_file}:2-2"]
+
+
+def test_rebuild_only_touches_changed_and_deleted_files(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    write_repo(repo)
+    db_path = str(tmp_path / "graph.sqlite")
+    build_code_graph(str(repo), db_path=db_path)
+
+    (repo / "store.ts").unlink()
+    (repo / "auth.ts").write_text(AUTH.replace("refreshToken(user)", "rotate(user)"))
+    store = build_code_graph(str(repo), store=CodeGraphStore(db_path))
+
+    assert store.files() == [str(repo / "auth.ts")]
+    assert store.callers("refreshToken") == []
+    assert store.callers("rotate") == [f"{repo / 'auth.ts'}:4-6"]
+    assert store.nodes_named("issue") == []
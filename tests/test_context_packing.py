@@ -0,0 +1,66 @@
+from code_assistant.llm.context_packing import ContextPacker
+
+
+def word_count(text):
+    return len(text.split())
+
+
+def results(ids, docs, distances):
+    return {
+        "ids": [ids],
+        "documents": [docs],
+        "distances": [distances],
+        "metadatas": [[{"name": i} for i in ids]],
+    }
+
+
+def test_knapsack_beats_greedy_prefix():
+    packer = ContextPacker(word_count, per_chunk_overhead=0)
+    # the best hit alone fills most of the budget; the next two together are worth more
+    res = results(
+        ["a", "b", "c"],
+        ["w " * 60, "w " * 50, "w " * 50],
+        [0.1, 0.2, 0.2],
+    )
+    packed = packer.pack(res, "query", budget=100, max_chunk_tokens=100)
+    assert packed["ids"] == [["b", "c"]]
+    assert packed["metadatas"] == [[{"name": "b"}, {"name": "c"}]]
+
+
+def test_pack_keeps_original_order_and_budget():
+    packer = ContextPacker(word_count, per_chunk_overhead=2)
+    res = results(["a", "b", "c"], ["one two", "three four five", "six"], [0.3, 0.1, 0.2])
+    packed = packer.pack(res, "query", budget=9)
+    assert packed["ids"] == [["b", "c"]]
+    assert sum(word_count(d) + 2 for d in packed["documents"][0]) <= 9
+
+
+def test_oversized_chunk_is_trimmed_around_query():
+    lines = [f"const filler{i} = {i};" for i in range(40)]
+    lines[25] = "function refreshToken(session) { return session.renew(); }"
+    packer = ContextPacker(word_count, per_chunk_overhead=0)
+    res = results(["big"], ["\n".join(lines)], [0.1])
+    packed = packer.pack(res, "where is refreshToken", budget=40, max_chunk_tokens=30)
+    doc = packed["documents"][0][0]
+    assert "refreshToken" in doc
+    assert word_count(doc) <= 30
+
+
+def test_token_counts_cached_per_chunk():
+    calls = []
+
+    def counter(text):
+        calls.append(text)
+        return word_count(text)
+
+    packer = ContextPacker(counter)
+    res = results(["a", "b"], ["one two", "three"], [0.1, 0.2])
+    packer.pack(res, "q", budget=200)
+    packer.pack(res, "q", budget=200)
+    assert len(calls) == 2
+
+
+def test_empty_or_no_budget():
+    packer = ContextPacker(word_count)
+    assert packer.pack(results([], [], []), "q", 100)["ids"] == [[]]
+    assert packer.pack(results(["a"], ["x"], [0.1]), "q", 0)["ids"] == [[]]
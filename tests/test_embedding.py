@@ -0,0 +1,108 @@
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from code_assistant.benchmarks.stub_encoder import StubEncoder
+from code_assistant.embeddings import embedding
+from code_assistant.embeddings.embedding import GRAPH_FILE, embed_project
+from code_assistant.utils.graph_store import CodeGraphStore
+from code_assistant.vector_db.ann_store import AnnStore
+
+A = "export function load() {\n  return 1;\n}\n"
+B = "export function save() {\n  return 2;\n}\n"
+
+
+@pytest.fixture(autouse=True)
+def no_torch(monkeypatch):
+    torch = SimpleNamespace(backends=SimpleNamespace(mps=SimpleNamespace(is_available=bool)))
+    monkeypatch.setitem(sys.modules, "torch", torch)
+
+
+class RecordingStore(AnnStore):
+    """AnnStore that remembers the IDs of every add, i.e. what was (re-)embedded."""
+
+    def __init__(self, path):
+        super().__init__(path, encoder=StubEncoder(dim=16), cache_size=0)
+        self.added = []
+
+    def add(self, ids, texts, metadata):
+        self.added.extend(ids)
+        super().add(ids, texts, metadata)
+
+
+def index(project, storage, db=None, **kwargs):
+    db = db or RecordingStore(str(storage))
+    db.added = []
+    embed_project(str(project), token_budget=10_000, parse_workers=1, db=db, **kwargs)
+    return db
+
+
+@pytest.fixture
+def project(tmp_path):
+    project = tmp_path / "proj"
+    project.mkdir()
+    (project / "a.ts").write_text(A)
+    (project / "b.ts").write_text(B)
+    return project
+
+
+def test_chunks_on_one_line_are_stored_once(tmp_path):
+    project = tmp_path / "proj"
+    project.mkdir()
+    (project / "m.ts").write_text(
+        "export function ids(items) {\n  return items.map(x => x.id).filter(y => y);\n}\n"
+    )
+
+    db = index(project, tmp_path / "storage")
+
+    path = str(project / "m.ts")
+    assert sorted(db.iter_ids()) == [f"{path}:1-3", f"{path}:2-2"]
+
+
+def test_reindex_replaces_edited_and_drops_deleted_files(project, tmp_path):
+    a, b = str(project / "a.ts"), str(project / "b.ts")
+    db = index(project, tmp_path / "storage")
+    assert sorted(db.iter_ids()) == [f"{a}:1-3", f"{b}:1-3"]
+
+    (project / "a.ts").write_text("// moved down\n" + A)
+    (project / "b.ts").unlink()
+    index(project, tmp_path / "storage", db=db)
+
+    assert sorted(db.iter_ids()) == [f"{a}:2-4"]
+    assert db.added == [f"{a}:2-4"]
+    assert db.count() == 1
+    assert db.lexical_index.search("save") == []
+    graph = CodeGraphStore(db.persist_dir / GRAPH_FILE)
+    assert list(graph.files()) == [a]
+    graph.close()
+
+
+def test_unchanged_project_embeds_nothing(project, tmp_path):
+    db = index(project, tmp_path / "storage")
+
+    index(project, tmp_path / "storage", db=db)
+
+    assert db.added == []
+    assert db.count() == 2
+
+
+def test_metadata_version_bump_reembeds_every_file(project, tmp_path, monkeypatch):
+    db = index(project, tmp_path / "storage")
+
+    monkeypatch.setattr(embedding, "METADATA_VERSION", embedding.METADATA_VERSION + 1)
+    index(project, tmp_path / "storage", db=db)
+
+    assert len(db.added) == 2
+    assert db.count() == 2
+
+
+def test_graph_only_refresh_keeps_vectors(project, tmp_path):
+    db = index(project, tmp_path / "storage", build_graph=False)
+
+    index(project, tmp_path / "storage", db=db)
+
+    assert db.added == []
+    graph = CodeGraphStore(db.persist_dir / GRAPH_FILE)
+    assert sorted(graph.files()) == [str(project / "a.ts"), str(project / "b.ts")]
+    graph.close()
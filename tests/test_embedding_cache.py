@@ -0,0 +1,67 @@
+import numpy as np
+
+from code_assistant.vector_db.embedding_cache import EmbeddingCache
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(t), t.count("x"), 1.0] for t in texts], dtype=np.float32)
+
+
+def test_encode_only_misses_and_survives_reload(tmp_path):
+    encoder = CountingEncoder()
+    cache = EmbeddingCache(tmp_path, model_name="stub")
+
+    first = cache.encode(["a()", "xx()"], encoder)
+    second = cache.encode(["xx()  \r\n", "b()"], encoder)
+
+    assert encoder.calls == [["a()", "xx()"], ["b()"]]
+    np.testing.assert_array_equal(first[1], second[0])
+    assert cache.stats()["hits"] == 1
+    cache.flush()
+
+    reloaded = EmbeddingCache(tmp_path, model_name="stub")
+    reloaded.encode(["a()", "b()"], encoder)
+    assert len(encoder.calls) == 2
+    assert reloaded.stats() == {"hits": 2, "misses": 0, "hit_rate": 1.0, "entries": 3}
+
+
+def test_model_name_is_part_of_the_key(tmp_path):
+    encoder = CountingEncoder()
+    cache = EmbeddingCache(tmp_path, model_name="one")
+    cache.encode(["a()"], encoder)
+    cache.flush()
+
+    EmbeddingCache(tmp_path, model_name="two").encode(["a()"], encoder)
+    assert len(encoder.calls) == 2
+
+
+def test_lru_eviction_is_bounded(tmp_path):
+    encoder = CountingEncoder()
+    cache = EmbeddingCache(tmp_path, model_name="stub", max_entries=2)
+
+    cache.encode(["a"], encoder)
+    cache.encode(["b"], encoder)
+    cache.encode(["a"], encoder)  # a becomes most recently used
+    cache.encode(["c"], encoder)  # evicts b
+
+    assert cache.stats()["entries"] == 2
+    cache.encode(["a"], encoder)
+    cache.encode(["b"], encoder)
+    assert encoder.calls[-1] == ["b"]
+    assert cache.capacity == 2
+
+
+def test_index_is_written_on_flush_only(tmp_path):
+    cache = EmbeddingCache(tmp_path, model_name="stub")
+
+    for i in range(3000):
+        cache.encode([f"f{i}()"], CountingEncoder())
+
+    assert not cache.index_path.exists()
+    cache.flush()
+    assert EmbeddingCache(tmp_path, model_name="stub").stats()["entries"] == 3000
@@ -0,0 +1,44 @@
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+from code_assistant.vector_db.encoder import Encoder, get_encoder
+
+
+class FakeModel:
+    loads = 0
+
+    def __init__(self, name, **kwargs):
+        time.sleep(0.05)
+        FakeModel.loads += 1
+
+    def encode(self, texts, show_progress_bar=False):
+        return [[float(len(t))] for t in texts]
+
+
+def test_get_encoder_is_shared_and_not_loaded():
+    assert get_encoder() is get_encoder()
+    assert get_encoder("other/model") is not get_encoder()
+    assert not Encoder().loaded
+
+
+def test_model_loads_once_under_concurrent_first_use(monkeypatch):
+    # torch and the model are imported when it is first loaded
+    torch = SimpleNamespace(backends=SimpleNamespace(mps=SimpleNamespace(is_available=bool)))
+    monkeypatch.setitem(sys.modules, "torch", torch)
+    monkeypatch.setitem(
+        sys.modules, "sentence_transformers", SimpleNamespace(SentenceTransformer=FakeModel)
+    )
+    FakeModel.loads = 0
+    encoder = Encoder("fake/model")
+
+    threads = [threading.Thread(target=encoder.encode, args=(["abc"],)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert FakeModel.loads == 1
+    assert encoder.loaded and encoder.load_seconds > 0
+    assert encoder.encode(["ab"]) == [[2.0]]
@@ -0,0 +1,71 @@
+from code_assistant.embeddings.pipeline import chunk_file
+from code_assistant.utils import extraction
+from code_assistant.utils.code_chunk_extractor import CodeChunkExtractor
+from code_assistant.utils.code_graph import build_code_graph, build_graph_for_file
+from code_assistant.utils.extraction import ParseCache, extract_cached, extract_file
+
+CODE = b"""import { issue } from './tokens';
+
+export class AuthService {
+  refresh(user) {
+    return issue(user);
+  }
+}
+"""
+
+
+def test_one_parse_gives_chunks_and_graph(tmp_path):
+    path = str(tmp_path / "auth.ts")
+    chunks, nodes, edges = extract_file(path, CODE)
+
+    assert [ch["name"] for ch in chunks] == ["AuthService", "refresh"]
+    assert all(ch["file_path"] == path for ch in chunks)
+    assert chunks == [dict(ch, file_path=path) for ch in CodeChunkExtractor(CODE).get_chunks()]
+    assert (nodes, edges) == build_graph_for_file(path, CODE)
+    assert extract_file(path, CODE, with_graph=False)[1:] == (None, None)
+
+
+def test_chunk_file_with_graph(tmp_path):
+    path = tmp_path / "auth.ts"
+    path.write_bytes(CODE)
+
+    _, content_hash, chunks, (nodes, edges) = chunk_file(str(path), with_graph=True)
+    assert len(chunks) == 2
+    assert {n["name"] for n in nodes.values()} == {"AuthService", "refresh"}
+    assert chunk_file(str(path), known_hash=content_hash, with_graph=True)[2:] == (None, None)
+
+
+def test_parse_cache_skips_parsing(tmp_path, monkeypatch):
+    cache = ParseCache(tmp_path / "cache")
+    path = str(tmp_path / "auth.ts")
+    first = extract_cached(path, CODE, "hash1", cache)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("parsed again")
+
+    monkeypatch.setattr(extraction, "extract_file", fail)
+    assert extract_cached(path, CODE, "hash1", cache) == first
+    assert cache.get(path, "hash2") is None
+    assert cache.get(str(tmp_path / "other.ts"), "hash1") is None
+
+
+def test_chunks_only_entry_is_not_used_for_graph(tmp_path):
+    cache = ParseCache(tmp_path / "cache")
+    path = str(tmp_path / "auth.ts")
+    extract_cached(path, CODE, "h", cache, with_graph=False)
+
+    assert cache.get(path, "h", with_graph=False) is not None
+    assert cache.get(path, "h") is None
+    assert extract_cached(path, CODE, "h", cache)[1]
+
+
+def test_build_code_graph_uses_parse_cache(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "auth.ts").write_bytes(CODE)
+    cache = ParseCache(tmp_path / "cache")
+
+    build_code_graph(str(repo), db_path=str(tmp_path / "g1.sqlite"), parse_cache=cache)
+    store = build_code_graph(str(repo), db_path=str(tmp_path / "g2.sqlite"), parse_cache=cache)
+    assert len(list((tmp_path / "cache").rglob("*.json"))) == 1
+    assert store.nodes_named("refresh")
@@ -0,0 +1,78 @@
+from code_assistant.service.graph_expansion import expand_results
+from code_assistant.utils.code_graph import build_code_graph
+
+AUTH = """import { TokenStore } from './store';
+
+export class AuthService {
+  refresh(user) {
+    return this.store.refreshToken(user);
+  }
+}
+"""
+
+STORE = """export class TokenStore {
+  refreshToken(user) { return issue(user); }
+}
+function issue(u) { return u; }
+"""
+
+
+class FakeDB:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def get_by_ids(self, ids):
+        found = [i for i in ids if i in self.docs]
+        return {
+            "ids": [found],
+            "documents": [[self.docs[i] for i in found]],
+            "metadatas": [[{"file_path": i.rpartition(":")[0]} for i in found]],
+        }
+
+
+def build(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "auth.ts").write_text(AUTH)
+    (repo / "store.ts").write_text(STORE)
+    graph = build_code_graph(str(repo), db_path=str(tmp_path / "graph.sqlite"))
+    auth, store = str(repo / "auth.ts"), str(repo / "store.ts")
+    docs = {
+        f"{auth}:4-6": "refresh(user) { ... }",
+        f"{store}:2-2": "refreshToken(user) { return issue(user); }",
+        f"{store}:4-4": "function issue(u) { return u; }",
+        f"{store}:1-3": "export class TokenStore { ... }",
+    }
+    return graph, FakeDB(docs), auth, store
+
+
+def result(ids):
+    return {
+        "ids": [ids],
+        "distances": [[0.1] * len(ids)],
+        "documents": [["..."] * len(ids)],
+        "metadatas": [[{}] * len(ids)],
+    }
+
+
+def test_expands_callees_and_callers_by_hop(tmp_path):
+    graph, db, auth, store = build(tmp_path)
+
+    one_hop = expand_results(result([f"{store}:2-2"]), graph, db)
+    two_hops = expand_results(result([f"{auth}:4-6"]), graph, db, hops=2)
+
+    assert one_hop["ids"][0] == [f"{store}:2-2", f"{store}:4-4", f"{auth}:4-6"]
+    assert {m["graph_relation"] for m in one_hop["metadatas"][0][1:]} == {"callee", "caller"}
+    assert two_hops["ids"][0] == [f"{auth}:4-6", f"{store}:2-2", f"{store}:4-4"]
+    assert two_hops["distances"][0] == [0.1, 2.0, 3.0]
+
+
+def test_overlapping_chunks_and_budget_limit_expansion(tmp_path):
+    graph, db, auth, store = build(tmp_path)
+
+    inside_class = expand_results(result([f"{store}:1-3"]), graph, db)
+    tight = expand_results(result([f"{store}:2-2"]), graph, db, token_budget=8)
+
+    # calls belong to the method, which overlaps the retrieved class
+    assert inside_class["ids"][0] == [f"{store}:1-3"]
+    assert tight["ids"][0] == [f"{store}:2-2", f"{store}:4-4"]
@@ -0,0 +1,95 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from code_assistant.benchmarks.stub_encoder import StubEncoder
+from code_assistant.benchmarks.synthetic import synthetic_chunks
+from code_assistant.service.http_api import make_server
+from code_assistant.service.query_service import QueryService
+from code_assistant.vector_db.ann_store import AnnStore
+
+
+class EchoLLM:
+    def generate_from_chunks(self, prompt, chunks):
+        return f"<think>counting</think>\n{prompt}: {len(chunks['ids'][0])} chunks"
+
+    def stream_from_chunks(self, prompt, chunks):
+        yield from ["<thi", "nk>hmm</think>\n", prompt, ": ", "streamed"]
+
+
+@pytest.fixture
+def api(tmp_path):
+    db = AnnStore(str(tmp_path), encoder=StubEncoder(dim=32), cache_size=0)
+    ids, texts, metadata = zip(*synthetic_chunks(1200), strict=True)
+    db.add(list(ids), list(texts), list(metadata))
+    service = QueryService(db, EchoLLM(), search_mode="hybrid")
+    server = make_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def request(method, path, body=None):
+        conn = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+        if body is not None and not isinstance(body, str):
+            body = json.dumps(body)
+        conn.request(method, path, body=body)
+        response = conn.getresponse()
+        return response.status, response.read().decode("utf8")
+
+    yield request
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def test_search_and_generate(api):
+    status, body = api("GET", "/health")
+    assert status == 200 and json.loads(body)["chunks"] == 1200
+
+    status, body = api("POST", "/search", {"query": "loadToken", "k": 3, "mode": "lexical"})
+    hits = json.loads(body)["hits"]
+    assert status == 200 and len(hits) == 3
+    assert {"id", "distance", "document", "metadata"} == set(hits[0])
+
+    status, body = api("POST", "/search", {"queries": ["a", "b"], "scope": {"path": "pkg1"}})
+    results = json.loads(body)["results"]
+    assert [len(r["hits"]) for r in results] == [5, 5]
+    assert {h["metadata"]["package"] for r in results for h in r["hits"]} == {"pkg1"}
+
+    status, body = api("POST", "/generate", {"query": "q", "k": 2})
+    assert status == 200 and json.loads(body)["answer"] == "q: 2 chunks"
+
+    status, body = api("POST", "/generate", {"query": "q", "stream": True})
+    lines = [json.loads(line) for line in body.splitlines()]
+    assert "".join(line.get("piece", "") for line in lines) == "q: streamed"
+    assert lines[-1]["done"] and len(lines[-1]["hits"]) == 5
+
+
+def test_batch_keeps_order_and_reports_bad_lines(api):
+    lines = [
+        {"id": "s", "query": "refreshOrder", "k": 2},
+        {"id": "g", "query": "q", "generate": True},
+        "not json",
+        {"id": "x", "query": "q", "scope": {"folder": "src"}},
+        {"id": "k", "query": "q", "k": "two"},
+        {"id": "m", "query": "q", "mode": "fuzzy"},
+    ]
+    body = "\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+
+    status, text = api("POST", "/batch", body)
+    results = [json.loads(line) for line in text.splitlines()]
+
+    assert status == 200 and len(results) == 6
+    assert results[0]["id"] == "s" and len(results[0]["hits"]) == 2
+    assert results[1] == {**results[1], "id": "g", "answer": "q: 5 chunks"}
+    assert "error" in results[2]
+    assert results[3]["id"] == "x" and "Unknown scope keys" in results[3]["error"]
+    assert results[4]["id"] == "k" and "'k' must be int" in results[4]["error"]
+    assert results[5]["id"] == "m" and "Unknown search mode" in results[5]["error"]
+
+
+def test_errors(api):
+    assert api("POST", "/search", {"k": 3})[0] == 400
+    assert api("POST", "/search", "{broken")[0] == 400
+    assert api("POST", "/search", {"query": "q", "mode": "fuzzy"})[0] == 400
+    assert api("GET", "/nowhere")[0] == 404
@@ -0,0 +1,103 @@
+from code_assistant.embeddings.pipeline import chunk_file, iter_source_files
+from code_assistant.utils.code_chunk_extractor import CodeChunkExtractor
+from code_assistant.utils.code_graph import build_code_graph
+from code_assistant.utils.languages import get_parser, language_for_path
+
+PY_STORE = """class TokenStore:
+    def refresh_token(self, user):
+        return issue(user)
+
+
+def issue(user):
+    return user
+"""
+
+PY_AUTH = """from .store import TokenStore
+
+
+@login_required
+def refresh(user):
+    return TokenStore().refresh_token(user)
+"""
+
+GO = """package auth
+
+import "net/http"
+
+type Session struct {
+    User string
+}
+
+func (s *Session) Refresh(w http.ResponseWriter) {
+    issue(s.User)
+}
+
+func issue(user string) string { return user }
+"""
+
+TSX = """export function Button({ label }: { label: string }) {
+  return <button onClick={() => track(label)}>{label}</button>;
+}
+"""
+
+
+def chunk_names(code, language):
+    return [
+        (ch["node_type"], ch["name"])
+        for ch in CodeChunkExtractor(code, language=language).get_chunks()
+    ]
+
+
+def test_python_go_and_tsx_chunks():
+    assert chunk_names(PY_STORE, "python") == [
+        ("class_definition", "TokenStore"),
+        ("function_definition", "refresh_token"),
+        ("function_definition", "issue"),
+    ]
+    assert chunk_names(GO, "go") == [
+        ("type_spec", "Session"),
+        ("method_declaration", "Refresh"),
+        ("function_declaration", "issue"),
+    ]
+    assert chunk_names(TSX, "tsx")[0] == ("function_declaration", "Button")
+
+
+def test_go_type_chunk_keeps_whole_line():
+    chunks = CodeChunkExtractor(GO, language="go").get_chunks()
+    (chunk,) = [c for c in chunks if c["name"] == "Session"]
+    assert chunk["text"].startswith("type Session struct {")
+    assert chunk["language"] == "go"
+
+
+def test_registry_picks_language_by_extension_and_caches_parsers(tmp_path):
+    assert language_for_path("a/b.tsx").name == "tsx"
+    assert language_for_path("a/b.md") is None
+    assert get_parser("python") is get_parser("python")
+
+    for name, code in (("a.py", PY_STORE), ("b.go", GO), ("c.tsx", TSX), ("d.md", "# no")):
+        (tmp_path / name).write_text(code)
+    paths = sorted(iter_source_files(str(tmp_path)))
+    assert [p.rsplit("/", 1)[1] for p in paths] == ["a.py", "b.go", "c.tsx"]
+
+    _, _, chunks = chunk_file(str(tmp_path / "b.go"))
+    assert {ch["language"] for ch in chunks} == {"go"}
+
+
+def test_python_graph_resolves_relative_imports_and_calls(tmp_path):
+    pkg = tmp_path / "pkg"
+    pkg.mkdir()
+    (pkg / "store.py").write_text(PY_STORE)
+    (pkg / "auth.py").write_text(PY_AUTH)
+    (tmp_path / "main.go").write_text(GO)
+
+    store = build_code_graph(str(tmp_path), db_path=str(tmp_path / "graph.sqlite"))
+
+    auth, store_file = str(pkg / "auth.py"), str(pkg / "store.py")
+    assert store.imports(auth) == [store_file]
+    assert store.imports(str(tmp_path / "main.go")) == ["net/http"]
+    (refresh,) = store.nodes_named("refresh")
+    assert set(store.callees(refresh["id"])) == {"TokenStore", "refresh_token"}
+    (method,) = store.nodes_named("refresh_token")
+    assert store.callers("refresh_token") == [refresh["id"]]
+    assert (refresh["id"], "caller") in store.neighbours(method["id"])
+    assert store.callers("issue") and len(store.nodes_named("issue")) == 2
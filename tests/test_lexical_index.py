@@ -0,0 +1,69 @@
+import sqlite3
+
+from code_assistant.vector_db.lexical_index import (
+    SQL_VARIABLES,
+    LexicalIndex,
+    reciprocal_rank_fusion,
+    tokenize,
+)
+
+
+def test_tokenize_splits_identifiers():
+    assert tokenize("refreshTokenGuard(user_id)") == [
+        "refreshtokenguard",
+        "refresh",
+        "token",
+        "guard",
+        "user_id",
+        "user",
+        "id",
+    ]
+    assert tokenize("HTTPServer x") == ["httpserver", "http", "server"]
+
+
+def test_exact_identifier_ranks_first_and_deletes_apply(tmp_path):
+    index = LexicalIndex(tmp_path / "lexical.sqlite")
+    index.add(
+        ids=["guard", "refresh", "other"],
+        texts=[
+            "function refreshTokenGuard(req) { return checkToken(req); }",
+            "function refreshToken(user) { return issueToken(user); }",
+            "function renderPage() { return html; }",
+        ],
+        metadata=[{"name": "refreshTokenGuard"}, {"name": "refreshToken"}, {"name": "renderPage"}],
+    )
+
+    assert index.search("what does refreshTokenGuard do?", k=2)[0][0] == "guard"
+    assert index.search("renderPage")[0][0] == "other"
+
+    index.delete(["guard"])
+    assert [doc_id for doc_id, _ in index.search("refreshTokenGuard")] == ["refresh"]
+    assert index.count() == 2
+
+
+def test_readding_a_chunk_replaces_its_postings(tmp_path):
+    index = LexicalIndex(tmp_path / "lexical.sqlite")
+    index.add(["a"], ["function alpha() {}"])
+    index.add(["a"], ["function beta() {}"])
+
+    assert index.search("alpha") == []
+    assert index.search("beta")[0][0] == "a"
+
+
+def test_candidate_filter_stays_within_sqlite_variable_limit(tmp_path):
+    index = LexicalIndex(tmp_path / "lexical.sqlite")
+    index.conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, SQL_VARIABLES)
+    # 950 docs share a rare-ish term, 2000 share a common one
+    ids = [f"d{i}" for i in range(2000)]
+    texts = [f"common {'rare' if i < 950 else 'other'}" for i in range(2000)]
+    index.add(ids, texts)
+
+    found = index.search("rare common", k=3)
+
+    assert len(found) == 3 and all(int(doc_id[1:]) < 950 for doc_id, _ in found)
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d", "a"]])
+
+    assert [doc_id for doc_id, _ in fused] == ["b", "a", "d", "c"]
@@ -0,0 +1,35 @@
+import os
+
+from code_assistant.embeddings.manifest import Manifest, hash_bytes
+
+
+def test_manifest_round_trip_and_change_detection(tmp_path):
+    source = tmp_path / "src" / "a.ts"
+    source.parent.mkdir()
+    source.write_text("function a() {}\n")
+    stat = os.stat(source)
+
+    manifest = Manifest(tmp_path / "manifest.json")
+    manifest.record(str(source), stat, hash_bytes(source.read_bytes()), ["a.ts:1-1"])
+    manifest.save()
+
+    reloaded = Manifest(tmp_path / "manifest.json")
+    assert reloaded.is_unchanged(str(source), stat)
+    assert reloaded.get(str(source))["chunk_ids"] == ["a.ts:1-1"]
+    assert reloaded.files_under(str(tmp_path / "src")) == [str(source)]
+
+    source.write_text("function a() { return 1; }\n")
+    assert not reloaded.is_unchanged(str(source), os.stat(source))
+
+
+def test_metadata_version_defaults_to_zero(tmp_path):
+    source = tmp_path / "a.ts"
+    source.write_text("function a() {}\n")
+    stat = os.stat(source)
+    manifest = Manifest(tmp_path / "manifest.json")
+
+    manifest.record(str(source), stat, hash_bytes(source.read_bytes()), ["a.ts:1-1"])
+    assert manifest.metadata_version(str(source)) == 0
+    manifest.record(str(source), stat, "h", ["a.ts:1-1"], metadata_version=1)
+    assert manifest.metadata_version(str(source)) == 1
+    assert manifest.metadata_version(str(tmp_path / "missing.ts")) == 0
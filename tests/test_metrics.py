@@ -0,0 +1,54 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+
+from code_assistant.utils.metrics import Metrics
+
+
+def test_counters_and_summaries_export_as_prometheus_and_jsonl():
+    metrics = Metrics()
+    metrics.inc("store_chunks_added_total", 3, backend="ann")
+    metrics.inc("store_chunks_added_total", 2, backend="ann")
+    for value in range(1, 101):
+        metrics.observe("search_seconds", value / 1000, backend="ann", mode="vector")
+
+    text = metrics.prometheus()
+
+    assert "# TYPE code_assistant_store_chunks_added_total counter" in text
+    assert 'code_assistant_store_chunks_added_total{backend="ann"} 5' in text
+    assert "# TYPE code_assistant_search_seconds summary" in text
+    assert 'code_assistant_search_seconds{backend="ann",mode="vector",quantile="0.5"} 0.051' in text
+    assert 'code_assistant_search_seconds_count{backend="ann",mode="vector"} 100' in text
+    records = [json.loads(line) for line in metrics.jsonl().splitlines()]
+    assert [r["type"] for r in records] == ["counter", "summary"]
+    assert records[1]["quantiles"]["0.99"] == 0.1
+
+
+def test_label_values_are_escaped():
+    metrics = Metrics()
+    metrics.inc("llm_requests_total", backend='Qwen "local"\n')
+
+    assert 'backend="Qwen \\"local\\"\\n"' in metrics.prometheus()
+
+
+def test_trace_collects_timers_from_other_threads(tmp_path):
+    metrics = Metrics(trace_path=str(tmp_path / "traces.jsonl"))
+
+    def stage():
+        with metrics.timer("store_query_seconds", backend="chroma"):
+            pass
+
+    with metrics.trace("query", mode="hybrid") as trace:
+        with metrics.timer("retrieval_seconds"):
+            with ThreadPoolExecutor(1) as pool:
+                pool.submit(copy_context().run, stage).result()
+    # outside the trace, timers only feed the summaries
+    stage()
+
+    names = [span["name"] for span in trace.spans]
+    assert names == ["store_query_seconds", "retrieval_seconds"]
+    assert trace.spans[0]["backend"] == "chroma"
+    saved = json.loads((tmp_path / "traces.jsonl").read_text())
+    assert saved["mode"] == "hybrid" and len(saved["spans"]) == 2
+    counts = {s["name"]: s["count"] for s in metrics.snapshot()["summaries"]}
+    assert counts == {"retrieval_seconds": 1, "store_query_seconds": 2}
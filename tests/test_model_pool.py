@@ -0,0 +1,133 @@
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from code_assistant.llm.model_pool import ModelPool
+
+CHUNKS = {"ids": [["a.ts:1-2"]], "documents": [["code"]]}
+
+
+class EchoLLM:
+    """Stand-in backend, loaded inside the pool's worker processes."""
+
+    def __init__(
+        self, n_threads=None, model_path=None, tag="", delay=0.0, default_path=None, fail=False
+    ):
+        if fail:
+            raise RuntimeError("cannot load")
+        self.tag = tag
+        self.delay = delay
+        # like a llama.cpp model loaded from the backend's default path
+        self.model = SimpleNamespace(model_path=default_path)
+        self.last_prefill = None
+
+    def generate_from_chunks(self, prompt, chunks):
+        if prompt == "crash":
+            os._exit(3)
+        time.sleep(self.delay)
+        self.last_prefill = {"prefill_tokens": len(prompt), "prefill_skipped_tokens": 0}
+        return f"{self.tag}:{prompt}@{time.time()}"
+
+    def stream_from_chunks(self, prompt, chunks):
+        for word in prompt.split():
+            yield f"{self.tag}:{word} "
+
+
+def spec(tag, **kwargs):
+    return {"backend": "test_model_pool:EchoLLM", "tag": tag, **kwargs}
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(*args, **kwargs):
+        pools.append(ModelPool(*args, **kwargs))
+        return pools[-1]
+
+    yield make
+    for pool in pools:
+        pool.close()
+
+
+def test_generate_and_stream_through_pool(make_pool):
+    pool = make_pool({"a": spec("A"), "b": spec("B")}, workers=2, threads_per_worker=1)
+    assert pool.llm("a").generate_from_chunks("hi", CHUNKS).startswith("A:hi@")
+    assert list(pool.llm("b").stream_from_chunks("x y", CHUNKS)) == ["B:x ", "B:y "]
+    with pytest.raises(KeyError):
+        pool.submit("missing", "q", CHUNKS)
+
+
+def test_pooled_llm_reports_last_prefill(make_pool):
+    llm = make_pool({"a": spec("A")}, workers=1, threads_per_worker=1).llm("a")
+    assert llm.last_prefill is None
+
+    llm.generate_from_chunks("four", CHUNKS)
+
+    assert llm.last_prefill == {"prefill_tokens": 4, "prefill_skipped_tokens": 0}
+
+
+def test_dead_worker_fails_its_requests(make_pool):
+    pool = make_pool({"a": spec("A")}, workers=1, threads_per_worker=1)
+    crashed = pool.submit("a", "crash", CHUNKS, stream=False)
+    queued = pool.submit("a", "q", CHUNKS, stream=False)
+
+    for request in (crashed, queued):
+        with pytest.raises(RuntimeError):
+            "".join(request)
+    with pytest.raises(RuntimeError):
+        "".join(pool.submit("a", "later", CHUNKS, stream=False))
+
+
+def test_failed_preload_fails_requests(make_pool):
+    pool = make_pool({"a": spec("A", fail=True)}, workers=1, threads_per_worker=1, preload=["a"])
+
+    with pytest.raises(RuntimeError, match="exited"):
+        pool.llm("a").generate_from_chunks("q", CHUNKS)
+
+
+def test_sessions_are_served_round_robin(make_pool):
+    pool = make_pool({"a": spec("A", delay=0.05)}, workers=1, threads_per_worker=1)
+    requests = [
+        pool.submit("a", f"alice{i}", CHUNKS, session="alice", stream=False) for i in range(3)
+    ]
+    requests.append(pool.submit("a", "bob0", CHUNKS, session="bob", stream=False))
+
+    finished = {}
+    for request in requests:
+        text = "".join(request)
+        prompt, _, at = text.partition("@")
+        finished[prompt] = float(at)
+    order = sorted(finished, key=finished.get)
+    assert order == ["A:alice0", "A:bob0", "A:alice1", "A:alice2"]
+
+
+def test_least_recently_used_model_evicted_under_cap(make_pool, tmp_path):
+    for name in ("a", "b"):
+        (tmp_path / f"{name}.gguf").write_bytes(b"\0" * (700 << 10))
+    models = {
+        name: spec(name.upper(), model_path=str(tmp_path / f"{name}.gguf")) for name in ("a", "b")
+    }
+    pool = make_pool(models, workers=1, threads_per_worker=1, memory_cap_mb=1, preload=["a"])
+
+    pool.llm("a").generate_from_chunks("q", CHUNKS)
+    assert pool.resident[0] == ["a"]
+    pool.llm("b").generate_from_chunks("q", CHUNKS)
+    assert pool.resident[0] == ["b"]
+
+
+def test_default_model_path_counts_against_cap(make_pool, tmp_path):
+    for name in ("a", "b"):
+        (tmp_path / f"{name}.gguf").write_bytes(b"\0" * (700 << 10))
+    # no model_path in the specs: the backends fall back to their default files
+    models = {
+        name: spec(name.upper(), default_path=str(tmp_path / f"{name}.gguf"))
+        for name in ("a", "b")
+    }
+    pool = make_pool(models, workers=1, threads_per_worker=1, memory_cap_mb=1)
+
+    pool.llm("a").generate_from_chunks("q", CHUNKS)
+    pool.llm("b").generate_from_chunks("q", CHUNKS)
+    assert pool.resident[0] == ["b"]
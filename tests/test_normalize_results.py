@@ -5,7 +5,8 @@ from code_assistant.llm.qrok_qwen_llm import GroqQwenLLM
 
 @pytest.fixture
 def llm():
-    return GroqQwenLLM()
+    # _normalize_results is a pure function: no Groq client (or API key) needed
+    return GroqQwenLLM
 
 
 def test_normalize_results(llm):
@@ -32,3 +33,16 @@ def test_normalize_results(llm):
     assert "testFunction" in result
     assert "10–20" in result
     assert "function testFunction()" in result
+
+
+def test_code_fence_follows_chunk_language(llm):
+    fake_response = {
+        "ids": [["a", "b"]],
+        "metadatas": [[{"name": "load", "language": "python"}, {"name": "render"}]],
+        "documents": [["def load(): pass", "render()"]],
+    }
+
+    result = llm._normalize_results(fake_response)
+
+    assert "```python\ndef load(): pass" in result
+    assert "```ts\nrender()" in result
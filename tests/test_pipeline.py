@@ -0,0 +1,60 @@
+from code_assistant.embeddings.pipeline import iter_chunked_files, iter_source_files
+
+
+def write_sources(root, count):
+    for i in range(count):
+        (root / f"file{i}.ts").write_text(
+            f"export class C{i} {{\n  run(x: number) {{ return x + {i}; }}\n}}\n"
+        )
+    (root / "notes.md").write_text("# not typescript")
+
+
+def test_iter_chunked_files_covers_every_file(tmp_path):
+    write_sources(tmp_path, 12)
+    paths = list(iter_source_files(str(tmp_path)))
+
+    results = {
+        path: chunks for path, _, chunks in iter_chunked_files(paths, workers=2, queue_size=2)
+    }
+
+    assert sorted(results) == sorted(paths)
+    for path, chunks in results.items():
+        assert {ch["node_type"] for ch in chunks} == {"class_declaration", "method_definition"}
+        assert all(ch["file_path"] == path for ch in chunks)
+
+
+def test_iter_chunked_files_can_stop_early(tmp_path):
+    write_sources(tmp_path, 20)
+    paths = list(iter_source_files(str(tmp_path)))
+
+    for _ in iter_chunked_files(paths, workers=2, queue_size=1):
+        break
+
+
+def test_iter_chunked_files_skips_known_hashes(tmp_path):
+    write_sources(tmp_path, 3)
+    paths = list(iter_source_files(str(tmp_path)))
+    hashes = {path: content_hash for path, content_hash, _ in iter_chunked_files(paths)}
+
+    changed = paths[0]
+    with open(changed, "a", encoding="utf8") as f:
+        f.write("function extra() {}\n")
+
+    reparsed = {
+        path
+        for path, _, chunks in iter_chunked_files(paths, known_hashes=hashes)
+        if chunks is not None
+    }
+    assert reparsed == {changed}
+
+
+def test_unparsable_file_gives_no_chunks(tmp_path):
+    write_sources(tmp_path, 2)
+    (tmp_path / "latin1.ts").write_bytes(b'function f() { return "\xe9t\xe9"; }\n')
+    paths = list(iter_source_files(str(tmp_path)))
+
+    results = {path: chunks for path, _, chunks in iter_chunked_files(paths, workers=2)}
+
+    assert sorted(results) == sorted(paths)
+    assert results[str(tmp_path / "latin1.ts")] == []
+    assert results[str(tmp_path / "file0.ts")]
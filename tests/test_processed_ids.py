@@ -0,0 +1,19 @@
+from code_assistant.embeddings.embedding import get_processed_ids
+
+
+class FakeStore:
+    def __init__(self, ids):
+        self.ids = ids
+
+    def iter_ids(self):
+        yield from self.ids
+
+    def existing_ids(self, ids):
+        return {i for i in ids if i in self.ids}
+
+
+def test_get_processed_ids_checks_only_the_batch():
+    db = FakeStore(["a.ts:1-3", "a.ts:5-9"])
+
+    assert get_processed_ids(db, ["a.ts:1-3", "b.ts:1-2"]) == {"a.ts:1-3"}
+    assert get_processed_ids(db) == {"a.ts:1-3", "a.ts:5-9"}
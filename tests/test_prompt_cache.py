@@ -0,0 +1,93 @@
+from code_assistant.llm.prompt_cache import PromptCache
+
+SYSTEM = [{"role": "system", "content": "you are a helpful code assistant"}]
+
+
+class FakeLlama:
+    """Mimics llama.cpp's prefix reuse: only tokens past the shared prefix are evaluated."""
+
+    def __init__(self):
+        self.input_ids = []
+        self.n_tokens = 0
+        self.evaluated = 0
+
+    def n_ctx(self):
+        return 512
+
+    def create_chat_completion(self, messages, max_tokens=None, **kwargs):
+        tokens = [w for m in messages for w in f"{m['role']}: {m['content']}".split()]
+        prefix = 0
+        for a, b in zip(self.input_ids, tokens[:-1], strict=False):
+            if a != b:
+                break
+            prefix += 1
+        self.input_ids = self.input_ids[:prefix]
+        self.n_tokens = prefix
+        self.eval(tokens[prefix:])
+        return {"choices": [{"message": {"content": "ok"}}]}
+
+    def eval(self, tokens):
+        self.evaluated += len(tokens)
+        self.input_ids += tokens
+        self.n_tokens += len(tokens)
+
+    def save_state(self):
+        return {"ids": list(self.input_ids)}
+
+    def load_state(self, state):
+        self.input_ids = list(state["ids"])
+        self.n_tokens = len(self.input_ids)
+
+
+def ask(model, cache, question):
+    cache.begin()
+    model.create_chat_completion(SYSTEM + [{"role": "user", "content": question}])
+    return cache.last_prefill
+
+
+def test_prefix_state_survives_restart(tmp_path):
+    model_path = tmp_path / "model.gguf"
+    model_path.write_bytes(b"weights")
+
+    first = FakeLlama()
+    PromptCache(first, str(model_path), SYSTEM, cache_dir=tmp_path / "cache")
+    assert first.evaluated > 0
+    assert len(list((tmp_path / "cache").glob("*.state"))) == 1
+    assert not list((tmp_path / "cache").glob("*.tmp"))
+
+    restarted = FakeLlama()
+    cache = PromptCache(restarted, str(model_path), SYSTEM, cache_dir=tmp_path / "cache")
+    assert restarted.evaluated == 0
+
+    prefill = ask(restarted, cache, "what does refresh do")
+    assert prefill["prefill_skipped_tokens"] == 7
+    assert prefill["prefill_tokens"] == 12
+    assert restarted.evaluated == 5
+
+
+def test_prefill_reported_per_request_without_disk_cache(tmp_path):
+    model_path = tmp_path / "model.gguf"
+    model_path.write_bytes(b"weights")
+    model = FakeLlama()
+    cache = PromptCache(model, str(model_path), SYSTEM, cache_dir=None)
+
+    assert ask(model, cache, "first question")["prefill_skipped_tokens"] == 0
+    assert ask(model, cache, "second question")["prefill_skipped_tokens"] == 8
+    # the same question again reuses everything but the last token
+    assert ask(model, cache, "second question") == {
+        "prefill_skipped_tokens": 9,
+        "prefill_tokens": 10,
+    }
+
+
+def test_unreadable_state_is_rebuilt(tmp_path):
+    model_path = tmp_path / "model.gguf"
+    model_path.write_bytes(b"weights")
+    PromptCache(FakeLlama(), str(model_path), SYSTEM, cache_dir=tmp_path)
+    (state,) = tmp_path.glob("*.state")
+    state.write_bytes(b"not a pickle")
+
+    model = FakeLlama()
+    PromptCache(model, str(model_path), SYSTEM, cache_dir=tmp_path)
+    assert model.evaluated > 0
+    assert model.n_tokens > 0
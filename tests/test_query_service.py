@@ -0,0 +1,186 @@
+import asyncio
+import threading
+import time
+
+from code_assistant.service.answer_cache import AnswerCache
+from code_assistant.service.query_service import QueryService
+from code_assistant.utils.metrics import METRICS
+
+
+class SlowDB:
+    def search(self, query, k=5, **kwargs):
+        time.sleep(0.05)
+        return {"ids": [[f"{query}:{i}" for i in range(k)]]}
+
+
+class SlowLLM:
+    def __init__(self, max_concurrency=None):
+        if max_concurrency:
+            self.max_concurrency = max_concurrency
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def generate_from_chunks(self, prompt, chunks):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.1)
+        with self.lock:
+            self.active -= 1
+        return f"answer to {prompt} from {len(chunks['ids'][0])} chunks"
+
+
+def test_concurrent_sessions_overlap_and_report_timings():
+    llm = SlowLLM(max_concurrency=4)
+    service = QueryService(SlowDB(), llm)
+    try:
+        futures = [service.submit(f"q{i}", k=2) for i in range(4)]
+        responses = [f.result(timeout=5) for f in futures]
+    finally:
+        service.close()
+
+    assert [r["answer"] for r in responses] == [f"answer to q{i} from 2 chunks" for i in range(4)]
+    assert llm.peak > 1
+    for r in responses:
+        assert r["timings"]["retrieval_ms"] >= 40
+        assert r["timings"]["total_ms"] >= r["timings"]["generation_ms"]
+
+
+def test_backends_without_max_concurrency_generate_one_at_a_time():
+    llm = SlowLLM()
+    service = QueryService(SlowDB(), llm)
+    try:
+        for f in [service.submit(f"q{i}") for i in range(3)]:
+            f.result(timeout=5)
+    finally:
+        service.close()
+
+    assert llm.peak == 1
+
+
+class StreamingLLM(SlowLLM):
+    def stream_from_chunks(self, prompt, chunks):
+        for piece in ["<thi", "nk>plan</think>", "\n\nHello", " world"]:
+            time.sleep(0.01)
+            yield piece
+
+
+def test_stream_yields_pieces_and_records_first_token():
+    service = QueryService(SlowDB(), StreamingLLM())
+    try:
+        response = service.stream("q")
+        pieces = list(response)
+    finally:
+        service.close()
+
+    assert "".join(pieces) == "<think>plan</think>\n\nHello world"
+    assert len(response.chunks["ids"][0]) == 5
+    assert response.timings["first_token_ms"] <= response.timings["generation_ms"]
+
+
+def test_stream_trace_and_llm_metrics():
+    METRICS.reset()
+    service = QueryService(SlowDB(), StreamingLLM())
+    try:
+        response = service.stream("q")
+        list(response)
+    finally:
+        service.close()
+
+    # retrieval ran in an executor thread and still landed in the query's trace
+    assert [span["name"] for span in response.trace["spans"]] == ["retrieval_seconds"]
+    assert response.trace["backend"] == "StreamingLLM"
+    assert response.trace["generated_tokens"] == 4
+    assert response.trace["first_token_ms"] <= response.trace["total_ms"]
+    summaries = {s["name"]: s for s in METRICS.snapshot()["summaries"]}
+    assert summaries["llm_time_to_first_token_seconds"]["labels"] == {"backend": "StreamingLLM"}
+    assert summaries["llm_tokens_per_second"]["count"] == 1
+    assert METRICS.recent_traces(1)[0]["trace"] == "query"
+
+
+class CachingDB(SlowDB):
+    def embed_query(self, query):
+        return [1.0, 0.0] if "auth" in query else [0.0, 1.0]
+
+    def search(self, query, k=5, query_embedding=None, mode="vector", scope=None):
+        return {"ids": [["a.ts:1-3"]], "documents": [["function auth() {}"]]}
+
+
+def test_answer_cache_skips_generation_for_similar_questions(tmp_path):
+    llm = SlowLLM()
+    cache = AnswerCache(tmp_path / "answers.sqlite")
+    service = QueryService(CachingDB(), llm, answer_cache=cache)
+    try:
+        first = service.submit("where is auth configured?").result(timeout=5)
+        second = service.submit("where is auth set up?").result(timeout=5)
+        other = service.submit("what does billing do?").result(timeout=5)
+    finally:
+        service.close()
+
+    assert not first["cache_hit"]
+    assert second["cache_hit"] and second["answer"] == first["answer"]
+    assert not other["cache_hit"]
+
+
+def test_lexical_mode_does_not_embed_the_question(tmp_path):
+    class LexicalDB(CachingDB):
+        def embed_query(self, query):
+            raise AssertionError("lexical search embedded the question")
+
+    cache = AnswerCache(tmp_path / "answers.sqlite")
+    service = QueryService(LexicalDB(), SlowLLM(), answer_cache=cache, search_mode="lexical")
+    try:
+        first = service.submit("where is auth configured?").result(timeout=5)
+        second = service.submit("where is auth configured?").result(timeout=5)
+    finally:
+        service.close()
+
+    assert not first["cache_hit"] and not second["cache_hit"]
+
+
+def test_prefill_stats_reported_in_timings():
+    llm = SlowLLM()
+    llm.last_prefill = {"prefill_skipped_tokens": 180, "prefill_tokens": 900}
+    service = QueryService(SlowDB(), llm)
+    try:
+        response = service.submit("q").result(timeout=5)
+    finally:
+        service.close()
+
+    assert response["timings"]["prefill_skipped_tokens"] == 180
+    assert response["timings"]["prefill_tokens"] == 900
+
+
+def test_per_query_llm_override():
+    default, other = SlowLLM(), SlowLLM(max_concurrency=2)
+    service = QueryService(SlowDB(), default)
+    try:
+        response = service.submit("q", k=1, llm=other).result(timeout=5)
+    finally:
+        service.close()
+
+    assert response["answer"] == "answer to q from 1 chunks"
+    assert other.peak == 1
+    assert default.peak == 0
+
+
+def test_retrieve_many_uses_one_batched_search():
+    class BatchDB(SlowDB):
+        calls = []
+
+        def search_many(self, queries, k=5, mode="vector", scope=None):
+            self.calls.append(list(queries))
+            return [{"ids": [[f"{query}:{i}" for i in range(k)]]} for query in queries]
+
+    db = BatchDB()
+    service = QueryService(db, SlowLLM())
+    try:
+        results = asyncio.run_coroutine_threadsafe(
+            service.retrieve_many(["a", "b", "c"], k=2), service.loop
+        ).result(timeout=5)
+    finally:
+        service.close()
+
+    assert db.calls == [["a", "b", "c"]]
+    assert [r["ids"][0] for r in results] == [["a:0", "a:1"], ["b:0", "b:1"], ["c:0", "c:1"]]
@@ -0,0 +1,34 @@
+import pytest
+
+from code_assistant.vector_db.scope import MAX_DIR_DEPTH, directory_metadata, scope_conditions
+
+
+def test_directory_metadata_prefixes_and_package(tmp_path):
+    package = tmp_path / "services" / "billing"
+    (package / "src").mkdir(parents=True)
+    (package / "package.json").write_text("{}")
+
+    meta = directory_metadata(str(package / "src" / "invoice.ts"), str(tmp_path))
+
+    assert meta["directory"] == "services/billing/src"
+    assert meta["package"] == "billing"
+    assert meta["dir_1"] == "services"
+    assert meta["dir_2"] == "services/billing"
+    assert meta["dir_3"] == "services/billing/src"
+    assert meta["dir_4"] == ""
+    assert directory_metadata(str(tmp_path / "main.ts"), str(tmp_path))["package"] == ""
+
+
+def test_scope_conditions():
+    assert scope_conditions(None) == {}
+    assert scope_conditions({"path": "./services/billing/", "language": "typescript"}) == {
+        "dir_2": ["services/billing"],
+        "language": ["typescript"],
+    }
+    assert scope_conditions({"type": ["function_declaration", "method_definition"]}) == {
+        "type": ["function_declaration", "method_definition"]
+    }
+    with pytest.raises(ValueError):
+        scope_conditions({"folder": "services"})
+    with pytest.raises(ValueError):
+        scope_conditions({"path": "/".join("d" * (MAX_DIR_DEPTH + 1))})
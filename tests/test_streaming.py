@@ -0,0 +1,30 @@
+import pytest
+
+from code_assistant.llm.streaming import strip_think, strip_think_stream
+
+
+@pytest.mark.parametrize(
+    "pieces",
+    [
+        ["<think>hidden</think>\n\nVisible text"],
+        ["<th", "ink>hid", "den</th", "ink>", "\n\nVisible", " text"],
+        ["<", "t", "h", "i", "n", "k", ">", "x", "<", "/think", ">Visible text"],
+    ],
+)
+def test_think_blocks_are_removed_across_token_boundaries(pieces):
+    assert "".join(strip_think_stream(pieces)) == "Visible text"
+
+
+def test_text_that_only_looks_like_a_tag_is_kept():
+    assert "".join(strip_think_stream(["a <", "b> c <th", "e"])) == "a <b> c <the"
+
+
+def test_visible_text_is_emitted_before_the_stream_ends():
+    stream = strip_think_stream(iter(["<think>x</think>Hel", "lo", "<thi"]))
+
+    assert next(stream) == "Hel"
+    assert next(stream) == "lo"
+
+
+def test_strip_think_matches_whole_text_behaviour():
+    assert strip_think("<think>a</think> answer <think>b</think>") == "answer"